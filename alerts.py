@@ -0,0 +1,85 @@
+"""
+Threshold alerts on a short polling loop.
+
+Each poll feeds the latest quotes for the alert symbols into AlertEngine,
+which compares them incrementally with what it saw before: no history
+queries and no LLM call. An alert needs to hold for a few consecutive polls
+(debounce) and each symbol then stays quiet for a cooldown period.
+"""
+
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class AlertEngine:
+    """Incremental threshold evaluation with debounce and per-symbol cooldown.
+
+    Two triggers per symbol:
+      - 'day': the quote's own daily change crosses +/- threshold (once per crossing)
+      - 'move': price has moved threshold% from the reference price (the
+        first price seen, then the price at the last alert)
+    """
+
+    def __init__(self, threshold=5.0, cooldown=1800, confirmations=2, significant=2.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.confirmations = confirmations
+        self.significant = significant
+        self._reference = {}
+        self._last_price = {}
+        self._pending = {}
+        self._last_alert = {}
+        self._day_active = set()
+
+    def evaluate(self, quotes, now=None):
+        """Feed one poll of quotes; returns the alerts to send now."""
+        now = time.monotonic() if now is None else now
+        alerts = []
+        for q in quotes:
+            symbol, price = q['symbol'], q.get('price')
+            if not price:
+                continue
+            reference = self._reference.setdefault(symbol, price)
+            last = self._last_price.get(symbol, price)
+            self._last_price[symbol] = price
+
+            tick = (price - last) / last * 100 if last else 0
+            if abs(tick) >= self.significant:
+                logger.info(f"📈 Significant tick on {symbol}: {tick:+.2f}% since last poll")
+
+            move = (price - reference) / reference * 100
+            day = q.get('change_pct')
+            if day is None or abs(day) < self.threshold:
+                self._day_active.discard(symbol)
+            if day is not None and abs(day) >= self.threshold and symbol not in self._day_active:
+                trigger, change = 'day', day
+            elif abs(move) >= self.threshold:
+                trigger, change = 'move', move
+            else:
+                self._pending.pop(symbol, None)
+                continue
+
+            # Debounce: the condition has to hold for several consecutive polls
+            seen = self._pending.get(symbol, 0) + 1
+            self._pending[symbol] = seen
+            if seen < self.confirmations:
+                continue
+            if now - self._last_alert.get(symbol, float('-inf')) < self.cooldown:
+                continue
+
+            self._last_alert[symbol] = now
+            self._reference[symbol] = price
+            self._pending.pop(symbol, None)
+            if trigger == 'day':
+                self._day_active.add(symbol)
+            alerts.append({'symbol': symbol, 'price': price, 'change': round(change, 2), 'trigger': trigger})
+        return alerts
+
+
+def format_alert(alert):
+    arrow = "🟢" if alert['change'] > 0 else "🔴"
+    basis = "today" if alert['trigger'] == 'day' else "since last alert"
+    return (f"🚨 *ALERT* {arrow} *{alert['symbol']}* {alert['change']:+.2f}% {basis}\n"
+            f"Price: {alert['price']:,.2f}")
@@ -0,0 +1,175 @@
+"""
+Vectorized analytics over the local price history.
+
+Loads the stored snapshots for every tracked symbol into one aligned NumPy
+matrix (time buckets x symbols) and computes rolling returns, realised
+volatility, z-scored moves and a cross-asset correlation matrix in a single
+pass, then summarises them for the analysis prompt.
+
+Returns are only taken between real observations: a symbol that was missing
+for a few buckets gets one return spanning the gap (scaled to a per-bucket
+size for volatility), never a run of forward-filled zero returns.
+"""
+
+import warnings
+
+import numpy as np
+
+from market_store import FEAR_GREED_SYMBOL
+
+# Resampling interval for the history matrix (seconds)
+BUCKET_SECONDS = 900
+# Fewest shared returns for a correlation to be reported
+MIN_OVERLAP = 10
+
+
+def forward_fill(matrix):
+    """(filled, last): gaps carry the previous price; last is the bucket of that observation (-1 if none)."""
+    n_buckets, n_cols = matrix.shape
+    observed = ~np.isnan(matrix)
+    last = np.where(observed, np.arange(n_buckets)[:, None], -1)
+    np.maximum.accumulate(last, axis=0, out=last)
+    filled = matrix[np.maximum(last, 0), np.arange(n_cols)]
+    filled[last < 0] = np.nan
+    return filled, last
+
+
+def load_matrix(rows, interval=BUCKET_SECONDS, fill=True):
+    """Turn (symbol, ts, price) rows into (symbols, bucket_ts, prices).
+
+    prices has one row per time bucket and one column per symbol; each
+    bucket keeps the last price seen in it and gaps are forward-filled
+    (left NaN with fill=False).
+    """
+    if not rows:
+        return [], np.empty(0, dtype=np.int64), np.empty((0, 0))
+    table = np.array(rows, dtype=[('symbol', object), ('ts', np.int64), ('price', np.float64)])
+    symbols, ts, prices = table['symbol'], table['ts'], table['price']
+
+    # The store returns rows grouped by symbol, so columns are just the runs
+    starts = np.empty(len(symbols), dtype=bool)
+    starts[0] = True
+    starts[1:] = symbols[1:] != symbols[:-1]
+    names = symbols[starts]
+    if len(set(names)) == len(names):
+        col = np.cumsum(starts) - 1
+    else:
+        names, col = np.unique(symbols, return_inverse=True)
+
+    start = ts.min() - ts.min() % interval
+    bucket = (ts - start) // interval
+    n_buckets = int(bucket.max()) + 1
+
+    # Rows come ordered by (symbol, ts) so later writes into a bucket are newer
+    matrix = np.full((n_buckets, len(names)), np.nan)
+    matrix[bucket, col] = prices
+    if fill:
+        matrix, _ = forward_fill(matrix)
+
+    return list(names), start + np.arange(n_buckets) * interval, matrix
+
+
+def pairwise_correlation(x, min_overlap=MIN_OVERLAP):
+    """Pearson correlation of every column pair over the rows where both are present."""
+    present = (~np.isnan(x)).astype(np.float64)
+    values = np.nan_to_num(x)
+    n = present.T @ present
+    sums = values.T @ present          # sums[i, j]: column i over rows shared with j
+    squares = (values ** 2).T @ present
+    mean_i, mean_j = sums / n, sums.T / n
+    cov = (values.T @ values) / n - mean_i * mean_j
+    var_i = squares / n - mean_i ** 2
+    var_j = squares.T / n - mean_j ** 2
+    corr = cov / np.sqrt(var_i * var_j)
+    corr[(n < min_overlap) | ~(var_i > 0) | ~(var_j > 0)] = np.nan
+    return corr
+
+
+def compute_analytics(rows, interval=BUCKET_SECONDS, window_days=7):
+    """Rolling returns, realised vol, z-scores and correlations for every symbol at once."""
+    symbols, bucket_ts, raw = load_matrix(rows, interval, fill=False)
+    if FEAR_GREED_SYMBOL in symbols:
+        keep = [i for i, name in enumerate(symbols) if name != FEAR_GREED_SYMBOL]
+        symbols, raw = [symbols[i] for i in keep], raw[:, keep]
+    if raw.shape[0] < 3:
+        return None
+    prices, last = forward_fill(raw)
+
+    per_day = 86400 // interval
+    window = min(prices.shape[0] - 1, window_days * per_day)
+
+    with np.errstate(divide='ignore', invalid='ignore'), warnings.catch_warnings():
+        # Symbols with no history in the window produce all-NaN columns
+        warnings.simplefilter('ignore', RuntimeWarning)
+        logp = np.log(prices)
+
+        def horizon(k):
+            k = min(k, prices.shape[0] - 1)
+            return np.expm1(logp[-1] - logp[-1 - k]) * 100
+
+        # Return at each real observation since the previous one, and how many buckets it spans
+        rets = (np.log(raw[1:]) - logp[:-1])[-window:]
+        gaps = (np.arange(1, raw.shape[0])[:, None] - last[:-1])[-window:].astype(np.float64)
+        gaps[np.isnan(rets)] = np.nan
+
+        # Per-bucket drift and deviation, so a return spanning a gap counts for its length
+        mean = np.nansum(rets, axis=0) / np.nansum(gaps, axis=0)
+        scaled = (rets - mean * gaps) / np.sqrt(gaps)
+        std = np.sqrt(np.nanmean(scaled ** 2, axis=0))
+        vol = std * np.sqrt(365 * per_day) * 100
+
+        # Latest one-day move measured in units of its usual size over the buckets it covers
+        day = min(per_day, window)
+        day_move = np.nansum(rets[-day:], axis=0)
+        span = np.nansum(gaps[-day:], axis=0)
+        zscore = (day_move - mean * span) / (std * np.sqrt(span))
+
+        corr = pairwise_correlation(scaled)
+        np.fill_diagonal(corr, np.nan)
+
+    return {
+        'symbols': symbols,
+        'points': int(prices.shape[0]),
+        'return_1d': horizon(per_day),
+        'return_7d': horizon(7 * per_day),
+        'volatility': vol,
+        'zscore': zscore,
+        'correlation': corr,
+    }
+
+
+def _finite(values):
+    return [(i, v) for i, v in enumerate(values) if np.isfinite(v)]
+
+
+def summarize(analytics, top=5):
+    """Short text block with the notable numbers, for the analysis prompt."""
+    if not analytics:
+        return ""
+    names = analytics['symbols']
+    lines = [f"📐 HISTORY ANALYTICS ({analytics['points']} local data points):"]
+
+    movers = sorted(_finite(analytics['zscore']), key=lambda iv: -abs(iv[1]))[:top]
+    if movers:
+        lines.append("  • Unusual 1d moves: " + ", ".join(f"{names[i]} {z:+.1f}σ" for i, z in movers))
+
+    r7 = analytics['return_7d']
+    weekly = sorted(_finite(r7), key=lambda iv: -abs(iv[1]))[:top]
+    if weekly:
+        lines.append("  • 7d returns: " + ", ".join(f"{names[i]} {v:+.2f}%" for i, v in weekly))
+
+    vols = sorted(_finite(analytics['volatility']), key=lambda iv: -iv[1])[:top]
+    if vols:
+        lines.append("  • Realised vol (ann.): " + ", ".join(f"{names[i]} {v:.0f}%" for i, v in vols))
+
+    corr = analytics['correlation']
+    rows, cols = np.triu_indices(len(names), k=1)
+    values = corr[rows, cols]
+    keep = np.isfinite(values)
+    rows, cols, values = rows[keep], cols[keep], values[keep]
+    strongest = np.argsort(-np.abs(values))[:3]
+    if len(strongest):
+        lines.append("  • Strongest correlations: " + ", ".join(
+            f"{names[rows[k]]} ~ {names[cols[k]]} {values[k]:+.2f}" for k in strongest))
+
+    return "\n".join(lines) if len(lines) > 1 else ""
@@ -1,8 +1,9 @@
-import requests
-import time
+import asyncio
 from datetime import datetime
 import os
 
+from telegram_delivery import BotAPI, DeliveryQueue
+
 # 🔹 LEGGI VARIABILI DA RAILWAY
 TOKEN = os.environ.get("TELEGRAM_BOT_TOKEN")
 CHANNEL_ID = os.environ.get("TELEGRAM_CHANNEL_ID", "-1002375600499")
@@ -17,49 +18,32 @@ BASE_MESSAGE = "🎯 Messaggio automatico dal bot Railway! Ora: {}"
 # 🔹 Intervallo tra i messaggi (in secondi)
 INTERVAL = 3600
 
+# 🔹 Client Bot API e coda di invio condivisa (limiti Telegram, retry_after, backoff)
+api = BotAPI(TOKEN)
+delivery = DeliveryQueue(api, workers=1)
+
 # Funzione per inviare messaggio
-def send_message(text):
-    url = f"https://api.telegram.org/bot{TOKEN}/sendMessage"
-    payload = {
-        "chat_id": CHANNEL_ID,
-        "text": text,
-        "parse_mode": "HTML"
-    }
+async def send_message(text):
     try:
-        r = requests.post(url, json=payload, timeout=10)
-        result = r.json()
-        
-        if result.get("ok"):
-            print(f"{datetime.now()}: ✅ Messaggio inviato con successo!")
-            print(f"Message ID: {result['result']['message_id']}")
-        else:
-            print(f"{datetime.now()}: ❌ Errore: {result.get('description')}")
-            print(f"Codice errore: {result.get('error_code')}")
-            
-    except requests.exceptions.RequestException as e:
-        print(f"{datetime.now()}: ⚠️ Errore di connessione: {e}")
+        result = await delivery.send(CHANNEL_ID, text, parse_mode="HTML")
+        print(f"{datetime.now()}: ✅ Messaggio inviato con successo!")
+        print(f"Message ID: {result['message_id']}")
     except Exception as e:
-        print(f"{datetime.now()}: ⚠️ Errore generico: {e}")
+        print(f"{datetime.now()}: ❌ Errore: {e}")
 
 # Funzione per testare il token
-def test_token():
+async def test_token():
     """Test rapido per verificare se il token è valido"""
-    test_url = f"https://api.telegram.org/bot{TOKEN}/getMe"
     try:
-        r = requests.get(test_url, timeout=5)
-        data = r.json()
-        if data.get("ok"):
-            print(f"✅ Token VALIDO! Bot: @{data['result']['username']}")
-            return True
-        else:
-            print(f"❌ Token NON VALIDO! Errore: {data.get('description')}")
-            return False
+        me = await api.get_me()
+        print(f"✅ Token VALIDO! Bot: @{me['username']}")
+        return True
     except Exception as e:
-        print(f"❌ Errore test token: {e}")
+        print(f"❌ Token NON VALIDO! Errore: {e}")
         return False
 
 # Loop principale
-if __name__ == "__main__":
+async def main():
     print(f"🚀 Avvio bot Railway...")
     print(f"Token (primi 10 char): {TOKEN[:10] if TOKEN else 'NONE'}...")
     print(f"Channel ID: {CHANNEL_ID}")
@@ -69,11 +53,12 @@ if __name__ == "__main__":
     if not TOKEN:
         print("❌ Token non configurato! Configura su Railway → Variables")
         print("💡 Aggiungi: TELEGRAM_BOT_TOKEN = 'il_tuo_token'")
-        exit(1)
+        return
     
-    if not test_token():
+    if not await test_token():
         print("❌ Token non valido! Fermo l'esecuzione.")
-        exit(1)
+        await api.close()
+        return
     
     print("✅ Token verificato, avvio invio messaggi...")
     print("=" * 50)
@@ -88,16 +73,25 @@ if __name__ == "__main__":
             msg = BASE_MESSAGE.format(current_time)
             
             print(f"\n📨 Invio messaggio #{message_count} alle {current_time}")
-            send_message(msg)
+            await send_message(msg)
             
             print(f"⏳ Prossimo invio tra {INTERVAL} secondi...")
-            time.sleep(INTERVAL)
+            await asyncio.sleep(INTERVAL)
             
-        except KeyboardInterrupt:
+        except (KeyboardInterrupt, asyncio.CancelledError):
             print("\n\n🛑 Bot fermato manualmente dall'utente")
             print(f"Totale messaggi inviati: {message_count}")
             break
         except Exception as e:
             print(f"⚠️ Errore nel loop principale: {e}")
             print("Riprovo in 60 secondi...")
-            time.sleep(60)
+            await asyncio.sleep(60)
+    
+    await delivery.close()
+    await api.close()
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
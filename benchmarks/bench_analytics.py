@@ -0,0 +1,55 @@
+"""
+Benchmark for the vectorized history analytics.
+
+Builds a synthetic history (default: 300 symbols, 90 days of 15-minute
+points) and times loading it into the matrix and computing returns,
+volatility, z-scores and the correlation matrix.
+
+    python benchmarks/bench_analytics.py [symbols] [days]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import analytics  # noqa: E402
+
+
+def synthetic_rows(n_symbols, days, interval=analytics.BUCKET_SECONDS, seed=7):
+    rng = np.random.default_rng(seed)
+    steps = days * 86400 // interval
+    ts = 1_700_000_000 + np.arange(steps) * interval
+    market = rng.normal(0, 0.002, steps)
+    rows = []
+    for s in range(n_symbols):
+        beta = rng.uniform(0.2, 1.5)
+        path = 100 * np.exp(np.cumsum(beta * market + rng.normal(0, 0.003, steps)))
+        name = f"SYM{s:04d}"
+        rows.extend(zip([name] * steps, ts.tolist(), path.tolist()))
+    return rows
+
+
+def main():
+    n_symbols = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 90
+    rows = synthetic_rows(n_symbols, days)
+    print(f"{n_symbols} symbols x {days} days = {len(rows):,} points")
+
+    timings = []
+    for _ in range(5):
+        started = time.perf_counter()
+        result = analytics.compute_analytics(rows)
+        summary = analytics.summarize(result)
+        timings.append(time.perf_counter() - started)
+
+    timings.sort()
+    print(f"compute + summarize: best {timings[0] * 1000:.0f} ms, median {timings[2] * 1000:.0f} ms")
+    print(summary)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,338 @@
+"""
+Offline end-to-end benchmark of the report pipeline and the hybrid market update.
+
+Starts local aiohttp stand-ins for every upstream (Yahoo chart/quote,
+CoinGecko, Coinbase, frankfurter, metals.live, FRED, alternative.me, the
+RSS feed, Anthropic, Telegram, Alpha Vantage and ExchangeRate), each on its
+own port with configurable latency, jitter, error rate and 429 rate. The bots
+are pointed at them through their *_BASE_URL / *_URL settings, then
+`generate_and_send_report` (bot.py) and `update_all_markets`
+(Market bot complete· PY) are run repeatedly, cold, and p50/p99 latency plus
+upstream request counts per run are reported. No network access is needed.
+
+    python benchmarks/bench_pipeline.py [--runs 20] [--latency 20] [--jitter 10]
+        [--error-rate 0] [--rate-429 0] [--llm-latency 200]
+        [--fault yahoo:latency=300,errors=0.2] [--max-p99 report=2,update=1] [--json out.json]
+
+Exits with status 1 when a --max-p99 budget is exceeded, so it can gate CI.
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import itertools
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from importlib.machinery import SourceFileLoader
+
+from aiohttp import web
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from provider_health import percentile  # noqa: E402
+
+PRICES = {'^GSPC': 5100.0, '^IXIC': 16000.0, '^DJI': 39000.0, '^RUT': 2050.0, '^VIX': 14.5,
+          '^FTSE': 7900.0, '^N225': 39500.0, 'GC=F': 2350.0, 'SI=F': 28.0, 'CL=F': 82.0,
+          'BZ=F': 86.0, 'NG=F': 1.9, 'BTC-USD': 65000.0, 'ES=F': 5120.0}
+RATES = {'EUR': 0.92, 'GBP': 0.79, 'JPY': 151.0, 'CHF': 0.9, 'CAD': 1.36, 'AUD': 1.52}
+COINS = {'bitcoin': 65000.0, 'ethereum': 3200.0, 'solana': 150.0, 'cardano': 0.45,
+         'ripple': 0.52, 'binancecoin': 580.0}
+
+
+class Fault:
+    def __init__(self, latency=0.02, jitter=0.01, errors=0.0, rate_429=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.errors = errors
+        self.rate_429 = rate_429
+
+
+class StandIn:
+    """One fake upstream on its own port: counts requests and injects latency, 5xx and 429."""
+
+    def __init__(self, name, routes, fault, rng):
+        self.name = name
+        self.routes = routes
+        self.fault = fault
+        self.rng = rng
+        self.requests = 0
+        self.base_url = None
+        self._runner = None
+
+    @web.middleware
+    async def _inject(self, request, handler):
+        self.requests += 1
+        f = self.fault
+        await asyncio.sleep(max(0.0, f.latency + self.rng.uniform(-f.jitter, f.jitter)))
+        roll = self.rng.random()
+        if roll < f.rate_429:
+            if self.name == 'telegram':
+                return web.json_response({'ok': False, 'error_code': 429, 'parameters': {'retry_after': 1},
+                                          'description': 'Too Many Requests: retry after 1'}, status=429)
+            return web.Response(status=429, headers={'Retry-After': '1'})
+        if roll < f.rate_429 + f.errors:
+            return web.Response(status=503, text='injected failure')
+        return await handler(request)
+
+    async def start(self):
+        app = web.Application(middlewares=[self._inject])
+        for method, path, handler in self.routes:
+            app.router.add_route(method, path, handler)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, '127.0.0.1', 0)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.base_url = f"http://127.0.0.1:{port}"
+        return self.base_url
+
+    async def stop(self):
+        await self._runner.cleanup()
+
+
+# ----- upstream handlers -----
+
+async def yahoo_quote(request):
+    # Like the real endpoint without a crumb: refused, the bot falls back to chart calls
+    return web.json_response({'finance': {'error': {'code': 'Unauthorized'}}}, status=401)
+
+
+async def yahoo_chart(request):
+    price = PRICES.get(request.match_info['symbol'], 100.0)
+    return web.json_response({'chart': {'result': [{'meta': {
+        'regularMarketPrice': price, 'chartPreviousClose': price * 0.995}}]}})
+
+
+async def coingecko_price(request):
+    ids = request.query.get('ids', '').split(',')
+    return web.json_response({cid: {'usd': COINS.get(cid, 1.0), 'usd_24h_change': 1.5,
+                                    'usd_market_cap': 1e9} for cid in ids if cid})
+
+
+async def coinbase_spot(request):
+    coin = request.match_info['pair'].split('-')[0]
+    return web.json_response({'data': {'amount': str(65000.0 if coin == 'BTC' else 3200.0)}})
+
+
+async def frankfurter_latest(request):
+    if request.query.get('from') == 'XAU':
+        return web.json_response({'rates': {'USD': 2350.0}})
+    return web.json_response({'rates': RATES})
+
+
+async def metals_spot(request):
+    return web.json_response([{'gold': 2350.0}, {'silver': 28.0}])
+
+
+async def fred_observations(request):
+    value = {'DGS2': '4.71', 'DGS10': '4.25', 'DGS30': '4.40'}.get(request.query.get('series_id'), '4.0')
+    return web.json_response({'observations': [{'value': value}]})
+
+
+async def fear_greed(request):
+    return web.json_response({'data': [{'value': '62', 'value_classification': 'Greed'}]})
+
+
+RSS = ("<?xml version='1.0'?><rss version='2.0'><channel><title>Business</title>"
+       + "".join(f"<item><title>Markets headline number {i} - Wire</title></item>" for i in range(12))
+       + "</channel></rss>")
+
+
+async def rss_feed(request):
+    return web.Response(text=RSS, content_type='application/rss+xml')
+
+
+REPORT = "\n\n".join(f"📊 **SECTION {i}**\n" + "Markets moved on data. " * 40 for i in range(7))
+
+
+async def anthropic_messages(request):
+    body = await request.json()
+    return web.json_response({
+        'id': 'msg_bench', 'type': 'message', 'role': 'assistant', 'model': body.get('model', 'bench'),
+        'content': [{'type': 'text', 'text': REPORT}],
+        'stop_reason': 'end_turn', 'stop_sequence': None,
+        'usage': {'input_tokens': 1200, 'output_tokens': 900, 'cache_read_input_tokens': 0},
+    })
+
+
+_message_ids = itertools.count(1)
+
+
+async def telegram_method(request):
+    return web.json_response({'ok': True, 'result': {'message_id': next(_message_ids), 'chat': {'id': 1}, 'date': 0}})
+
+
+async def alphavantage_query(request):
+    return web.json_response({'Global Quote': {'05. price': '512.30', '10. change percent': '0.42%'}})
+
+
+async def forex_table(request):
+    return web.json_response({'result': 'success', 'rates': RATES})
+
+
+ROUTES = {
+    'yahoo': [('GET', '/v7/finance/quote', yahoo_quote), ('GET', '/v8/finance/chart/{symbol}', yahoo_chart)],
+    'coingecko': [('GET', '/api/v3/simple/price', coingecko_price)],
+    'coinbase': [('GET', '/v2/prices/{pair}/spot', coinbase_spot)],
+    'frankfurter': [('GET', '/latest', frankfurter_latest)],
+    'metals': [('GET', '/v1/spot', metals_spot)],
+    'fred': [('GET', '/fred/series/observations', fred_observations)],
+    'feargreed': [('GET', '/fng/', fear_greed)],
+    'rss': [('GET', '/rss', rss_feed)],
+    'anthropic': [('POST', '/v1/messages', anthropic_messages)],
+    'telegram': [('POST', '/{bot_token}/{method}', telegram_method)],
+    'alphavantage': [('GET', '/query', alphavantage_query)],
+    'forex': [('GET', '/v6/latest/USD', forex_table)],
+}
+
+
+def parse_faults(args):
+    default = dict(latency=args.latency / 1000, jitter=args.jitter / 1000,
+                   errors=args.error_rate, rate_429=args.rate_429)
+    faults = {name: Fault(**default) for name in ROUTES}
+    faults['anthropic'].latency = args.llm_latency / 1000
+    for spec in args.fault:
+        name, _, settings = spec.partition(':')
+        fault = faults[name]
+        for item in filter(None, settings.split(',')):
+            key, _, value = item.partition('=')
+            value = float(value)
+            setattr(fault, {'errors': 'errors', '429': 'rate_429'}.get(key, key),
+                    value / 1000 if key in ('latency', 'jitter') else value)
+    return faults
+
+
+def configure_env(urls, workdir):
+    os.environ.update({
+        'TELEGRAM_TOKEN': 'bench', 'CHAT_ID': '1', 'CLAUDE_API_KEY': 'bench', 'NEWS_API_KEY': '',
+        'METRICS_PORT': '0',
+        'MARKET_DB': os.path.join(workdir, 'history.db'),
+        'SUBSCRIPTIONS_DB': os.path.join(workdir, 'subscriptions.db'),
+        'YAHOO_BASE_URL': urls['yahoo'],
+        'COINGECKO_BASE_URL': urls['coingecko'],
+        'COINBASE_BASE_URL': urls['coinbase'],
+        'FRANKFURTER_BASE_URL': urls['frankfurter'],
+        'METALS_BASE_URL': urls['metals'],
+        'FRED_BASE_URL': urls['fred'],
+        'FEAR_GREED_BASE_URL': urls['feargreed'],
+        'NEWS_RSS_URL': urls['rss'] + '/rss',
+        'ANTHROPIC_BASE_URL': urls['anthropic'],
+        'TELEGRAM_API_URL': urls['telegram'],
+        # Hybrid bot
+        'TELEGRAM_BOT_TOKEN': 'bench', 'TELEGRAM_CHAT_ID': '1', 'ALPHA_VANTAGE_KEY': 'bench',
+        'AV_CALLS_PER_MINUTE': '100000', 'AV_CALLS_PER_DAY': '1000000',
+        'COINGECKO_CALLS_PER_MINUTE': '100000', 'FOREX_CALLS_PER_MINUTE': '100000',
+        'ALPHA_VANTAGE_URL': urls['alphavantage'] + '/query',
+        'COINGECKO_URL': urls['coingecko'] + '/api/v3/simple/price',
+        'FOREX_URL': urls['forex'] + '/v6/latest/USD',
+    })
+
+
+def load_hybrid(workdir):
+    loader = SourceFileLoader('market_bot_complete', os.path.join(ROOT, 'Market bot complete· PY'))
+    spec = importlib.util.spec_from_loader(loader.name, loader)
+    module = importlib.util.module_from_spec(spec)
+    loader.exec_module(module)
+    module.CACHE_FILE = os.path.join(workdir, 'market_cache.db')
+    return module
+
+
+async def measure(name, runs, stand_ins, once):
+    before = {s.name: s.requests for s in stand_ins}
+    latencies = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        await once()
+        latencies.append(time.perf_counter() - started)
+    requests = {s.name: round((s.requests - before[s.name]) / runs, 1)
+                for s in stand_ins if s.requests != before[s.name]}
+    return {'scenario': name, 'runs': runs, 'p50': percentile(latencies, 50),
+            'p99': percentile(latencies, 99), 'mean': sum(latencies) / runs, 'requests_per_run': requests}
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+    faults = parse_faults(args)
+    stand_ins = [StandIn(name, routes, faults[name], rng) for name, routes in ROUTES.items()]
+    urls = {s.name: await s.start() for s in stand_ins}
+    workdir = tempfile.mkdtemp(prefix='bench-')
+    configure_env(urls, workdir)
+
+    import bot
+    from telegram_delivery import BotAPI, DeliveryQueue
+    transport = BotAPI('bench', base_url=urls['telegram'])
+    # The report goes out in several chunks: lift the one-message-per-second per-chat pacing,
+    # which is Telegram's limit and not pipeline cost
+    bot.delivery = DeliveryQueue(workers=bot.TELEGRAM_SEND_WORKERS, chat_per_minute=60000)
+
+    async def report_once():
+        # Cold run: no snapshot, headline or analysis caches carried over
+        bot.market_cache = bot.MarketSnapshotCache(store=bot.get_market_store)
+        bot.analysis_cache = bot.AnalysisCache()
+        bot.news_store = bot.NewsStore(bot.news_sources(), refresh_interval=bot.NEWS_REFRESH_MINUTES * 60,
+                                       health=bot.health)
+        bot._yahoo_batch_disabled_until = 0.0
+        await bot.generate_and_send_report(transport, chat_id=1)
+
+    hybrid = load_hybrid(workdir)
+
+    async def update_once():
+        await hybrid.update_all_markets()
+
+    results = []
+    try:
+        if 'report' in args.scenarios:
+            results.append(await measure('report', args.runs, stand_ins, report_once))
+        if 'update' in args.scenarios:
+            results.append(await measure('update', args.runs, stand_ins, update_once))
+    finally:
+        await bot.delivery.close()
+        await bot.close_http_session()
+        await transport.close()
+        for s in stand_ins:
+            await s.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=20, help='upstream latency (ms)')
+    parser.add_argument('--jitter', type=float, default=10, help='latency jitter (ms)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of 503 responses')
+    parser.add_argument('--rate-429', type=float, default=0.0, help='share of 429 responses')
+    parser.add_argument('--llm-latency', type=float, default=200, help='fake Anthropic latency (ms)')
+    parser.add_argument('--fault', action='append', default=[],
+                        help='per stand-in override, e.g. yahoo:latency=300,errors=0.2,429=0.1')
+    parser.add_argument('--scenarios', default='report,update')
+    parser.add_argument('--max-p99', default='', help='budgets in seconds, e.g. report=3,update=2')
+    parser.add_argument('--json', help='write results to this file')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)  # the bots log every step; keep the table readable
+    results = asyncio.run(run(args))
+
+    print(f"{'scenario':<10}{'runs':>6}{'p50':>9}{'p99':>9}{'mean':>9}  requests/run")
+    for r in results:
+        reqs = ", ".join(f"{k}={v:g}" for k, v in sorted(r['requests_per_run'].items()))
+        print(f"{r['scenario']:<10}{r['runs']:>6}{r['p50']:>8.3f}s{r['p99']:>8.3f}s{r['mean']:>8.3f}s  {reqs}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    budgets = {k: float(v) for k, v in (b.split('=') for b in filter(None, args.max_p99.split(',')))}
+    over = [r for r in results if r['scenario'] in budgets and r['p99'] > budgets[r['scenario']]]
+    for r in over:
+        print(f"❌ {r['scenario']} p99 {r['p99']:.3f}s over budget {budgets[r['scenario']]:.3f}s")
+    sys.exit(1 if over else 0)
+
+
+if __name__ == '__main__':
+    main()
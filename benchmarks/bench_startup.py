@@ -0,0 +1,174 @@
+"""
+Cold-start benchmark for bot.py: import-time profile and time to the first /start answer.
+
+1. Runs `python -X importtime -c "import bot"` and lists the slowest top-level imports.
+2. Starts `python bot.py` as a fresh process against a fake Telegram API (and the
+   offline stand-ins from bench_pipeline.py for every market data source), hands it a
+   /start update, and measures the time from process spawn until the bot's answer
+   reaches the fake sendMessage. Polling by default, --webhook to POST the update to
+   the bot's webhook server instead.
+
+    python benchmarks/bench_startup.py [--runs 5] [--webhook] [--top 12] [--max-first-answer 3]
+
+Exits with status 1 when --max-first-answer (seconds, p50) is exceeded.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import aiohttp
+from aiohttp import web
+
+from bench_pipeline import ROOT, ROUTES, Fault, StandIn, configure_env
+
+START_UPDATE = {
+    'update_id': 1,
+    'message': {
+        'message_id': 1, 'date': 0, 'text': '/start',
+        'chat': {'id': 42, 'type': 'private'},
+        'from': {'id': 42, 'is_bot': False, 'first_name': 'Bench'},
+        'entities': [{'type': 'bot_command', 'offset': 0, 'length': 6}],
+    },
+}
+
+
+class FakeTelegram:
+    """Just enough Bot API for python-telegram-bot to start, poll once and answer."""
+
+    def __init__(self):
+        self.answered = asyncio.Event()
+        self.answered_at = None
+        self.delivered = False
+
+    async def handle(self, request):
+        method = request.match_info['method']
+        if method == 'getMe':
+            return web.json_response({'ok': True, 'result': {'id': 1, 'is_bot': True, 'first_name': 'Bench',
+                                                             'username': 'bench_bot'}})
+        if method == 'getUpdates':
+            if not self.delivered:
+                self.delivered = True
+                return web.json_response({'ok': True, 'result': [START_UPDATE]})
+            await asyncio.sleep(0.5)
+            return web.json_response({'ok': True, 'result': []})
+        if method == 'sendMessage':
+            if self.answered_at is None:
+                self.answered_at = time.perf_counter()
+                self.answered.set()
+            return web.json_response({'ok': True, 'result': {'message_id': 2, 'date': 0, 'text': 'ok',
+                                                             'chat': {'id': 42, 'type': 'private'}}})
+        return web.json_response({'ok': True, 'result': True})
+
+
+def import_profile(top):
+    """(total seconds, [(seconds, module)]) for `import bot`, cumulative per top-level import."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import bot'],
+                            cwd=ROOT, capture_output=True, text=True, env=os.environ)
+    total, modules = 0.0, []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        name = name[1:].rstrip()
+        # Direct imports of bot.py are indented by exactly two spaces (bot itself has none)
+        if name.startswith('  ') and not name.startswith('   '):
+            modules.append((int(cumulative) / 1e6, name.strip()))
+        elif name == 'bot':
+            total = int(cumulative) / 1e6
+    return total, sorted(modules, reverse=True)[:top]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+async def post_until_accepted(port, timeout=30):
+    deadline = time.perf_counter() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.perf_counter() < deadline:
+            try:
+                async with session.post(f"http://127.0.0.1:{port}/telegram", json=START_UPDATE,
+                                        headers={'X-Telegram-Bot-Api-Secret-Token': 'bench'}) as resp:
+                    if resp.status == 200:
+                        return
+            except aiohttp.ClientConnectionError:
+                pass
+            await asyncio.sleep(0.01)
+    raise TimeoutError("webhook server never came up")
+
+
+async def first_answer(telegram_url, fake, webhook):
+    env = dict(os.environ, TELEGRAM_API_URL=telegram_url)
+    if webhook:
+        port = free_port()
+        env.update(WEBHOOK_URL='https://bench.invalid', WEBHOOK_PORT=str(port), WEBHOOK_SECRET='bench')
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, 'bot.py'], cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if webhook:
+            await post_until_accepted(port)
+        await asyncio.wait_for(fake.answered.wait(), timeout=60)
+        return fake.answered_at - started
+    finally:
+        process.terminate()
+        await asyncio.to_thread(process.wait)
+
+
+async def run(args):
+    rng = random.Random(7)
+    stand_ins = [StandIn(name, routes, Fault(), rng) for name, routes in ROUTES.items() if name != 'telegram']
+    urls = {s.name: await s.start() for s in stand_ins}
+    workdir = tempfile.mkdtemp(prefix='bench-startup-')
+    configure_env({**urls, 'telegram': ''}, workdir)
+
+    timings = []
+    for _ in range(args.runs):
+        fake = FakeTelegram()
+        telegram = StandIn('telegram', [('POST', '/{bot_token}/{method}', fake.handle)], Fault(latency=0, jitter=0), rng)
+        await telegram.start()
+        try:
+            timings.append(await first_answer(telegram.base_url, fake, args.webhook))
+        finally:
+            await telegram.stop()
+    for s in stand_ins:
+        await s.stop()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--webhook', action='store_true', help='deliver /start by webhook instead of polling')
+    parser.add_argument('--top', type=int, default=12, help='slowest imports to list')
+    parser.add_argument('--max-first-answer', type=float, help='budget (seconds) for the p50 first answer')
+    args = parser.parse_args()
+
+    timings = asyncio.run(run(args))
+
+    total, modules = import_profile(args.top)
+    print(f"import bot: {total:.3f}s")
+    for seconds, name in modules:
+        print(f"  {seconds:7.3f}s  {name}")
+
+    timings.sort()
+    p50 = timings[len(timings) // 2]
+    mode = 'webhook' if args.webhook else 'polling'
+    print(f"first /start answer ({mode}, {len(timings)} runs): p50 {p50:.3f}s, "
+          f"min {timings[0]:.3f}s, max {timings[-1]:.3f}s")
+    if args.max_first_answer is not None and p50 > args.max_first_answer:
+        print(f"❌ first answer p50 {p50:.3f}s over budget {args.max_first_answer:.3f}s")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
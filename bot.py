@@ -3,11 +3,27 @@ import logging
 import asyncio
 import aiohttp
 import json
-from datetime import datetime, timezone
-from telegram import Update, Bot
+import time
+import hashlib
+import re
+from urllib.parse import quote, urlsplit
+from datetime import datetime, timedelta, timezone
+from telegram import Update
 from telegram.ext import Application, CommandHandler, ContextTypes
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from anthropic import Anthropic
+
+from alerts import AlertEngine, format_alert
+from market_store import MarketStore, fill_changes
+from provider_health import HealthRegistry, CLOSED, OPEN, HALF_OPEN
+from news_feed import FeedSource, NewsStore, GOOGLE_NEWS_BUSINESS_RSS
+from telegram_delivery import DeliveryQueue, classify
+from subscriptions import SubscriptionStore, filter_snapshot, parse_symbols
+from render_cache import RenderCache
+from metrics import Registry, start_server as start_metrics_server
+from webhook import default_secret, run_webhook
+from price_stream import PriceBook, PriceStream, COINBASE_WS_FEED
+from change_gate import ChangeGate, format_delta
+from coordination import LeaderElector, LeaseStore
 
 # ============================================================
 # LOGGING
@@ -23,40 +39,266 @@ TELEGRAM_TOKEN = os.environ['TELEGRAM_TOKEN']
 CHAT_ID = os.environ['CHAT_ID']
 CLAUDE_API_KEY = os.environ['CLAUDE_API_KEY']
 NEWS_API_KEY = os.environ.get('NEWS_API_KEY', '')
+NEWS_REFRESH_MINUTES = int(os.environ.get('NEWS_REFRESH_MINUTES', '10'))
+
+# Global deadline (seconds) for one market data cycle; slower sources are dropped
+FETCH_DEADLINE = float(os.environ.get('FETCH_DEADLINE', '6'))
+
+# Circuit breaker: consecutive failures before a provider is skipped, and for how long (seconds)
+CIRCUIT_FAILURES = int(os.environ.get('CIRCUIT_FAILURES', '3'))
+CIRCUIT_COOLDOWN = int(os.environ.get('CIRCUIT_COOLDOWN', '300'))
+
+# Real-time alerts (same settings as the config file, overridable on Railway)
+ENABLE_ALERTS = os.environ.get('ENABLE_ALERTS', 'false').lower() in ('1', 'true', 'yes')
+ALERT_THRESHOLD = float(os.environ.get('ALERT_THRESHOLD', '5.0'))
+ALERT_SYMBOLS = [s.strip() for s in os.environ.get('ALERT_SYMBOLS', 'BTC-USD,ES=F,^VIX').split(',') if s.strip()]
+SIGNIFICANT_CHANGE_THRESHOLD = float(os.environ.get('SIGNIFICANT_CHANGE_THRESHOLD', '2.0'))
+ALERT_INTERVAL = int(os.environ.get('ALERT_INTERVAL', '30'))
+ALERT_COOLDOWN_MINUTES = int(os.environ.get('ALERT_COOLDOWN_MINUTES', '30'))
+
+# Minimum seconds between progressive edits of a streamed report
+STREAM_EDIT_INTERVAL = float(os.environ.get('STREAM_EDIT_INTERVAL', '1.5'))
+
+# Local price history (SQLite) and how many days of it to keep
+MARKET_DB = os.environ.get('MARKET_DB', 'market_history.db')
+MARKET_HISTORY_DAYS = int(os.environ.get('MARKET_HISTORY_DAYS', '180'))
+ANALYTICS_LOOKBACK_DAYS = int(os.environ.get('ANALYTICS_LOOKBACK_DAYS', '30'))
+
+# How long an identical snapshot + headlines reuses the previous analysis (seconds)
+ANALYSIS_CACHE_TTL = float(os.environ.get('ANALYSIS_CACHE_TTL', '1800'))
+
+# Concurrent Telegram senders (Telegram's own limits are enforced by the delivery queue)
+TELEGRAM_SEND_WORKERS = int(os.environ.get('TELEGRAM_SEND_WORKERS', '4'))
+
+# Subscribed chats and their watchlists; how many chats a broadcast sends to at once
+SUBSCRIPTIONS_DB = os.environ.get('SUBSCRIPTIONS_DB', 'subscriptions.db')
+BROADCAST_WORKERS = int(os.environ.get('BROADCAST_WORKERS', '8'))
+
+# Prometheus /metrics endpoint (0 disables it)
+METRICS_PORT = int(os.environ.get('METRICS_PORT', '9100'))
+
+# Webhook mode: set WEBHOOK_URL (public https base) to receive updates by webhook instead of polling
+WEBHOOK_URL = os.environ.get('WEBHOOK_URL', '')
+WEBHOOK_SECRET = os.environ.get('WEBHOOK_SECRET') or default_secret(TELEGRAM_TOKEN)
+WEBHOOK_PATH = os.environ.get('WEBHOOK_PATH', '/telegram')
+WEBHOOK_PORT = int(os.environ.get('WEBHOOK_PORT', os.environ.get('PORT', '8443')))
+WEBHOOK_WORKERS = int(os.environ.get('WEBHOOK_WORKERS', '8'))
+WEBHOOK_QUEUE = int(os.environ.get('WEBHOOK_QUEUE', '256'))
+
+# Optional streaming crypto prices (WebSocket ticker feed); polled sources are the fallback
+CRYPTO_STREAM = os.environ.get('CRYPTO_STREAM', 'false').lower() in ('1', 'true', 'yes')
+CRYPTO_STREAM_URL = os.environ.get('CRYPTO_STREAM_URL', COINBASE_WS_FEED)
+# Stream prices older than this (seconds) are ignored
+CRYPTO_STREAM_MAX_AGE = float(os.environ.get('CRYPTO_STREAM_MAX_AGE', '60'))
+
+# Change gate for scheduled reports: 'delta' sends a templated no-change note when markets are flat,
+# 'skip' sends nothing, 'off' always runs the full report
+CHANGE_GATE = os.environ.get('CHANGE_GATE', 'delta').lower()
+# Minimum moves since the last report: % per asset class, yields/VIX/Fear & Greed in points
+CHANGE_THRESHOLDS = {
+    'indices': float(os.environ.get('CHANGE_INDICES_PCT', '1.0')),
+    'commodities': float(os.environ.get('CHANGE_COMMODITIES_PCT', '1.5')),
+    'crypto': float(os.environ.get('CHANGE_CRYPTO_PCT', '3.0')),
+    'forex': float(os.environ.get('CHANGE_FOREX_PCT', '0.5')),
+    'yields': float(os.environ.get('CHANGE_YIELDS_PTS', '0.10')),
+}
+CHANGE_FEAR_GREED_PTS = float(os.environ.get('CHANGE_FEAR_GREED_PTS', '10'))
+CHANGE_VIX_PTS = float(os.environ.get('CHANGE_VIX_PTS', '2.0'))
+# A full report goes out at least this often, however flat the markets (hours)
+CHANGE_MAX_QUIET_HOURS = float(os.environ.get('CHANGE_MAX_QUIET_HOURS', '24'))
+
+# Several replicas: a SQLite file on a volume they all mount (empty = single instance, always leader).
+# The leader runs scheduled reports, alerts and all upstream fetching; followers serve what it publishes.
+# SUBSCRIPTIONS_DB and MARKET_DB must then live on that shared volume too.
+COORDINATION_DB = os.environ.get('COORDINATION_DB', '')
+LEADER_LEASE_SECONDS = float(os.environ.get('LEADER_LEASE_SECONDS', '10'))
+# How long a follower waits for the leader's first publication before answering "warming up" (seconds)
+SHARED_WAIT_SECONDS = float(os.environ.get('SHARED_WAIT_SECONDS', '5'))
+# How often the leader refreshes and republishes the shared snapshot (seconds)
+SNAPSHOT_PUBLISH_SECONDS = int(os.environ.get('SNAPSHOT_PUBLISH_SECONDS', '60'))
+
+# Upstream base URLs, overridable to run against local stand-ins (benchmarks/bench_pipeline.py).
+# The Anthropic client reads ANTHROPIC_BASE_URL itself.
+YAHOO_BASE_URL = os.environ.get('YAHOO_BASE_URL', 'https://query1.finance.yahoo.com')
+COINGECKO_BASE_URL = os.environ.get('COINGECKO_BASE_URL', 'https://api.coingecko.com')
+COINBASE_BASE_URL = os.environ.get('COINBASE_BASE_URL', 'https://api.coinbase.com')
+FRANKFURTER_BASE_URL = os.environ.get('FRANKFURTER_BASE_URL', 'https://api.frankfurter.app')
+METALS_BASE_URL = os.environ.get('METALS_BASE_URL', 'https://api.metals.live')
+FRED_BASE_URL = os.environ.get('FRED_BASE_URL', 'https://api.stlouisfed.org')
+FEAR_GREED_BASE_URL = os.environ.get('FEAR_GREED_BASE_URL', 'https://api.alternative.me')
+NEWSAPI_BASE_URL = os.environ.get('NEWSAPI_BASE_URL', 'https://newsapi.org')
+NEWS_RSS_URL = os.environ.get('NEWS_RSS_URL', GOOGLE_NEWS_BUSINESS_RSS)
+TELEGRAM_API_URL = os.environ.get('TELEGRAM_API_URL', 'https://api.telegram.org')
+
+# Cold start: the first scheduled report waits this long (seconds) so commands are answered first;
+# meanwhile a background warm-up loads the heavy modules and primes the caches
+FIRST_REPORT_DELAY = int(os.environ.get('FIRST_REPORT_DELAY', '120'))
+WARM_UP = os.environ.get('WARM_UP', 'true').lower() in ('1', 'true', 'yes')
+
+_claude = None
+
+def get_claude():
+    """The Anthropic client, imported and created on first use (the SDK is slow to import)."""
+    global _claude
+    if _claude is None:
+        from anthropic import AsyncAnthropic
+        _claude = AsyncAnthropic(api_key=CLAUDE_API_KEY)
+    return _claude
+
+# ============================================================
+# METRICS
+# ============================================================
+
+registry = Registry()
+stage_seconds = registry.histogram('bot_stage_seconds', 'Duration of report pipeline stages')
+source_seconds = registry.histogram('bot_source_seconds', 'Duration of each market data source in a fetch cycle')
+provider_seconds = registry.histogram('bot_provider_request_seconds', 'Upstream HTTP request latency per provider')
+provider_requests = registry.counter('bot_provider_requests_total', 'Upstream HTTP requests per provider and outcome')
+analysis_lookups = registry.counter('bot_analysis_total', 'Analyses by outcome (generated, cached, fallback)')
+reports_total = registry.counter('bot_reports_total', 'Reports by trigger and outcome')
+telegram_messages = registry.counter('bot_telegram_messages_total', 'Telegram messages sent by outcome')
+
+# ============================================================
+# SHARED HTTP CLIENT
+# ============================================================
+
+_http_session = None
+
+def get_http_session():
+    """The application-wide aiohttp session (keep-alive, DNS cache, per-host limits).
+
+    Normally opened by the Application post-init hook; created on first use
+    if something needs it earlier.
+    """
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=50,
+            limit_per_host=8,
+            ttl_dns_cache=300,
+            keepalive_timeout=60,
+        )
+        _http_session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=15, connect=5, sock_read=10),
+        )
+    return _http_session
 
-claude = Anthropic(api_key=CLAUDE_API_KEY)
+async def close_http_session():
+    """Close the shared session on shutdown."""
+    global _http_session
+    if _http_session is not None and not _http_session.closed:
+        await _http_session.close()
+    _http_session = None
 
 # ============================================================
 # MULTI-SOURCE MARKET DATA (No yfinance!)
 # ============================================================
 
+# Friendly provider names for the health registry, by host[:port]
+PROVIDER_NAMES = {
+    urlsplit(url).netloc: name for url, name in (
+        (YAHOO_BASE_URL, 'Yahoo Finance'),
+        (COINGECKO_BASE_URL, 'CoinGecko'),
+        (COINBASE_BASE_URL, 'Coinbase'),
+        (FRANKFURTER_BASE_URL, 'ECB Forex'),
+        (METALS_BASE_URL, 'Metals API'),
+        (FRED_BASE_URL, 'FRED'),
+        (FEAR_GREED_BASE_URL, 'Fear & Greed'),
+        (NEWSAPI_BASE_URL, 'NewsAPI'),
+        (NEWS_RSS_URL, 'Google News'),
+    )
+}
+
+health = HealthRegistry(failure_threshold=CIRCUIT_FAILURES, cooldown=CIRCUIT_COOLDOWN)
+
+def provider_name(url):
+    host = urlsplit(url).netloc or url
+    return PROVIDER_NAMES.get(host, host)
+
 async def fetch_json(session, url, headers=None, timeout=10):
-    """Safe JSON fetch with timeout."""
+    """Safe JSON fetch with timeout, reported to the health registry.
+
+    Providers whose circuit is open are skipped without a request.
+    """
+    provider = provider_name(url)
+    if not health.allow(provider):
+        logger.debug(f"Skipping {provider}: circuit open")
+        provider_requests.inc(provider=provider, outcome='skipped')
+        return None
+
+    started = time.monotonic()
+    error = None
     try:
         async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
             if resp.status == 200:
-                return await resp.json()
+                data = await resp.json()
+                latency = time.monotonic() - started
+                health.record(provider, True, latency)
+                provider_seconds.observe(latency, provider=provider)
+                provider_requests.inc(provider=provider, outcome='ok')
+                return data
+            error = f"HTTP {resp.status}"
+    except asyncio.CancelledError:
+        # Dropped by the cycle deadline: a call that hangs past it counts as a timeout,
+        # so a hanging provider still trips its breaker (and a cancelled probe reopens it)
+        latency = time.monotonic() - started
+        health.record(provider, False, latency, f"cancelled after {latency:.1f}s")
+        provider_seconds.observe(latency, provider=provider)
+        provider_requests.inc(provider=provider, outcome='timeout')
+        raise
     except Exception as e:
-        logger.warning(f"Fetch failed: {url[:60]}... - {e}")
+        error = str(e) or type(e).__name__
+        logger.warning(f"Fetch failed: {url[:60]}... - {error}")
+    latency = time.monotonic() - started
+    health.record(provider, False, latency, error)
+    provider_seconds.observe(latency, provider=provider)
+    provider_requests.inc(provider=provider, outcome='error')
     return None
 
+# ============================================================
+# LIVE CRYPTO PRICE BOOK
+# ============================================================
+
+# Streamed product id -> snapshot symbol (the same pairs CoinGecko and Coinbase report)
+CRYPTO_PRODUCTS = {
+    'BTC-USD': 'BTC/USD',
+    'ETH-USD': 'ETH/USD',
+    'SOL-USD': 'SOL/USD',
+    'ADA-USD': 'ADA/USD',
+    'XRP-USD': 'XRP/USD',
+}
+
+price_book = PriceBook(CRYPTO_PRODUCTS)
+price_stream = PriceStream(price_book, CRYPTO_STREAM_URL)
+
+def live_crypto(products=None):
+    """Fresh streamed crypto quotes (empty when the stream is off or stale)."""
+    return price_book.quotes(CRYPTO_STREAM_MAX_AGE, products)
+
 async def get_coinbase_btc(session):
     """BTC from Coinbase (free, no key)."""
-    data = await fetch_json(session, "https://api.coinbase.com/v2/prices/BTC-USD/spot")
+    live = live_crypto(['BTC-USD'])
+    if live:
+        return live[0]
+    data = await fetch_json(session, f"{COINBASE_BASE_URL}/v2/prices/BTC-USD/spot")
     if data and 'data' in data:
         return {'symbol': 'BTC/USD', 'price': float(data['data']['amount']), 'source': 'Coinbase'}
     return None
 
 async def get_coinbase_eth(session):
     """ETH from Coinbase."""
-    data = await fetch_json(session, "https://api.coinbase.com/v2/prices/ETH-USD/spot")
+    live = live_crypto(['ETH-USD'])
+    if live:
+        return live[0]
+    data = await fetch_json(session, f"{COINBASE_BASE_URL}/v2/prices/ETH-USD/spot")
     if data and 'data' in data:
         return {'symbol': 'ETH/USD', 'price': float(data['data']['amount']), 'source': 'Coinbase'}
     return None
 
 async def get_forex_ecb(session):
     """EUR/USD, GBP/USD, USD/JPY from ECB (free, no key)."""
-    data = await fetch_json(session, "https://api.frankfurter.app/latest?from=USD&to=EUR,GBP,JPY,CHF,CAD,AUD")
+    data = await fetch_json(session, f"{FRANKFURTER_BASE_URL}/latest?from=USD&to=EUR,GBP,JPY,CHF,CAD,AUD")
     if data and 'rates' in data:
         results = []
         rates = data['rates']
@@ -79,7 +321,7 @@ async def get_metals_price(session):
     """Gold/Silver from free metals API."""
     # Try multiple free sources
     # Source 1: metals.live
-    data = await fetch_json(session, "https://api.metals.live/v1/spot")
+    data = await fetch_json(session, f"{METALS_BASE_URL}/v1/spot")
     if data and isinstance(data, list):
         results = []
         for item in data:
@@ -91,7 +333,7 @@ async def get_metals_price(session):
             return results
 
     # Source 2: frankfurter for gold via proxy
-    data = await fetch_json(session, "https://api.frankfurter.app/latest?from=XAU&to=USD")
+    data = await fetch_json(session, f"{FRANKFURTER_BASE_URL}/latest?from=XAU&to=USD")
     if data and 'rates' in data and 'USD' in data['rates']:
         return [{'symbol': 'Gold (XAU)', 'price': float(data['rates']['USD']), 'source': 'ECB'}]
 
@@ -99,15 +341,18 @@ async def get_metals_price(session):
 
 async def get_fear_greed(session):
     """Crypto Fear & Greed Index."""
-    data = await fetch_json(session, "https://api.alternative.me/fng/?limit=1")
+    data = await fetch_json(session, f"{FEAR_GREED_BASE_URL}/fng/?limit=1")
     if data and 'data' in data and len(data['data']) > 0:
         d = data['data'][0]
         return {'value': int(d['value']), 'classification': d['value_classification']}
     return None
 
 async def get_coingecko_data(session):
-    """Top crypto from CoinGecko (free, no key, 10-50 calls/min)."""
-    url = "https://api.coingecko.com/api/v3/simple/price?ids=bitcoin,ethereum,solana,cardano,ripple&vs_currencies=usd&include_24hr_change=true&include_market_cap=true"
+    """Top crypto from CoinGecko (free, no key, 10-50 calls/min); the live price book when it has them all."""
+    live = live_crypto()
+    if len(live) == len(CRYPTO_PRODUCTS):
+        return live
+    url = f"{COINGECKO_BASE_URL}/api/v3/simple/price?ids=bitcoin,ethereum,solana,cardano,ripple&vs_currencies=usd&include_24hr_change=true&include_market_cap=true"
     data = await fetch_json(session, url)
     if data:
         results = []
@@ -128,74 +373,117 @@ async def get_coingecko_data(session):
         return results
     return []
 
-async def get_stock_indices_google(session):
-    """Try to get major indices from multiple free sources."""
-    results = []
-
-    # Source: Yahoo Finance v8 API (direct, not yfinance library)
-    symbols = {
-        '^GSPC': 'S&P 500',
-        '^IXIC': 'NASDAQ',
-        '^DJI': 'Dow Jones',
-        '^RUT': 'Russell 2000',
-        '^VIX': 'VIX',
-        '^FTSE': 'FTSE 100',
-        '^N225': 'Nikkei 225',
+YAHOO_HEADERS = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
+YAHOO_CONCURRENCY = int(os.environ.get('YAHOO_CONCURRENCY', '4'))
+# How long to stop trying the multi-symbol endpoint after it refuses us (seconds)
+YAHOO_BATCH_RETRY = 3600
+
+_yahoo_batch_disabled_until = 0.0
+_yahoo_limit = None
+
+def yahoo_semaphore():
+    """One concurrency limit shared by every Yahoo chart call (recreated if the event loop changes)."""
+    global _yahoo_limit
+    loop = asyncio.get_running_loop()
+    if _yahoo_limit is None or _yahoo_limit[0] is not loop:
+        _yahoo_limit = (loop, asyncio.Semaphore(YAHOO_CONCURRENCY))
+    return _yahoo_limit[1]
+
+def parse_yahoo_quote(name, price, prev):
+    """Build a quote item from a Yahoo price and previous close."""
+    change_pct = ((price - prev) / prev * 100) if prev else 0
+    return {
+        'symbol': name,
+        'price': round(price, 2),
+        'change_pct': round(change_pct, 2),
+        'source': 'Yahoo'
     }
 
-    for yf_symbol, name in symbols.items():
-        url = f"https://query1.finance.yahoo.com/v8/finance/chart/{yf_symbol}?interval=1d&range=2d"
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
-        data = await fetch_json(session, url, headers=headers, timeout=8)
-        if data and 'chart' in data and 'result' in data['chart']:
-            try:
-                result = data['chart']['result'][0]
-                meta = result['meta']
-                price = meta.get('regularMarketPrice', 0)
-                prev = meta.get('chartPreviousClose', 0)
-                change_pct = ((price - prev) / prev * 100) if prev else 0
-                results.append({
-                    'symbol': name,
-                    'price': round(price, 2),
-                    'change_pct': round(change_pct, 2),
-                    'source': 'Yahoo'
-                })
-            except Exception as e:
-                logger.warning(f"Parse error for {name}: {e}")
-
+async def _yahoo_batch_quotes(session, symbols):
+    """All symbols in one v7 quote request. Returns {yahoo_symbol: item}, empty if refused."""
+    global _yahoo_batch_disabled_until
+    if time.monotonic() < _yahoo_batch_disabled_until:
+        return {}
+
+    url = f"{YAHOO_BASE_URL}/v7/finance/quote?symbols={quote(','.join(symbols), safe=',')}"
+    data = await fetch_json(session, url, headers=YAHOO_HEADERS, timeout=8)
+    rows = ((data or {}).get('quoteResponse') or {}).get('result')
+    if not rows and data is None and health.state(provider_name(url)) != CLOSED:
+        # Skipped (or failed) with Yahoo's circuit open: the breaker already holds off, not a batch refusal
+        return {}
+    if not rows:
+        # Yahoo wants a crumb for v7 more often than not; stop paying for the round trip
+        _yahoo_batch_disabled_until = time.monotonic() + YAHOO_BATCH_RETRY
+        logger.info("Yahoo batch quote unavailable, using per-symbol chart calls")
+        return {}
+
+    results = {}
+    for row in rows:
+        yf_symbol = row.get('symbol')
+        if yf_symbol in symbols and row.get('regularMarketPrice') is not None:
+            results[yf_symbol] = parse_yahoo_quote(
+                symbols[yf_symbol], row['regularMarketPrice'], row.get('regularMarketPreviousClose', 0))
     return results
 
-async def get_commodity_yahoo(session):
-    """Commodities from Yahoo v8 API."""
-    results = []
-    symbols = {
-        'GC=F': 'Gold',
-        'SI=F': 'Silver',
-        'CL=F': 'WTI Crude',
-        'BZ=F': 'Brent Crude',
-        'NG=F': 'Natural Gas',
-    }
-    headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
-
-    for yf_symbol, name in symbols.items():
-        url = f"https://query1.finance.yahoo.com/v8/finance/chart/{yf_symbol}?interval=1d&range=2d"
-        data = await fetch_json(session, url, headers=headers, timeout=8)
-        if data and 'chart' in data and 'result' in data['chart']:
-            try:
-                meta = data['chart']['result'][0]['meta']
-                price = meta.get('regularMarketPrice', 0)
-                prev = meta.get('chartPreviousClose', 0)
-                change_pct = ((price - prev) / prev * 100) if prev else 0
-                results.append({
-                    'symbol': name,
-                    'price': round(price, 2),
-                    'change_pct': round(change_pct, 2),
-                    'source': 'Yahoo'
-                })
-            except:
-                pass
+async def _yahoo_chart_quote(session, yf_symbol, name):
+    """One symbol from the v8 chart endpoint."""
+    url = f"{YAHOO_BASE_URL}/v8/finance/chart/{quote(yf_symbol)}?interval=1d&range=1d"
+    async with yahoo_semaphore():
+        data = await fetch_json(session, url, headers=YAHOO_HEADERS, timeout=8)
+    if data and 'chart' in data and data['chart'].get('result'):
+        try:
+            meta = data['chart']['result'][0]['meta']
+            return parse_yahoo_quote(name, meta.get('regularMarketPrice', 0), meta.get('chartPreviousClose', 0))
+        except Exception as e:
+            logger.warning(f"Parse error for {name}: {e}")
+    return None
 
-    return results
+async def get_yahoo_quotes(session, symbols):
+    """Quotes for a {yahoo_symbol: display_name} map, in input order.
+
+    Tries the multi-symbol quote endpoint first, then fans out chart calls
+    under the shared Yahoo semaphore for whatever it did not return.
+    """
+    found = await _yahoo_batch_quotes(session, symbols)
+
+    missing = [s for s in symbols if s not in found]
+    if missing:
+        items = await asyncio.gather(*(_yahoo_chart_quote(session, s, symbols[s]) for s in missing))
+        found.update((s, item) for s, item in zip(missing, items) if item)
+
+    return [found[s] for s in symbols if s in found]
+
+YAHOO_INDICES = {
+    '^GSPC': 'S&P 500',
+    '^IXIC': 'NASDAQ',
+    '^DJI': 'Dow Jones',
+    '^RUT': 'Russell 2000',
+    '^VIX': 'VIX',
+    '^FTSE': 'FTSE 100',
+    '^N225': 'Nikkei 225',
+}
+
+YAHOO_COMMODITIES = {
+    'GC=F': 'Gold',
+    'SI=F': 'Silver',
+    'CL=F': 'WTI Crude',
+    'BZ=F': 'Brent Crude',
+    'NG=F': 'Natural Gas',
+}
+
+async def get_yahoo_markets(session):
+    """Major indices and commodities from Yahoo Finance (direct API, not yfinance library).
+
+    All symbols go through one get_yahoo_quotes call: one batch attempt per cycle.
+    """
+    quotes = await get_yahoo_quotes(session, {**YAHOO_INDICES, **YAHOO_COMMODITIES})
+    if not quotes:
+        return {}
+    indices = set(YAHOO_INDICES.values())
+    return {
+        'indices': [q for q in quotes if q['symbol'] in indices],
+        'commodities': [q for q in quotes if q['symbol'] not in indices],
+    }
 
 async def get_treasury_yields(session):
     """US Treasury yields from FRED (free, no key for basic)."""
@@ -204,7 +492,7 @@ async def get_treasury_yields(session):
     series = {'DGS2': '2Y', 'DGS10': '10Y', 'DGS30': '30Y'}
 
     for series_id, label in series.items():
-        url = f"https://api.stlouisfed.org/fred/series/observations?series_id={series_id}&sort_order=desc&limit=1&file_type=json&api_key=DEMO_KEY"
+        url = f"{FRED_BASE_URL}/fred/series/observations?series_id={series_id}&sort_order=desc&limit=1&file_type=json&api_key=DEMO_KEY"
         data = await fetch_json(session, url, timeout=8)
         if data and 'observations' in data and len(data['observations']) > 0:
             try:
@@ -216,47 +504,89 @@ async def get_treasury_yields(session):
 
     return results
 
-async def fetch_all_market_data():
-    """Fetch all market data concurrently from multiple free sources."""
-    logger.info("🔄 Fetching market data from multiple free sources...")
-
-    async with aiohttp.ClientSession() as session:
-        # Launch all fetches concurrently
-        tasks = {
-            'indices': get_stock_indices_google(session),
-            'commodities_yahoo': get_commodity_yahoo(session),
-            'metals': get_metals_price(session),
-            'crypto': get_coingecko_data(session),
-            'forex': get_forex_ecb(session),
-            'fear_greed': get_fear_greed(session),
-            'yields': get_treasury_yields(session),
-            'btc': get_coinbase_btc(session),
-            'eth': get_coinbase_eth(session),
-        }
+async def gather_with_deadline(sources, deadline=FETCH_DEADLINE):
+    """Run all source coroutines at once and keep whatever finishes before the deadline.
 
-        results = {}
-        for key, coro in tasks.items():
-            try:
-                results[key] = await coro
-            except Exception as e:
-                logger.error(f"Error fetching {key}: {e}")
-                results[key] = None
+    Returns (results, report): results maps source name to its value (None on
+    failure or timeout), report holds per-source timings and the failures.
+    """
+    started = time.monotonic()
+    timings = {}
+
+    async def run(name, coro):
+        try:
+            return await coro
+        finally:
+            timings[name] = round(time.monotonic() - started, 3)
+
+    tasks = {asyncio.create_task(run(name, coro)): name for name, coro in sources.items()}
+    done, pending = await asyncio.wait(tasks, timeout=deadline) if tasks else (set(), set())
+
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    results = {name: None for name in sources}
+    failed = []
+    for task in done:
+        name = tasks[task]
+        if task.exception():
+            logger.error(f"Error fetching {name}: {task.exception()}")
+            failed.append(name)
+        else:
+            results[name] = task.result()
 
-    # Compile market data
+    report = {
+        'elapsed': round(time.monotonic() - started, 3),
+        'timings': timings,
+        'timed_out': sorted(tasks[t] for t in pending),
+        'failed': sorted(failed),
+    }
+    return results, report
+
+# Market data sources: name -> fetcher(session)
+MARKET_SOURCES = {
+    'yahoo': get_yahoo_markets,
+    'metals': get_metals_price,
+    'crypto': get_coingecko_data,
+    'forex': get_forex_ecb,
+    'fear_greed': get_fear_greed,
+    'yields': get_treasury_yields,
+    'btc': get_coinbase_btc,
+    'eth': get_coinbase_eth,
+}
+
+# How long each source stays fresh in the snapshot cache (seconds)
+SOURCE_TTLS = {
+    'yahoo': 60,
+    'metals': 300,
+    'crypto': 30,
+    'forex': 300,
+    'fear_greed': 900,
+    'yields': 300,
+    'btc': 30,
+    'eth': 30,
+}
+
+def compile_market_data(results, report):
+    """Merge per-source results into the market snapshot used everywhere else."""
+    yahoo = results.get('yahoo') or {}
     market_data = {
         'timestamp': datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M UTC'),
-        'indices': results.get('indices') or [],
+        'indices': list(yahoo.get('indices') or []),
         'commodities': [],
         'crypto': [],
-        'forex': results.get('forex') or [],
-        'yields': results.get('yields') or [],
+        'forex': list(results.get('forex') or []),
+        'yields': list(results.get('yields') or []),
         'fear_greed': results.get('fear_greed'),
+        'sources': report,
     }
 
     # Merge commodities
-    commod_yahoo = results.get('commodities_yahoo') or []
+    commod_yahoo = yahoo.get('commodities') or []
     metals = results.get('metals') or []
-    market_data['commodities'] = commod_yahoo if commod_yahoo else []
+    market_data['commodities'] = list(commod_yahoo)
     # Add metals if not already from yahoo
     metal_names = {c['symbol'] for c in market_data['commodities']}
     for m in metals:
@@ -265,7 +595,7 @@ async def fetch_all_market_data():
 
     # Merge crypto
     crypto_cg = results.get('crypto') or []
-    market_data['crypto'] = crypto_cg
+    market_data['crypto'] = list(crypto_cg)
     # If CoinGecko failed, use Coinbase
     crypto_symbols = {c['symbol'] for c in market_data['crypto']}
     if results.get('btc') and 'BTC/USD' not in crypto_symbols:
@@ -273,40 +603,301 @@ async def fetch_all_market_data():
     if results.get('eth') and 'ETH/USD' not in crypto_symbols:
         market_data['crypto'].insert(1, results['eth'])
 
-    # Count successes
-    total = sum(len(v) for v in [market_data['indices'], market_data['commodities'],
-                                   market_data['crypto'], market_data['forex'], market_data['yields']])
-    logger.info(f"✅ Fetched {total} data points total")
+    return market_data
+
+def count_data_points(market_data):
+    return sum(len(market_data[k]) for k in ('indices', 'commodities', 'crypto', 'forex', 'yields'))
+
+async def fetch_market_sources(names=None):
+    """Fetch the named sources (default: all) concurrently under the cycle deadline."""
+    session = get_http_session()
+    names = list(MARKET_SOURCES) if names is None else names
+    logger.info(f"🔄 Fetching market data from {len(names)} free sources...")
+
+    with stage_seconds.time(stage='market_data'):
+        results, report = await gather_with_deadline({name: MARKET_SOURCES[name](session) for name in names})
+    for name, seconds in report['timings'].items():
+        source_seconds.observe(seconds, source=name)
 
+    logger.info(f"✅ Fetched {len(names) - len(report['timed_out']) - len(report['failed'])}/{len(names)} "
+                f"sources in {report['elapsed']:.2f}s")
+    slowest = sorted(report['timings'].items(), key=lambda kv: kv[1], reverse=True)
+    logger.info("⏱️ Source timings: " + ", ".join(f"{k}={v:.2f}s" for k, v in slowest))
+    if report['timed_out']:
+        logger.warning(f"⌛ Timed out after {FETCH_DEADLINE:.0f}s: {', '.join(report['timed_out'])}")
+    return results, report
+
+async def fetch_all_market_data():
+    """Fetch all market data concurrently from multiple free sources (uncached)."""
+    results, report = await fetch_market_sources()
+    market_data = compile_market_data(results, report)
+    logger.info(f"✅ Fetched {count_data_points(market_data)} data points total")
     return market_data
 
+class MarketSnapshotCache:
+    """Market snapshot with per-source TTLs, stale-while-revalidate and single-flight refresh.
+
+    Concurrent callers share one in-flight refresh. Once warm, stale sources are
+    served immediately while a background refresh updates them; a source that
+    fails keeps its last good value.
+    """
+
+    def __init__(self, fetch=fetch_market_sources, ttls=SOURCE_TTLS, store=None, publish=None):
+        self._fetch = fetch
+        self._ttls = ttls
+        self._store = store
+        self._publish = publish
+        self._values = {}
+        self._attempted = {}
+        self._refreshing = None
+        self.snapshot = None
+        self.version = 0
+
+    def expired(self):
+        """Names of sources whose TTL has run out (or were never fetched)."""
+        now = time.monotonic()
+        return [name for name, ttl in self._ttls.items()
+                if now - self._attempted.get(name, float('-inf')) >= ttl]
+
+    def ages(self):
+        now = time.monotonic()
+        return {name: round(now - t, 1) for name, t in self._attempted.items()}
+
+    async def get(self, fresh=False):
+        """Current snapshot. With fresh=True, wait for expired sources instead of serving them stale."""
+        if self.snapshot is None or (fresh and self.expired()):
+            await asyncio.shield(self.refresh())
+        elif self.expired():
+            self.refresh()
+        return self.snapshot
+
+    def refresh(self):
+        """Start a refresh of the expired sources, or join the one already running."""
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = asyncio.create_task(self._refresh())
+        return self._refreshing
+
+    async def _refresh(self):
+        names = self.expired()
+        if not names and self.snapshot is not None:
+            return
+        started = time.monotonic()
+        try:
+            results, report = await self._fetch(names)
+        except Exception as e:
+            logger.error(f"Snapshot refresh failed: {e}", exc_info=True)
+            if self.snapshot is None:
+                raise
+            return
+
+        for name in names:
+            self._attempted[name] = started
+            if results.get(name):
+                self._values[name] = results[name]
+
+        snapshot = compile_market_data(self._values, {**report, 'age': self.ages()})
+        store = self._store() if self._store else None
+        if store is not None:
+            fresh = compile_market_data({n: results[n] for n in names if results.get(n)}, report)
+            try:
+                await asyncio.to_thread(store.append_snapshot, fresh)
+                await asyncio.to_thread(fill_changes, snapshot, store)
+            except Exception as e:
+                logger.warning(f"History store unavailable: {e}")
+
+        self.version += 1
+        version = self.version
+        if self._publish is not None:
+            # Versions then come from the cluster-wide sequence: an unpublished snapshot stays unversioned
+            try:
+                version = await asyncio.to_thread(self._publish, snapshot)
+            except Exception as e:
+                logger.warning(f"Snapshot not published: {e}")
+                version = None
+        self.snapshot = snapshot
+        self.snapshot['version'] = version
+        logger.info(f"📦 Snapshot v{version}: {count_data_points(self.snapshot)} data points "
+                    f"({len(names)} sources refreshed)")
+
+# ============================================================
+# REPLICA COORDINATION
+# ============================================================
+
+_coordination = None
+elector = None
+_shared = {}
+
+def get_coordination():
+    """The lease and publication store shared by all replicas, opened on first use (None when alone)."""
+    global _coordination
+    if _coordination is None and COORDINATION_DB:
+        _coordination = LeaseStore(COORDINATION_DB)
+    return _coordination
+
+def is_leader():
+    """True on the replica that owns scheduling and upstream fetching (always, when running alone)."""
+    return elector is None or elector.is_leader
+
+def publish_shared(name, payload):
+    """Blocking: publish payload under the next cluster-wide version. None (nothing published) off the leader."""
+    if not is_leader():
+        return None
+    store = get_coordination()
+    version = store.next_version()
+    store.publish(name, payload, version)
+    return version
+
+async def load_shared(name):
+    """(version, payload) last published under name by the leader; (None, None) if nothing yet."""
+    version, payload = _shared.get(name, (None, None))
+    row = await asyncio.to_thread(get_coordination().load, name, version)
+    if row is not None:
+        version, payload, _ = row
+        _shared[name] = (version, payload)
+    return version, payload
+
+async def wait_shared(name, timeout=None, interval=0.5):
+    """load_shared, polling up to timeout (SHARED_WAIT_SECONDS) while the leader has not published anything yet."""
+    deadline = time.monotonic() + (SHARED_WAIT_SECONDS if timeout is None else timeout)
+    while True:
+        version, payload = await load_shared(name)
+        if payload is not None or time.monotonic() >= deadline:
+            return version, payload
+        await asyncio.sleep(interval)
+
+async def current_snapshot(fresh=False):
+    """The market snapshot: fetched here on the leader, the leader's published one on followers.
+
+    None on a follower while the leader has not published a snapshot yet:
+    followers never fetch upstream themselves.
+    """
+    if is_leader():
+        return await market_cache.get(fresh=fresh)
+    version, snapshot = await wait_shared('snapshot')
+    if snapshot is None:
+        logger.info("⏳ No snapshot published by the leader yet")
+        return None
+    snapshot['version'] = version
+    return snapshot
+
+_background = set()
+
+def in_background(coro):
+    """Run coro as a task that is kept referenced until it finishes."""
+    task = asyncio.create_task(coro)
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+    return task
+
+async def on_elected():
+    """This replica took the leader lease: take over upstream fetching (and publish headlines right away)."""
+    if CRYPTO_STREAM:
+        price_stream.start()
+    market_cache.refresh()
+    # Not awaited: the elector must keep renewing the lease meanwhile
+    in_background(refresh_news())
+
+async def on_demoted():
+    await price_stream.stop()
+
+async def refresh_shared_snapshot():
+    """Scheduled job: the leader keeps the published snapshot (and its provider health) fresh for the followers."""
+    if is_leader():
+        await market_cache.get(fresh=True)
+        await asyncio.to_thread(publish_shared, 'health', health.report())
+
+async def provider_health_report():
+    """health.report() of the replica doing the fetching: ours on the leader, the published one on followers."""
+    if is_leader():
+        return health.report()
+    _, report = await load_shared('health')
+    return report or {}
+
+_market_store = None
+
+def get_market_store():
+    """The local price history store, opened on first use."""
+    global _market_store
+    if _market_store is None:
+        _market_store = MarketStore(MARKET_DB)
+        _market_store.prune(MARKET_HISTORY_DAYS)
+    return _market_store
+
+async def prune_history():
+    """Daily job: drop history older than MARKET_HISTORY_DAYS (the leader does it for the shared MARKET_DB)."""
+    if is_leader():
+        await asyncio.to_thread(get_market_store().prune, MARKET_HISTORY_DAYS)
+
+market_cache = MarketSnapshotCache(store=get_market_store,
+                                   publish=(lambda snapshot: publish_shared('snapshot', snapshot)) if COORDINATION_DB else None)
+
+_subscriptions = None
+
+def get_subscriptions():
+    """Chat subscriptions and watchlists, opened on first use."""
+    global _subscriptions
+    if _subscriptions is None:
+        _subscriptions = SubscriptionStore(SUBSCRIPTIONS_DB)
+    return _subscriptions
+
+def _history_summary():
+    import analytics  # numpy is only needed once there is history to analyse
+    since = time.time() - ANALYTICS_LOOKBACK_DAYS * 86400
+    return analytics.summarize(analytics.compute_analytics(get_market_store().history(since)))
+
+async def history_analytics():
+    """Summary of returns, volatility, z-scores and correlations from local history."""
+    try:
+        started = time.monotonic()
+        with stage_seconds.time(stage='analytics'):
+            summary = await asyncio.to_thread(_history_summary)
+        logger.info(f"📐 History analytics computed in {time.monotonic() - started:.2f}s")
+        return summary
+    except Exception as e:
+        logger.warning(f"History analytics unavailable: {e}")
+        return ""
+
 # ============================================================
 # NEWS
 # ============================================================
 
-async def fetch_market_news():
-    """Fetch financial news."""
-    headlines = []
-    async with aiohttp.ClientSession() as session:
-        if NEWS_API_KEY:
-            url = f"https://newsapi.org/v2/top-headlines?category=business&language=en&pageSize=10&apiKey={NEWS_API_KEY}"
-            data = await fetch_json(session, url)
-            if data and 'articles' in data:
-                for a in data['articles'][:10]:
-                    headlines.append(a.get('title', ''))
-
-        # Backup: Google News RSS via a JSON proxy
-        if not headlines:
-            try:
-                import feedparser
-                feed = feedparser.parse("https://news.google.com/rss/topics/CAAqJggKIiBDQkFTRWdvSUwyMHZNRGx6TVdZU0FtVnVHZ0pWVXlnQVAB")
-                for entry in feed.entries[:8]:
-                    headlines.append(entry.title)
-            except:
-                pass
+def news_sources():
+    sources = []
+    if NEWS_API_KEY:
+        sources.append(FeedSource(
+            'NewsAPI',
+            f"{NEWSAPI_BASE_URL}/v2/top-headlines?category=business&language=en&pageSize=10&apiKey={NEWS_API_KEY}",
+            kind='newsapi'))
+    sources.append(FeedSource('Google News', NEWS_RSS_URL))
+    return sources
+
+news_store = NewsStore(news_sources(), refresh_interval=NEWS_REFRESH_MINUTES * 60, health=health)
+
+async def refresh_news():
+    """Scheduled job: keep the headline store warm (and, with replicas, publish it)."""
+    if not is_leader():
+        return
+    with stage_seconds.time(stage='news_refresh'):
+        await news_store.refresh(get_http_session())
+    if get_coordination() is not None:
+        await asyncio.to_thread(publish_shared, 'news', news_store.headlines(8))
 
-        if not headlines:
-            headlines = ["Market news temporarily unavailable - analysis based on price data"]
+async def fetch_market_news():
+    """Latest financial headlines from the in-memory news store (the leader's, on followers)."""
+    if not is_leader():
+        _, shared = await wait_shared('news')
+        return shared or ["Market news temporarily unavailable - analysis based on price data"]
+    with stage_seconds.time(stage='news'):
+        if news_store.is_stale():
+            # Through refresh_news, so the new headlines are also published to the followers
+            refresh = in_background(refresh_news())
+            if not news_store.headlines():
+                # Nothing in memory yet: wait for the first download
+                await refresh
+
+    headlines = news_store.headlines(8)
+    if not headlines:
+        headlines = ["Market news temporarily unavailable - analysis based on price data"]
 
     return headlines
 
@@ -314,61 +905,69 @@ async def fetch_market_news():
 # ANALYSIS WITH CLAUDE
 # ============================================================
 
-def format_market_data_for_claude(data):
-    """Format market data into a clean text block for Claude."""
-    lines = [f"📅 Market Data as of {data['timestamp']}", ""]
-
-    if data['indices']:
-        lines.append("📊 MAJOR INDICES:")
-        for item in data['indices']:
-            chg = f" ({item['change_pct']:+.2f}%)" if 'change_pct' in item else ""
-            lines.append(f"  • {item['symbol']}: {item['price']:,.2f}{chg}")
-        lines.append("")
+def escape_markdown(text):
+    """Backslash-escape the characters Telegram's legacy Markdown treats as markup."""
+    return re.sub(r'([_*`\[])', r'\\\1', text)
 
-    if data['commodities']:
-        lines.append("🏗️ COMMODITIES:")
-        for item in data['commodities']:
-            chg = f" ({item['change_pct']:+.2f}%)" if 'change_pct' in item else ""
-            lines.append(f"  • {item['symbol']}: ${item['price']:,.2f}{chg}")
-        lines.append("")
+def _heading(title, fmt):
+    if fmt == 'markdown':
+        return f"*{title}*"
+    return f"{title}:"
 
-    if data['crypto']:
-        lines.append("₿ CRYPTO:")
-        for item in data['crypto']:
-            chg = f" ({item.get('change_24h', 0):+.1f}%)" if item.get('change_24h') else ""
-            lines.append(f"  • {item['symbol']}: ${item['price']:,.2f}{chg}")
-        lines.append("")
+def render_snapshot(data, fmt='text'):
+    """Render a snapshot as 'text' (prompt) or 'markdown' (Telegram)."""
+    esc = escape_markdown if fmt == 'markdown' else str
+    lines = [f"📅 Market Data as of {data['timestamp']}", ""]
 
-    if data['forex']:
-        lines.append("💱 FOREX:")
-        for item in data['forex']:
-            lines.append(f"  • {item['symbol']}: {item['price']}")
+    def section(title, items, price_fmt, change):
+        if not items:
+            return
+        lines.append(_heading(title, fmt))
+        for item in items:
+            lines.append(f"  • {esc(item['symbol'])}: {price_fmt(item['price'])}{change(item)}")
         lines.append("")
 
-    if data['yields']:
-        lines.append("🏦 TREASURY YIELDS:")
-        for item in data['yields']:
-            lines.append(f"  • {item['symbol']}: {item['price']:.3f}%")
-        lines.append("")
+    pct = lambda item: f" ({item['change_pct']:+.2f}%)" if 'change_pct' in item else ""
+    section("📊 MAJOR INDICES", data['indices'], lambda p: f"{p:,.2f}", pct)
+    section("🏗️ COMMODITIES", data['commodities'], lambda p: f"${p:,.2f}", pct)
+    section("₿ CRYPTO", data['crypto'], lambda p: f"${p:,.2f}",
+            lambda item: f" ({item.get('change_24h', 0):+.1f}%)" if item.get('change_24h') else "")
+    section("💱 FOREX", data['forex'], str, pct)
+    section("🏦 TREASURY YIELDS", data['yields'], lambda p: f"{p:.3f}%", pct)
 
     if data['fear_greed']:
         fg = data['fear_greed']
-        lines.append(f"😱 Crypto Fear & Greed Index: {fg['value']}/100 ({fg['classification']})")
+        lines.append(f"😱 Crypto Fear & Greed Index: {fg['value']}/100 ({esc(fg['classification'])})")
+        lines.append("")
+
+    if data.get('analytics'):
+        lines.append(esc(data['analytics']))
         lines.append("")
 
     return "\n".join(lines)
 
-async def generate_analysis(market_data, news):
-    """Generate professional analysis using Claude."""
-    data_text = format_market_data_for_claude(market_data)
-    news_text = "\n".join(f"  • {h}" for h in news[:8])
+def render_key(data, fmt):
+    """Cache key for a rendering: snapshot version, format and which symbols it holds.
 
-    prompt = f"""You are a senior market analyst at a major investment bank. Based on the following real-time market data and news, provide a comprehensive market analysis report.
+    Filtered (watchlist) copies and copies with analytics share the version
+    but hold different content, hence the scope part. Unversioned data is not cached.
+    """
+    if data.get('version') is None:
+        return None
+    scope = tuple(item['symbol'] for key in ('indices', 'commodities', 'crypto', 'forex', 'yields')
+                  for item in data[key])
+    return (data['version'], fmt, scope, bool(data['fear_greed']), bool(data.get('analytics')))
 
-{data_text}
+def rendered(data, fmt='text'):
+    """Memoized render_snapshot plus its Telegram-sized chunks."""
+    return render_cache.get(render_key(data, fmt), lambda: render_snapshot(data, fmt))
 
-📰 LATEST HEADLINES:
-{news_text}
+def format_market_data_for_claude(data):
+    """Format market data into a clean text block for Claude."""
+    return rendered(data, 'text').text
+
+# Fixed instruction block, sent as a cacheable system prompt prefix
+ANALYSIS_INSTRUCTIONS = """You are a senior market analyst at a major investment bank. Based on the real-time market data and news you are given, provide a comprehensive market analysis report.
 
 Generate a professional Telegram-formatted market report with these sections. Use these exact emoji headers:
 
@@ -404,33 +1003,151 @@ Rules:
 - Do NOT use headers with # markdown, use emoji + **bold**
 - End with a one-line disclaimer"""
 
+def _round_sig(value, digits=4):
+    """Round to significant digits so tiny ticks don't change the cache key."""
+    if not isinstance(value, (int, float)) or value == 0:
+        return value
+    return float(f"{value:.{digits}g}")
+
+def analysis_digest(market_data, news):
+    """Content address of an analysis: rounded snapshot, history analytics summary and the headline set."""
+    prices = {}
+    for key in ('indices', 'commodities', 'crypto', 'forex', 'yields'):
+        for item in market_data.get(key) or []:
+            change = item.get('change_pct', item.get('change_24h'))
+            prices[item['symbol']] = [_round_sig(item.get('price')),
+                                      round(change, 1) if change is not None else None]
+    fg = market_data.get('fear_greed')
+    payload = {
+        'prices': prices,
+        'fear_greed': fg['value'] if fg else None,
+        # Part of the prompt too: new vol/z-score/correlation figures need a new analysis
+        'analytics': market_data.get('analytics') or '',
+        'news': sorted(set(news[:8])),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+class AnalysisCache:
+    """Content-addressed cache of generated analyses with hit/miss/latency stats."""
+
+    def __init__(self, ttl=ANALYSIS_CACHE_TTL, max_entries=32):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.latencies = []
+        self.cached_input_tokens = 0
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry and time.monotonic() - entry[1] < self.ttl:
+            self.hits += 1
+            return entry[0]
+        self._entries.pop(key, None)
+        self.misses += 1
+        return None
+
+    def put(self, key, text, latency):
+        if len(self._entries) >= self.max_entries:
+            del self._entries[min(self._entries, key=lambda k: self._entries[k][1])]
+        self._entries[key] = (text, time.monotonic())
+        self.latencies = (self.latencies + [latency])[-50:]
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 3) if total else 0.0,
+            'avg_latency': round(sum(self.latencies) / len(self.latencies), 2) if self.latencies else None,
+            'last_latency': self.latencies[-1] if self.latencies else None,
+            'cached_input_tokens': self.cached_input_tokens,
+            'entries': len(self._entries),
+        }
+
+analysis_cache = AnalysisCache()
+
+class AnalysisUnavailable(Exception):
+    """Claude could not produce an analysis (raised instead of the fallback text when fallback=False)."""
+
+def fallback_analysis(data_text):
+    return f"🤖 *AI Analysis Unavailable*\n\n{data_text}\n\n_Analysis engine temporarily offline. Raw data shown above._"
+
+async def generate_analysis(market_data, news, on_text=None, fallback=True):
+    """Generate professional analysis using Claude.
+
+    If on_text is given the response is streamed and on_text(text_so_far)
+    is awaited as tokens arrive. Identical inputs within ANALYSIS_CACHE_TTL
+    are answered from analysis_cache. When Claude fails the raw data is
+    returned instead, or AnalysisUnavailable is raised with fallback=False.
+    """
+    data_text = format_market_data_for_claude(market_data)
+    news_text = "\n".join(f"  • {h}" for h in news[:8])
+
+    key = analysis_digest(market_data, news)
+    cached = analysis_cache.get(key)
+    if cached is not None:
+        logger.info("🧠 Analysis cache hit, skipping Claude call")
+        analysis_lookups.inc(outcome='cached')
+        return cached
+
+    prompt = f"""{data_text}
+
+📰 LATEST HEADLINES:
+{news_text}
+
+Write the market report now."""
+
+    request = dict(
+        model="claude-sonnet-4-20250514",
+        max_tokens=1500,
+        system=[{"type": "text", "text": ANALYSIS_INSTRUCTIONS, "cache_control": {"type": "ephemeral"}}],
+        messages=[{"role": "user", "content": prompt}]
+    )
+    started = time.monotonic()
     try:
-        response = claude.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=1500,
-            messages=[{"role": "user", "content": prompt}]
-        )
-        return response.content[0].text
+        if on_text is None:
+            response = await get_claude().messages.create(**request)
+            text = response.content[0].text
+        else:
+            text = ""
+            async with get_claude().messages.stream(**request) as stream:
+                async for delta in stream.text_stream:
+                    text += delta
+                    await on_text(text)
+                response = await stream.get_final_message()
     except Exception as e:
         logger.error(f"Claude API error: {e}")
+        stage_seconds.observe(time.monotonic() - started, stage='analysis')
+        analysis_lookups.inc(outcome='fallback')
+        if not fallback:
+            raise AnalysisUnavailable(str(e)) from e
         # Fallback: format raw data
-        return f"🤖 *AI Analysis Unavailable*\n\n{data_text}\n\n_Analysis engine temporarily offline. Raw data shown above._"
+        return fallback_analysis(data_text)
+
+    latency = round(time.monotonic() - started, 2)
+    stage_seconds.observe(time.monotonic() - started, stage='analysis')
+    analysis_lookups.inc(outcome='generated')
+    analysis_cache.put(key, text, latency)
+    cache_read = getattr(response.usage, 'cache_read_input_tokens', None) or 0
+    analysis_cache.cached_input_tokens += cache_read
+    logger.info(f"🧠 Analysis generated in {latency:.1f}s ({cache_read} prompt tokens from cache)")
+    return text
 
 # ============================================================
 # TELEGRAM SENDING (handles message length limits)
 # ============================================================
 
-async def send_long_message(bot, chat_id, text, parse_mode='Markdown'):
-    """Send message, splitting if too long for Telegram's 4096 char limit."""
-    if len(text) <= 4096:
-        await bot.send_message(chat_id=chat_id, text=text, parse_mode=parse_mode)
-        return
+# One outbound queue for every message: global/per-chat limits, 429 retry_after, backoff
+delivery = DeliveryQueue(workers=TELEGRAM_SEND_WORKERS)
 
-    # Split by double newline to keep sections together
+def split_message(text, limit=4000):
+    """Split text into Telegram-sized chunks, keeping paragraphs together."""
     chunks = []
     current = ""
     for paragraph in text.split("\n\n"):
-        if len(current) + len(paragraph) + 2 > 4000:
+        if len(current) + len(paragraph) + 2 > limit:
             if current:
                 chunks.append(current)
             current = paragraph
@@ -438,60 +1155,215 @@ async def send_long_message(bot, chat_id, text, parse_mode='Markdown'):
             current = current + "\n\n" + paragraph if current else paragraph
     if current:
         chunks.append(current)
+    return chunks
+
+def telegram_chunks(text):
+    """The message as Telegram-sized chunks (a single chunk if it fits)."""
+    return [text] if len(text) <= 4096 else split_message(text)
 
-    for chunk in chunks:
+# Snapshot renderings per (version, format), pre-split for sending
+render_cache = RenderCache(split=telegram_chunks)
+
+async def send_long_message(bot, chat_id, text, parse_mode='Markdown', chunks=None):
+    """Send message through the delivery queue, splitting if too long for Telegram's 4096 char limit."""
+    chunks = chunks or telegram_chunks(text)
+    try:
+        with stage_seconds.time(stage='telegram_send'):
+            await delivery.send_chunks(chat_id, chunks, parse_mode, transport=bot)
+    except Exception:
+        telegram_messages.inc(outcome='failed')
+        raise
+    telegram_messages.inc(len(chunks), outcome='sent')
+
+class StreamingMessage:
+    """Progressively edits a placeholder message while a report is streamed."""
+
+    def __init__(self, message, interval=STREAM_EDIT_INTERVAL):
+        self.message = message
+        self.interval = interval
+        self._last_edit = 0.0
+        self._shown = ""
+
+    async def update(self, text):
+        """Show the text so far, at most once per interval (plain text: partial Markdown won't parse)."""
+        now = time.monotonic()
+        if now - self._last_edit < self.interval:
+            return
+        self._last_edit = now
+        preview = text[-4000:] + " ▌"
+        if preview == self._shown:
+            return
+        try:
+            await self.message.edit_text(preview)
+            self._shown = preview
+        except Exception as e:
+            logger.debug(f"Streaming edit skipped: {e}")
+
+    async def finish(self, bot, text, parse_mode='Markdown'):
+        """Replace the preview with the final text, spilling over into extra messages if needed."""
+        chunks = telegram_chunks(text)
         try:
-            await bot.send_message(chat_id=chat_id, text=chunk, parse_mode=parse_mode)
+            await self.message.edit_text(chunks[0], parse_mode=parse_mode)
         except Exception:
-            # If markdown fails, send as plain text
-            await bot.send_message(chat_id=chat_id, text=chunk)
-        await asyncio.sleep(0.5)
+            await self.message.edit_text(chunks[0])
+        if len(chunks) > 1:
+            await send_long_message(bot, self.message.chat_id, "\n\n".join(chunks[1:]), parse_mode)
 
 # ============================================================
 # MAIN ANALYSIS FLOW
 # ============================================================
 
-async def generate_and_send_report(bot):
-    """Complete flow: fetch data → analyze → send."""
+UNAVAILABLE_MESSAGE = ("⚠️ *Market Data Temporarily Unavailable*\n\n"
+                       "All data sources returned errors. Will retry at next scheduled time.")
+WARMING_UP_MESSAGE = "⏳ Warming up: market data is still being loaded. Please try again in a minute."
+
+async def load_report_inputs():
+    """Fresh snapshot (with history analytics) and headlines; snapshot is None if every source failed
+    (or, on a follower, nothing has been published yet)."""
+    market_data, news = await asyncio.gather(
+        current_snapshot(fresh=True),
+        fetch_market_news()
+    )
+    total_points = count_data_points(market_data) if market_data is not None else 0
+    if total_points == 0:
+        return None, news
+    logger.info(f"📊 Got {total_points} data points, generating analysis...")
+    return {**market_data, 'analytics': await history_analytics()}, news
+
+def watchlist_snapshot(market_data, watchlist):
+    """The snapshot for one watchlist, or the full one if none of its symbols is available."""
+    filtered = filter_snapshot(market_data, watchlist)
+    return filtered if count_data_points(filtered) else market_data
+
+async def generate_and_send_report(bot, chat_id=None, status_message=None):
+    """Complete flow: fetch data → analyze → send, for one chat (using its watchlist).
+
+    When status_message is given the analysis is streamed into it instead of
+    being posted as a new message.
+    """
+    chat_id = chat_id or CHAT_ID
+    started = time.monotonic()
     try:
         logger.info("🔄 Starting market analysis pipeline...")
 
         # Fetch data and news concurrently
-        market_data, news = await asyncio.gather(
-            fetch_all_market_data(),
-            fetch_market_news()
-        )
-
-        # Check if we have any data
-        total_points = sum(len(v) for k, v in market_data.items()
-                         if isinstance(v, list))
-        if total_points == 0:
-            await bot.send_message(
-                chat_id=CHAT_ID,
-                text="⚠️ *Market Data Temporarily Unavailable*\n\nAll data sources returned errors. Will retry at next scheduled time.",
-                parse_mode='Markdown'
-            )
+        market_data, news = await load_report_inputs()
+        if market_data is None:
+            reports_total.inc(trigger='command', outcome='no_data')
+            message = UNAVAILABLE_MESSAGE if is_leader() else WARMING_UP_MESSAGE
+            await delivery.send(chat_id, message, parse_mode='Markdown', transport=bot)
             return
+        market_data = watchlist_snapshot(market_data, get_subscriptions().watchlist(chat_id))
+
+        if status_message is not None:
+            # Stream the analysis into the placeholder message
+            streaming = StreamingMessage(status_message)
+            analysis = await generate_analysis(market_data, news, on_text=streaming.update)
+            with stage_seconds.time(stage='telegram_send'):
+                await streaming.finish(bot, analysis)
+        else:
+            # Generate AI analysis
+            analysis = await generate_analysis(market_data, news)
 
-        logger.info(f"📊 Got {total_points} data points, generating analysis...")
-
-        # Generate AI analysis
-        analysis = await generate_analysis(market_data, news)
-
-        # Send to Telegram
-        await send_long_message(bot, CHAT_ID, analysis)
+            # Send to Telegram
+            await send_long_message(bot, chat_id, analysis)
+        stage_seconds.observe(time.monotonic() - started, stage='report')
+        reports_total.inc(trigger='command', outcome='sent')
         logger.info("✅ Report sent successfully!")
 
     except Exception as e:
+        reports_total.inc(trigger='command', outcome='error')
         logger.error(f"❌ Report generation failed: {e}", exc_info=True)
         try:
-            await bot.send_message(
-                chat_id=CHAT_ID,
-                text=f"⚠️ Analysis error: {str(e)[:200]}"
-            )
+            await delivery.send(chat_id, f"⚠️ Analysis error: {str(e)[:200]}", transport=bot)
         except:
             pass
 
+async def broadcast(bot, chat_ids, text, parse_mode='Markdown'):
+    """Send one rendered message to many chats, at most BROADCAST_WORKERS at a time.
+
+    Chats that have blocked or removed the bot are unsubscribed. Returns how many chats got it.
+    """
+    semaphore = asyncio.Semaphore(BROADCAST_WORKERS)
+    chunks = telegram_chunks(text)  # split once for every chat
+
+    async def deliver(chat_id):
+        async with semaphore:
+            try:
+                await send_long_message(bot, chat_id, text, parse_mode, chunks=chunks)
+                return True
+            except Exception as e:
+                logger.error(f"Broadcast to {chat_id} failed: {e}")
+                reason = str(e).lower()
+                if classify(e) == 'permanent' and ('forbidden' in reason or 'chat not found' in reason
+                                                   or type(e).__name__ == 'Forbidden'):
+                    get_subscriptions().unsubscribe(chat_id)
+                    logger.info(f"🔕 Unsubscribed unreachable chat {chat_id}")
+                return False
+
+    return sum(await asyncio.gather(*(deliver(chat_id) for chat_id in chat_ids)))
+
+change_gate = ChangeGate(CHANGE_THRESHOLDS, fear_greed=CHANGE_FEAR_GREED_PTS, vix=CHANGE_VIX_PTS,
+                         max_quiet=CHANGE_MAX_QUIET_HOURS * 3600)
+
+async def broadcast_reports(bot):
+    """Scheduled cycle: render one report per distinct watchlist, then broadcast it to its chats."""
+    subs = get_subscriptions()
+    if get_coordination() is not None:
+        # Other replicas may have handled /subscribe and /watchlist since the last cycle
+        await asyncio.to_thread(subs.reload)
+    groups = subs.groups()
+    total = sum(len(chats) for chats in groups.values())
+    if not total:
+        logger.info("📭 No subscribed chats, skipping report")
+        return
+    logger.info(f"🔄 Report cycle: {len(groups)} distinct watchlists for {total} chats")
+    started = time.monotonic()
+
+    try:
+        market_data, news = await load_report_inputs()
+    except Exception as e:
+        reports_total.inc(trigger='scheduled', outcome='error')
+        logger.error(f"❌ Report inputs failed: {e}", exc_info=True)
+        return
+    all_chats = [chat_id for chats in groups.values() for chat_id in chats]
+    if market_data is None:
+        reports_total.inc(trigger='scheduled', outcome='no_data')
+        await broadcast(bot, all_chats, UNAVAILABLE_MESSAGE)
+        return
+
+    # Render sequentially (one LLM call per watchlist) while earlier reports are already going out
+    sends = []
+    full = 0
+    for watchlist, chat_ids in groups.items():
+        name = list(watchlist) or 'full'
+        snapshot = watchlist_snapshot(market_data, watchlist)
+        decision = change_gate.check(watchlist, snapshot) if CHANGE_GATE != 'off' else None
+        if decision is not None and not decision.significant:
+            logger.info(f"🚦 Watchlist {name}: below thresholds, {CHANGE_GATE} ({decision.summary()})")
+            reports_total.inc(trigger='scheduled', outcome='skipped' if CHANGE_GATE == 'skip' else 'delta')
+            if CHANGE_GATE == 'delta':
+                sends.append(asyncio.create_task(broadcast(bot, chat_ids, format_delta(decision), parse_mode=None)))
+            continue
+        if decision is not None:
+            logger.info(f"🚦 Watchlist {name}: full report ({decision.summary()})")
+        try:
+            analysis = await generate_analysis(snapshot, news, fallback=False)
+        except AnalysisUnavailable:
+            # Raw data goes out, but it is not a baseline: the next cycle tries a full report again
+            analysis = fallback_analysis(format_market_data_for_claude(snapshot))
+        except Exception as e:
+            logger.error(f"❌ Report for watchlist {name} failed: {e}", exc_info=True)
+            analysis = f"⚠️ Analysis error: {str(e)[:200]}"
+        else:
+            change_gate.record(watchlist, snapshot)
+        full += 1
+        sends.append(asyncio.create_task(broadcast(bot, chat_ids, analysis)))
+    delivered = sum(await asyncio.gather(*sends))
+    stage_seconds.observe(time.monotonic() - started, stage='report_cycle')
+    reports_total.inc(full, trigger='scheduled', outcome='sent')
+    logger.info(f"✅ {full}/{len(groups)} full reports, delivered to {delivered}/{total} chats")
+
 # ============================================================
 # COMMAND HANDLERS
 # ============================================================
@@ -502,72 +1374,222 @@ async def cmd_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "Commands:\n"
         "/report - Generate full market analysis\n"
         "/status - Check bot & data source status\n"
-        "/markets - Quick price snapshot\n\n"
+        "/markets - Quick price snapshot\n"
+        "/perf - Pipeline latency breakdown\n"
+        "/subscribe [symbols] - Scheduled reports in this chat\n"
+        "/watchlist [add|remove|clear] symbols - Symbols covered here\n"
+        "/unsubscribe - Stop scheduled reports\n\n"
         "📅 Auto-reports every 4 hours",
         parse_mode='Markdown'
     )
 
 async def cmd_report(update: Update, context: ContextTypes.DEFAULT_TYPE):
     msg = await update.message.reply_text("🔄 Generating analysis... (30-60 seconds)")
-    await generate_and_send_report(context.bot)
-    try:
-        await msg.delete()
-    except:
-        pass
+    await generate_and_send_report(context.bot, chat_id=msg.chat_id, status_message=msg)
 
 async def cmd_status(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Check which data sources are working."""
-    status_msg = await update.message.reply_text("🔍 Testing data sources...")
-
+    """Data source health from the registry (no live test calls)."""
     results = []
-    async with aiohttp.ClientSession() as session:
-        # Test each source
-        tests = [
-            ("Yahoo Finance API", get_stock_indices_google(session)),
-            ("CoinGecko", get_coingecko_data(session)),
-            ("Coinbase", get_coinbase_btc(session)),
-            ("ECB Forex", get_forex_ecb(session)),
-            ("Metals API", get_metals_price(session)),
-            ("FRED Yields", get_treasury_yields(session)),
-        ]
-
-        for name, coro in tests:
-            try:
-                result = await coro
-                if result:
-                    count = len(result) if isinstance(result, list) else 1
-                    results.append(f"✅ {name}: {count} items")
-                else:
-                    results.append(f"❌ {name}: No data")
-            except Exception as e:
-                results.append(f"❌ {name}: {str(e)[:30]}")
+    for name, p in (await provider_health_report()).items():
+        if p['state'] == OPEN:
+            icon, note = "⛔", f" (skipped, retry in {p['retry_in'] // 60}m{p['retry_in'] % 60:02d}s)"
+        elif p['state'] == HALF_OPEN:
+            icon, note = "🟡", " (probing)"
+        else:
+            icon, note = ("✅" if p['error_rate'] < 0.5 else "⚠️"), ""
+        latency = f"p50 {p['p50'] * 1000:.0f}ms / p95 {p['p95'] * 1000:.0f}ms" if p['p50'] is not None else "no calls"
+        results.append(f"{icon} {name}: {latency}, {p['error_rate']:.0%} errors, {p['calls']} calls{note}")
+    if not results:
+        results.append("⏳ No provider calls yet, warming up...")
+        if is_leader():
+            market_cache.refresh()
 
     status = "\n".join(results)
-    await status_msg.edit_text(
+    ac = analysis_cache.stats()
+    latency = f", avg {ac['avg_latency']}s" if ac['avg_latency'] is not None else ""
+    status += f"\n\n🧠 Analysis cache: {ac['hits']} hits / {ac['misses']} misses{latency}"
+    ds = delivery.stats()
+    if ds['p50'] is not None:
+        status += (f"\n📨 Delivery: {ds['sent']} sent, {ds['failed']} failed, {ds['throttled']} throttled, "
+                   f"p50 {ds['p50']:.2f}s / p95 {ds['p95']:.2f}s")
+    if elector is not None:
+        status += f"\n👑 Replica {'leader' if elector.is_leader else 'follower'} ({elector.transitions} transitions)"
+    if CRYPTO_STREAM:
+        ps = price_stream.stats()
+        oldest = max(ps['ages'].values(), default=None)
+        state = "connected" if ps['connected'] else "down, reconnecting"
+        status += (f"\n📶 Crypto stream: {state}, {ps['messages']} ticks, {ps['connects']} connects"
+                   + (f", oldest price {oldest:.0f}s" if oldest is not None else ""))
+    await update.message.reply_text(
         f"📡 *Data Source Status*\n\n{status}\n\n🕐 {datetime.now(timezone.utc).strftime('%H:%M UTC')}",
         parse_mode='Markdown'
     )
 
 async def cmd_markets(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Quick price snapshot without AI analysis."""
-    msg = await update.message.reply_text("📊 Fetching prices...")
-    data = await fetch_all_market_data()
-    text = format_market_data_for_claude(data)
-    await msg.edit_text(text)
+    data = await current_snapshot()
+    if data is None:
+        await update.message.reply_text(WARMING_UP_MESSAGE)
+        return
+    await send_long_message(context.bot, update.effective_chat.id, None,
+                            chunks=rendered(data, 'markdown').chunks)
+
+def _seconds(value):
+    return f"{value:.2f}s" if value is not None else "-"
+
+async def cmd_perf(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Stage and provider latency since startup (same data as /metrics)."""
+    lines = ["⏱️ *Pipeline stages* (p50 / p95 / last, n)"]
+    for (stage,), s in stage_seconds.summary().items():
+        lines.append(f"• `{stage}`: {_seconds(s['p50'])} / {_seconds(s['p95'])} / {_seconds(s['last'])}, n={s['count']}")
+    providers = sorted(provider_seconds.summary().items(), key=lambda kv: -(kv[1]['p95'] or 0))
+    if providers:
+        lines.append("\n🌐 *Slowest providers* (p50 / p95)")
+        for (provider,), s in providers[:6]:
+            errors = (provider_requests.value(provider=provider, outcome='error')
+                      + provider_requests.value(provider=provider, outcome='timeout'))
+            lines.append(f"• `{provider}`: {_seconds(s['p50'])} / {_seconds(s['p95'])}, {s['count']} calls, {errors} errors")
+    ds = delivery.stats()
+    lines.append(f"\n📨 *Telegram*: {ds['sent']} sent, {ds['retries']} retries, {ds['throttled']} throttled, "
+                 f"queue p50 {_seconds(ds['p50'])} / p95 {_seconds(ds['p95'])}")
+    lines.append(f"🧠 *Analyses*: {analysis_lookups.value(outcome='generated')} generated, "
+                 f"{analysis_lookups.value(outcome='cached')} cached, {analysis_lookups.value(outcome='fallback')} fallback")
+    if 'webhook' in context.bot_data:
+        ws = context.bot_data['webhook'].stats()
+        lines.append(f"📥 *Webhook*: {ws['received']} received, {ws['failed']} failed, "
+                     f"{ws['rejected']} rejected, {ws['dropped']} deferred, {ws['queued']} queued")
+    if not stage_seconds.series:
+        lines.insert(1, "No reports yet since startup.")
+    await update.message.reply_text("\n".join(lines), parse_mode='Markdown')
+
+def describe_watchlist(watchlist):
+    return ", ".join(watchlist) if watchlist else "full market"
+
+async def cmd_subscribe(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Subscribe this chat, optionally with a watchlist: /subscribe BTC, Gold, S&P 500"""
+    subs = get_subscriptions()
+    chat_id = update.effective_chat.id
+    symbols = parse_symbols(context.args)
+    subs.subscribe(chat_id, symbols or None)
+    await update.message.reply_text(
+        f"🔔 Subscribed to scheduled reports\n👀 Watchlist: {describe_watchlist(subs.watchlist(chat_id))}")
+
+async def cmd_unsubscribe(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    removed = get_subscriptions().unsubscribe(update.effective_chat.id)
+    await update.message.reply_text("🔕 Unsubscribed" if removed else "This chat is not subscribed")
+
+async def cmd_watchlist(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Show or edit this chat's watchlist: /watchlist [add|remove|set|clear] symbols"""
+    subs = get_subscriptions()
+    chat_id = update.effective_chat.id
+    args = list(context.args)
+    action = args.pop(0).lower() if args else ''
+    symbols = parse_symbols(args)
+    if action in ('add', 'remove', 'set', 'clear') and chat_id not in subs:
+        subs.subscribe(chat_id)
+    if action == 'add' and symbols:
+        subs.add(chat_id, symbols)
+    elif action == 'remove' and symbols:
+        subs.remove(chat_id, symbols)
+    elif action == 'set' and symbols:
+        subs.subscribe(chat_id, symbols)
+    elif action == 'clear':
+        subs.subscribe(chat_id, [])
+    elif action:
+        await update.message.reply_text("Usage: /watchlist [add|remove|set|clear] BTC, Gold, S&P 500")
+        return
+    state = "" if chat_id in subs else "\n(not subscribed: /subscribe for scheduled reports)"
+    await update.message.reply_text(f"👀 Watchlist: {describe_watchlist(subs.watchlist(chat_id))}{state}")
 
 # ============================================================
 # SCHEDULED JOB
 # ============================================================
 
-async def scheduled_update():
+async def scheduled_update(bot):
+    if not is_leader():
+        logger.info("⏰ Scheduled update: follower replica, the leader sends it")
+        return
     logger.info("⏰ Scheduled update triggered")
-    bot = Bot(token=TELEGRAM_TOKEN)
-    await generate_and_send_report(bot)
+    await broadcast_reports(bot)
+
+alert_engine = AlertEngine(
+    threshold=ALERT_THRESHOLD,
+    cooldown=ALERT_COOLDOWN_MINUTES * 60,
+    significant=SIGNIFICANT_CHANGE_THRESHOLD,
+)
+
+async def check_alerts(bot):
+    """Alert loop tick: poll only the alert symbols and push threshold breaches."""
+    if not is_leader():
+        return
+    # Streamed crypto needs no request; Yahoo is only asked for the rest
+    quotes = []
+    for s in ALERT_SYMBOLS:
+        entry = price_book.get(s, CRYPTO_STREAM_MAX_AGE)
+        if entry is not None:
+            quotes.append({'symbol': s, 'price': entry['price'], 'change_pct': entry['change_24h']})
+    polled = [s for s in ALERT_SYMBOLS if s not in {q['symbol'] for q in quotes}]
+    if polled:
+        quotes += await get_yahoo_quotes(get_http_session(), {s: s for s in polled})
+    for alert in alert_engine.evaluate(quotes):
+        logger.info(f"🚨 Alert: {alert['symbol']} {alert['change']:+.2f}% ({alert['trigger']})")
+        try:
+            await delivery.send(CHAT_ID, format_alert(alert), parse_mode='Markdown', transport=bot)
+        except Exception as e:
+            logger.error(f"Alert delivery failed: {e}")
 
 # ============================================================
 # MAIN
 # ============================================================
 
+async def warm_up():
+    """Background warm-up after startup: heavy imports off the event loop, then a first snapshot and headlines."""
+    try:
+        with stage_seconds.time(stage='warm_up'):
+            await asyncio.to_thread(get_claude)
+            market_data, news = await load_report_inputs()
+        points = count_data_points(market_data) if market_data else 0
+        logger.info(f"🔥 Warm-up done: {points} data points, {len(news)} headlines cached")
+    except Exception as e:
+        logger.warning(f"Warm-up failed (the first report will fetch on demand): {e}")
+
+async def on_startup(app):
+    """Application post-init: open long-lived resources."""
+    global elector
+    get_http_session()
+    logger.info("✅ Shared HTTP connection pool ready")
+    subs = get_subscriptions()
+    if not len(subs):
+        # First run after the single-chat setup: CHAT_ID keeps getting the full report
+        subs.subscribe(CHAT_ID)
+    logger.info(f"✅ {len(subs)} subscribed chats")
+    if METRICS_PORT:
+        try:
+            app.bot_data['metrics_runner'] = await start_metrics_server(registry, METRICS_PORT)
+        except OSError as e:
+            logger.warning(f"Metrics endpoint not started: {e}")
+    if get_coordination() is not None:
+        elector = LeaderElector(get_coordination(), ttl=LEADER_LEASE_SECONDS,
+                                on_elected=on_elected, on_demoted=on_demoted)
+        await elector.start()
+        logger.info(f"✅ Replica {elector.holder}: {'leader' if elector.is_leader else 'follower'}")
+    elif CRYPTO_STREAM:
+        price_stream.start()
+    if WARM_UP:
+        app.bot_data['warm_up'] = asyncio.create_task(warm_up())
+
+async def on_shutdown(app):
+    """Application post-shutdown: release long-lived resources."""
+    if elector is not None:
+        await elector.stop()  # hand leadership over right away
+    if 'warm_up' in app.bot_data:
+        app.bot_data['warm_up'].cancel()
+    await price_stream.stop()
+    await delivery.close()
+    if 'metrics_runner' in app.bot_data:
+        await app.bot_data['metrics_runner'].cleanup()
+    await close_http_session()
+
 def main():
     logger.info("=" * 60)
     logger.info("🚀 PROFESSIONAL MARKET ANALYSIS BOT v2.0")
@@ -577,19 +1599,49 @@ def main():
     logger.info("✅ Sources: Yahoo API, CoinGecko, Coinbase, ECB, FRED")
     logger.info("=" * 60)
 
-    app = Application.builder().token(TELEGRAM_TOKEN).build()
+    app = (
+        Application.builder()
+        .token(TELEGRAM_TOKEN)
+        .base_url(f"{TELEGRAM_API_URL}/bot")
+        .post_init(on_startup)
+        .post_shutdown(on_shutdown)
+        .build()
+    )
 
     app.add_handler(CommandHandler("start", cmd_start))
     app.add_handler(CommandHandler("report", cmd_report))
     app.add_handler(CommandHandler("status", cmd_status))
     app.add_handler(CommandHandler("markets", cmd_markets))
+    app.add_handler(CommandHandler("perf", cmd_perf))
+    app.add_handler(CommandHandler("subscribe", cmd_subscribe))
+    app.add_handler(CommandHandler("unsubscribe", cmd_unsubscribe))
+    app.add_handler(CommandHandler("watchlist", cmd_watchlist))
 
     scheduler = AsyncIOScheduler(timezone='UTC')
-    scheduler.add_job(scheduled_update, 'interval', hours=4, next_run_time=datetime.now(timezone.utc))
-    scheduler.start()
-    logger.info("✅ Scheduler started (4-hour intervals)")
-
-    app.run_polling(drop_pending_updates=True)
+    scheduler.add_job(scheduled_update, 'interval', hours=4, args=[app.bot],
+                      next_run_time=datetime.now(timezone.utc) + timedelta(seconds=FIRST_REPORT_DELAY))
+    scheduler.add_job(refresh_news, 'interval', minutes=NEWS_REFRESH_MINUTES,
+                      next_run_time=datetime.now(timezone.utc))
+    scheduler.add_job(prune_history, 'interval', hours=24)
+    if COORDINATION_DB:
+        scheduler.add_job(refresh_shared_snapshot, 'interval', seconds=SNAPSHOT_PUBLISH_SECONDS,
+                          max_instances=1, coalesce=True)
+    if ENABLE_ALERTS:
+        scheduler.add_job(check_alerts, 'interval', seconds=ALERT_INTERVAL, args=[app.bot],
+                          max_instances=1, coalesce=True)
+        logger.info(f"✅ Alerts on {', '.join(ALERT_SYMBOLS)} (±{ALERT_THRESHOLD}%, every {ALERT_INTERVAL}s)")
+
+    def start_scheduler():
+        scheduler.start()
+        logger.info(f"✅ Scheduler started (4-hour intervals, first report in {FIRST_REPORT_DELAY}s)")
+
+    if WEBHOOK_URL:
+        logger.info(f"✅ Webhook mode ({WEBHOOK_WORKERS} workers)")
+        asyncio.run(run_webhook(app, WEBHOOK_URL, WEBHOOK_SECRET, port=WEBHOOK_PORT, path=WEBHOOK_PATH,
+                                workers=WEBHOOK_WORKERS, maxsize=WEBHOOK_QUEUE, on_started=start_scheduler))
+    else:
+        start_scheduler()
+        app.run_polling(drop_pending_updates=True)
 
 if __name__ == '__main__':
     main()
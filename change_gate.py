@@ -0,0 +1,112 @@
+"""
+Change detection between scheduled reports.
+
+ChangeGate keeps, per watchlist, the snapshot that went into the last full
+report and compares each new snapshot with it: percentage moves per asset
+class, yields in absolute points, plus the Fear & Greed and VIX deltas. When
+nothing crosses its threshold the scheduled cycle can skip the LLM call and
+send a short templated delta (or nothing), so Claude spend follows market
+activity instead of the clock. A full report is still forced after max_quiet
+seconds so subscribers never go silent for days.
+"""
+
+import time
+
+# Minimum move since the last report, per asset class: % of price (yields: absolute points)
+DEFAULT_THRESHOLDS = {
+    'indices': 1.0,
+    'commodities': 1.5,
+    'crypto': 3.0,
+    'forex': 0.5,
+    'yields': 0.10,
+}
+ABSOLUTE_CLASSES = ('yields',)
+VIX_SYMBOL = 'VIX'
+
+
+class Decision:
+    __slots__ = ('significant', 'reasons', 'moves', 'since')
+
+    def __init__(self, significant, reasons, moves, since):
+        self.significant = significant
+        self.reasons = reasons
+        self.moves = moves
+        self.since = since
+
+    def summary(self):
+        return "; ".join(self.reasons)
+
+
+class ChangeGate:
+    def __init__(self, thresholds=None, fear_greed=10, vix=2.0, max_quiet=86400):
+        self.thresholds = {**DEFAULT_THRESHOLDS, **(thresholds or {})}
+        self.fear_greed = fear_greed
+        self.vix = vix
+        self.max_quiet = max_quiet
+        self._baselines = {}
+
+    def record(self, key, snapshot, now=None):
+        """Remember the snapshot a full report was written from."""
+        self._baselines[key] = (snapshot, time.time() if now is None else now)
+
+    def check(self, key, snapshot, now=None):
+        """Compare snapshot with the key's last reported one."""
+        now = time.time() if now is None else now
+        if key not in self._baselines:
+            return Decision(True, ["no previous report"], [], None)
+        baseline, reported_at = self._baselines[key]
+        since = now - reported_at
+
+        moves = self.moves(baseline, snapshot)
+        over = [m for m in moves if m['score'] >= 1]
+        reasons = [f"{m['symbol']} {m['change']:+.2f}{m['unit']} (threshold {m['threshold']:g}{m['unit']})"
+                   for m in over]
+        if since >= self.max_quiet:
+            reasons.append(f"last full report {since / 3600:.0f}h ago")
+        if reasons:
+            return Decision(True, reasons, moves, since)
+        top = moves[0] if moves else None
+        quiet = (f"largest move {top['symbol']} {top['change']:+.2f}{top['unit']} "
+                 f"({top['score']:.0%} of threshold)" if top else "no comparable prices")
+        return Decision(False, [quiet], moves, since)
+
+    def moves(self, baseline, snapshot):
+        """Every comparable change since baseline, largest relative to its threshold first."""
+        moves = []
+        for kind, threshold in self.thresholds.items():
+            previous = {item['symbol']: item.get('price') for item in baseline.get(kind) or []}
+            for item in snapshot.get(kind) or []:
+                before, after = previous.get(item['symbol']), item.get('price')
+                if not before or not after:
+                    continue
+                if item['symbol'] == VIX_SYMBOL:
+                    # VIX in points: a 10% VIX move is routine, a 2-point jump is not
+                    moves.append(self._move(item['symbol'], after - before, self.vix, ' pts', after))
+                elif kind in ABSOLUTE_CLASSES:
+                    moves.append(self._move(item['symbol'], after - before, threshold, ' pts', after))
+                else:
+                    moves.append(self._move(item['symbol'], (after - before) / before * 100, threshold, '%', after))
+
+        before, after = baseline.get('fear_greed'), snapshot.get('fear_greed')
+        if before and after:
+            moves.append(self._move('Fear & Greed', after['value'] - before['value'], self.fear_greed, ' pts',
+                                    after['value']))
+        return sorted(moves, key=lambda m: m['score'], reverse=True)
+
+    @staticmethod
+    def _move(symbol, change, threshold, unit, price):
+        return {'symbol': symbol, 'change': change, 'threshold': threshold, 'unit': unit, 'price': price,
+                'score': abs(change) / threshold if threshold else 0}
+
+
+def format_delta(decision, limit=5):
+    """Cheap templated message for a quiet period (plain text, no LLM)."""
+    hours = (decision.since or 0) / 3600
+    lines = [f"😴 No significant market change since the last report ({hours:.1f}h ago)", ""]
+    if decision.moves:
+        lines.append("Largest moves:")
+        for m in decision.moves[:limit]:
+            lines.append(f"  • {m['symbol']}: {m['price']:,.2f} ({m['change']:+.2f}{m['unit']})")
+        lines.append("")
+    lines.append("A full analysis follows as soon as markets move. /report for one now.")
+    return "\n".join(lines)
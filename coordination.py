@@ -0,0 +1,188 @@
+"""
+Coordination between bot replicas sharing one volume.
+
+LeaseStore is a small SQLite database (WAL) on a path every replica can
+reach. It holds named leases with an expiry, a cluster-wide sequence, and
+the latest published payload per name (the market snapshot, headlines).
+LeaderElector keeps renewing the 'leader' lease: the holder runs the
+scheduled reports and all upstream fetching and publishes what it fetched;
+the others serve commands from the published payloads. If the leader stops
+renewing, another replica takes the lease within ttl + interval seconds;
+a clean shutdown releases it at once.
+
+Anything with the same acquire/release/holder methods can stand in for
+LeaseStore (tests use a fake clock instead).
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def replica_id():
+    """Stable name of this replica: Railway's replica id if set, else host:pid."""
+    return os.environ.get('RAILWAY_REPLICA_ID') or f"{socket.gethostname()}:{os.getpid()}"
+
+
+class LeaseStore:
+    """Methods are blocking; call them through asyncio.to_thread from the bot."""
+
+    def __init__(self, path='coordination.db', clock=time.time):
+        self.path = path
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS leases (
+                name TEXT PRIMARY KEY,
+                holder TEXT NOT NULL,
+                expires REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS published (
+                name TEXT PRIMARY KEY,
+                version INTEGER NOT NULL,
+                payload TEXT NOT NULL,
+                published REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS sequence (
+                id INTEGER PRIMARY KEY CHECK (id = 0),
+                value INTEGER NOT NULL
+            );
+        """)
+
+    def _write(self, fn):
+        """Run fn(conn) in one IMMEDIATE transaction (one writer across processes)."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(self._conn)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    def acquire(self, name, holder, ttl):
+        """Take or renew the lease if it is free, expired or already ours. True if we hold it."""
+        now = self.clock()
+
+        def take(conn):
+            row = conn.execute("SELECT holder, expires FROM leases WHERE name = ?", (name,)).fetchone()
+            if row is not None and row[0] != holder and row[1] > now:
+                return False
+            conn.execute("INSERT INTO leases (name, holder, expires) VALUES (?, ?, ?) "
+                         "ON CONFLICT (name) DO UPDATE SET holder = excluded.holder, expires = excluded.expires",
+                         (name, holder, now + ttl))
+            return True
+        return self._write(take)
+
+    def release(self, name, holder):
+        self._write(lambda conn: conn.execute("DELETE FROM leases WHERE name = ? AND holder = ?", (name, holder)))
+
+    def holder(self, name):
+        """Current holder of an unexpired lease, or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT holder FROM leases WHERE name = ? AND expires > ?",
+                                     (name, self.clock())).fetchone()
+        return row[0] if row else None
+
+    def next_version(self):
+        """Next value of the cluster-wide sequence (versions never repeat across leaders)."""
+        def bump(conn):
+            conn.execute("INSERT INTO sequence (id, value) VALUES (0, 1) "
+                         "ON CONFLICT (id) DO UPDATE SET value = value + 1")
+            return conn.execute("SELECT value FROM sequence WHERE id = 0").fetchone()[0]
+        return self._write(bump)
+
+    def publish(self, name, payload, version):
+        self._write(lambda conn: conn.execute(
+            "INSERT INTO published (name, version, payload, published) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (name) DO UPDATE SET version = excluded.version, payload = excluded.payload, "
+            "published = excluded.published",
+            (name, version, json.dumps(payload), self.clock())))
+
+    def load(self, name, newer_than=None):
+        """(version, payload, published at) of the latest publication, None if there is none
+        (or it is not newer than newer_than)."""
+        with self._lock:
+            row = self._conn.execute("SELECT version, payload, published FROM published WHERE name = ?",
+                                     (name,)).fetchone()
+        if row is None or (newer_than is not None and row[0] <= newer_than):
+            return None
+        return row[0], json.loads(row[1]), row[2]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class LeaderElector:
+    def __init__(self, store, name='leader', holder=None, ttl=10.0, interval=None,
+                 on_elected=None, on_demoted=None):
+        self.store = store
+        self.name = name
+        self.holder = holder or replica_id()
+        self.ttl = ttl
+        self.interval = interval or ttl / 3
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.is_leader = False
+        self.transitions = 0
+        self._renewed = float('-inf')
+        self._task = None
+
+    async def start(self):
+        """First election round right away, then keep renewing in the background."""
+        await self.tick()
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.tick()
+
+    async def tick(self):
+        try:
+            held = await asyncio.to_thread(self.store.acquire, self.name, self.holder, self.ttl)
+        except Exception as e:
+            logger.warning(f"Lease renewal failed: {e}")
+            # Without a successful renewal the lease runs out: step down before anyone else can take it
+            held = self.is_leader and time.monotonic() - self._renewed < self.ttl - self.interval
+        else:
+            if held:
+                self._renewed = time.monotonic()
+        if held != self.is_leader:
+            await self._transition(held)
+        return held
+
+    async def _transition(self, leader):
+        self.is_leader = leader
+        self.transitions += 1
+        logger.info(f"👑 {self.holder} is now {'leader' if leader else 'follower'}")
+        callback = self.on_elected if leader else self.on_demoted
+        if callback is not None:
+            try:
+                await callback()
+            except Exception as e:
+                logger.error(f"Leadership callback failed: {e}", exc_info=True)
+
+    async def stop(self):
+        """Stop renewing and hand the lease over immediately."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self.is_leader:
+            try:
+                await asyncio.to_thread(self.store.release, self.name, self.holder)
+            except Exception as e:
+                logger.warning(f"Lease release failed: {e}")
+            await self._transition(False)
@@ -0,0 +1,131 @@
+"""
+Local time-series store for market snapshots.
+
+Every snapshot is appended to a SQLite database in WAL mode, one row per
+(symbol, timestamp), so deltas and history can be computed locally instead
+of being refetched from the upstream APIs.
+"""
+
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_CATEGORIES = ('indices', 'commodities', 'crypto', 'forex', 'yields')
+FEAR_GREED_SYMBOL = 'Fear & Greed'
+
+
+def snapshot_rows(market_data):
+    """Flatten a market snapshot into (symbol, price, change_pct) rows."""
+    rows = []
+    for key in SNAPSHOT_CATEGORIES:
+        for item in market_data.get(key) or []:
+            if item.get('price') is None:
+                continue
+            change = item.get('change_pct', item.get('change_24h'))
+            rows.append((item['symbol'], float(item['price']), change))
+    fg = market_data.get('fear_greed')
+    if fg:
+        rows.append((FEAR_GREED_SYMBOL, float(fg['value']), None))
+    return rows
+
+
+class MarketStore:
+    """Append-only price history keyed by symbol and timestamp (epoch seconds).
+
+    Methods are blocking; call them through asyncio.to_thread from the bot.
+    """
+
+    def __init__(self, path='market_history.db'):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS points (
+                symbol TEXT NOT NULL,
+                ts INTEGER NOT NULL,
+                price REAL NOT NULL,
+                change_pct REAL,
+                PRIMARY KEY (symbol, ts)
+            ) WITHOUT ROWID
+        """)
+
+    def append(self, rows, ts=None):
+        """Append (symbol, price, change_pct) rows at one timestamp."""
+        ts = int(ts if ts is not None else time.time())
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO points (symbol, ts, price, change_pct) VALUES (?, ?, ?, ?)",
+                [(symbol, ts, price, change) for symbol, price, change in rows])
+            self._conn.execute("COMMIT")
+        return len(rows)
+
+    def append_snapshot(self, market_data, ts=None):
+        return self.append(snapshot_rows(market_data), ts)
+
+    def latest(self, symbols, n=1):
+        """Latest n (ts, price) points per symbol, newest first."""
+        with self._lock:
+            return {
+                symbol: self._conn.execute(
+                    "SELECT ts, price FROM points WHERE symbol = ? ORDER BY ts DESC LIMIT ?",
+                    (symbol, n)).fetchall()
+                for symbol in symbols
+            }
+
+    def prices_at(self, symbols, ts):
+        """Last known price per symbol at or before ts (symbols without history are omitted)."""
+        out = {}
+        with self._lock:
+            for symbol in symbols:
+                row = self._conn.execute(
+                    "SELECT price FROM points WHERE symbol = ? AND ts <= ? ORDER BY ts DESC LIMIT 1",
+                    (symbol, int(ts))).fetchone()
+                if row:
+                    out[symbol] = row[0]
+        return out
+
+    def history(self, since=None):
+        """All (symbol, ts, price) rows since a timestamp, ordered by symbol then time."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT symbol, ts, price FROM points WHERE ts >= ? ORDER BY symbol, ts",
+                (int(since or 0),)).fetchall()
+
+    def symbols(self):
+        with self._lock:
+            return [r[0] for r in self._conn.execute("SELECT DISTINCT symbol FROM points")]
+
+    def prune(self, older_than_days):
+        cutoff = int(time.time() - older_than_days * 86400)
+        with self._lock:
+            deleted = self._conn.execute("DELETE FROM points WHERE ts < ?", (cutoff,)).rowcount
+        if deleted:
+            logger.info(f"🗄️ Pruned {deleted} history points older than {older_than_days} days")
+        return deleted
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def fill_changes(market_data, store, window=86400, now=None):
+    """Fill change_pct from local history for items whose source does not provide one."""
+    now = now or time.time()
+    missing = {item['symbol'] for key in SNAPSHOT_CATEGORIES for item in market_data.get(key) or []
+               if 'change_pct' not in item and 'change_24h' not in item and item.get('price')}
+    if not missing:
+        return market_data
+    previous = store.prices_at(missing, now - window)
+    for key in SNAPSHOT_CATEGORIES:
+        items = market_data.get(key) or []
+        for i, item in enumerate(items):
+            prev = previous.get(item['symbol']) if item['symbol'] in missing else None
+            if prev:
+                items[i] = {**item, 'change_pct': round((item['price'] - prev) / prev * 100, 2)}
+    return market_data
@@ -0,0 +1,161 @@
+"""
+In-process metrics: counters and latency histograms with labels.
+
+Exposed in the Prometheus text format by a small aiohttp server
+(GET /metrics) and summarised for the /perf bot command. Histograms keep
+cumulative buckets for Prometheus plus a short window of recent samples so
+/perf can show p50/p95 without a Prometheus server.
+"""
+
+import logging
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from aiohttp import web
+
+from provider_health import percentile
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self.values.get(_label_key(labels), 0)
+
+    def expose(self):
+        return [f"{self.name}{_format_labels(key)} {value}" for key, value in sorted(self.values.items())]
+
+
+class HistogramSeries:
+    def __init__(self, buckets, window):
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=window)
+        self.last = None
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS, window=200):
+        self.name = name
+        self.help = help_text
+        self.buckets = buckets
+        self.window = window
+        self.series = {}
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = HistogramSeries(self.buckets, self.window)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series.counts[i] += 1
+        series.sum += value
+        series.count += 1
+        series.recent.append(value)
+        series.last = value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the with-block (also when it raises)."""
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(time.monotonic() - started, **labels)
+
+    def summary(self):
+        """{label values: count, p50, p95, last} from the recent window."""
+        return {
+            tuple(v for _, v in key): {
+                'count': s.count,
+                'p50': percentile(s.recent, 50),
+                'p95': percentile(s.recent, 95),
+                'last': s.last,
+            }
+            for key, s in sorted(self.series.items())
+        }
+
+    def expose(self):
+        lines = []
+        for key, s in sorted(self.series.items()):
+            for bound, count in zip(self.buckets, s.counts):
+                lines.append(f"{self.name}_bucket{_format_labels(key, [('le', bound)])} {count}")
+            lines.append(f"{self.name}_bucket{_format_labels(key, [('le', '+Inf')])} {s.count}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {s.sum:.6f}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {s.count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def _register(self, metric):
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, help_text):
+        return self._register(Counter(name, help_text))
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, help_text, buckets))
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.expose())
+        return "\n".join(lines) + "\n"
+
+
+async def start_server(registry, port, host='0.0.0.0'):
+    """Serve GET /metrics (and /healthz) on a background aiohttp server. Returns the runner."""
+    async def metrics(request):
+        return web.Response(text=registry.render(),
+                            headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'})
+
+    async def healthz(request):
+        return web.Response(text="ok")
+
+    app = web.Application()
+    app.router.add_get('/metrics', metrics)
+    app.router.add_get('/healthz', healthz)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"📈 Metrics on http://{host}:{port}/metrics")
+    return runner
@@ -0,0 +1,137 @@
+"""
+Market news pipeline.
+
+Downloads NewsAPI and RSS feeds over the shared aiohttp session using
+conditional GETs (ETag / If-Modified-Since), parses RSS in a worker thread
+so feedparser never blocks the event loop, and keeps a rolling, deduplicated
+headline store that reports read from memory.
+"""
+
+import asyncio
+import logging
+import re
+import time
+from collections import OrderedDict
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_NEWS_BUSINESS_RSS = "https://news.google.com/rss/topics/CAAqJggKIiBDQkFTRWdvSUwyMHZNRGx6TVdZU0FtVnVHZ0pWVXlnQVAB"
+
+
+class FeedSource:
+    """One news endpoint plus the validators from its last successful download."""
+
+    def __init__(self, name, url, kind='rss'):
+        self.name = name
+        self.url = url
+        self.kind = kind  # 'rss' or 'newsapi'
+        self.etag = None
+        self.last_modified = None
+        self.not_modified = 0
+
+
+def headline_key(title):
+    """Normalise a headline for dedup: drop the ' - Publisher' suffix, case and punctuation."""
+    title = re.sub(r'\s+[-–|]\s+[^-–|]{2,40}$', '', title.strip())
+    return re.sub(r'[^a-z0-9]+', ' ', title.lower()).strip()
+
+
+def parse_rss(body):
+    """Parse an RSS/Atom document into titles (runs in a worker thread)."""
+    import feedparser
+    feed = feedparser.parse(body)
+    return [entry.title for entry in feed.entries if entry.get('title')]
+
+
+def parse_newsapi(data):
+    return [a.get('title') for a in (data or {}).get('articles', []) if a.get('title')]
+
+
+class NewsStore:
+    """Rolling store of unique headlines, newest first."""
+
+    def __init__(self, sources, max_headlines=50, refresh_interval=600, health=None):
+        self.sources = sources
+        self.health = health
+        self.max_headlines = max_headlines
+        self.refresh_interval = refresh_interval
+        self._headlines = OrderedDict()  # key -> title, oldest first
+        self._refreshing = None
+        self.last_refresh = None
+
+    def headlines(self, n=8):
+        return list(reversed(self._headlines.values()))[:n]
+
+    def is_stale(self):
+        return self.last_refresh is None or time.monotonic() - self.last_refresh >= self.refresh_interval
+
+    def add(self, titles):
+        """Add titles, skipping duplicates. Returns how many were new."""
+        fresh = OrderedDict()
+        for title in titles:
+            key = headline_key(title)
+            if key and key not in self._headlines and key not in fresh:
+                fresh[key] = title
+        # Feeds list newest first; insert oldest first so the store stays in order
+        for key, title in reversed(fresh.items()):
+            self._headlines[key] = title
+        while len(self._headlines) > self.max_headlines:
+            self._headlines.popitem(last=False)
+        return len(fresh)
+
+    def refresh(self, session):
+        """Refresh all sources, or join the refresh already running."""
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = asyncio.create_task(self._refresh(session))
+        return self._refreshing
+
+    async def _refresh(self, session):
+        started = time.monotonic()
+        batches = await asyncio.gather(*(self._download(session, src) for src in self.sources))
+        added = 0
+        for titles in batches:
+            if titles:
+                added += self.add(titles)
+        self.last_refresh = time.monotonic()
+        logger.info(f"📰 News refreshed in {self.last_refresh - started:.2f}s: "
+                    f"{added} new, {len(self._headlines)} stored")
+
+    async def _download(self, session, source):
+        """Conditional GET of one source. Returns parsed titles, or None if unchanged/failed."""
+        if self.health and not self.health.allow(source.name):
+            return None
+        started = time.monotonic()
+        try:
+            titles = await self._get(session, source)
+        except Exception as e:
+            logger.warning(f"News source {source.name} failed: {e}")
+            if self.health:
+                self.health.record(source.name, False, time.monotonic() - started, str(e) or type(e).__name__)
+            return None
+        if self.health:
+            self.health.record(source.name, True, time.monotonic() - started)
+        return titles
+
+    async def _get(self, session, source):
+        headers = {'User-Agent': 'Mozilla/5.0 (compatible; market-bot)'}
+        if source.etag:
+            headers['If-None-Match'] = source.etag
+        if source.last_modified:
+            headers['If-Modified-Since'] = source.last_modified
+        async with session.get(source.url, headers=headers, timeout=aiohttp.ClientTimeout(total=10)) as resp:
+            if resp.status == 304:
+                source.not_modified += 1
+                return None
+            if resp.status != 200:
+                raise RuntimeError(f"HTTP {resp.status}")
+            validators = resp.headers.get('ETag'), resp.headers.get('Last-Modified')
+            if source.kind == 'newsapi':
+                titles = parse_newsapi(await resp.json())
+            else:
+                body = await resp.read()
+                titles = await asyncio.to_thread(parse_rss, body)
+        # Only once the body parsed: otherwise the next request would get a 304 for content never stored
+        source.etag, source.last_modified = validators
+        return titles
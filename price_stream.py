@@ -0,0 +1,145 @@
+"""
+Streaming crypto prices: a WebSocket ticker subscription feeding an in-memory price book.
+
+PriceStream keeps one connection to a public ticker feed (Coinbase Exchange
+`ticker` channel by default) for the tracked products and writes every tick
+into PriceBook. Readers (the crypto fetchers, /markets, alerts) then get
+prices with no network round trip; an entry older than max_age counts as
+missing so callers fall back to polling when the stream is down.
+
+Reconnects with exponential backoff and jitter; the backoff resets once a
+connection delivers ticks again.
+"""
+
+import asyncio
+import json
+import logging
+import random
+import time
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+COINBASE_WS_FEED = "wss://ws-feed.exchange.coinbase.com"
+
+
+class PriceBook:
+    """Latest tick per product id ('BTC-USD'), with its display symbol ('BTC/USD')."""
+
+    def __init__(self, products):
+        self.products = dict(products)
+        self._entries = {}
+
+    def update(self, product, price, open_24h=None, now=None):
+        if product not in self.products or not price:
+            return
+        change = (price - open_24h) / open_24h * 100 if open_24h else None
+        self._entries[product] = {
+            'symbol': self.products[product],
+            'price': price,
+            'change_24h': round(change, 2) if change is not None else None,
+            'updated': time.monotonic() if now is None else now,
+        }
+
+    def get(self, product, max_age, now=None):
+        """The product's entry, or None if it never ticked or is older than max_age seconds."""
+        entry = self._entries.get(product)
+        now = time.monotonic() if now is None else now
+        if entry is None or now - entry['updated'] > max_age:
+            return None
+        return entry
+
+    def quotes(self, max_age, products=None, source='Coinbase WS'):
+        """Snapshot items for the fresh products, in tracking order."""
+        items = []
+        for product in products or self.products:
+            entry = self.get(product, max_age)
+            if entry is not None:
+                item = {'symbol': entry['symbol'], 'price': entry['price'], 'source': source}
+                if entry['change_24h'] is not None:
+                    item['change_24h'] = entry['change_24h']
+                items.append(item)
+        return items
+
+    def ages(self):
+        now = time.monotonic()
+        return {product: round(now - e['updated'], 1) for product, e in self._entries.items()}
+
+
+class PriceStream:
+    def __init__(self, book, url=COINBASE_WS_FEED, backoff=1.0, max_backoff=60.0, heartbeat=30.0):
+        self.book = book
+        self.url = url
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.heartbeat = heartbeat
+        self.connected = False
+        self.connects = self.messages = 0
+        self.last_error = None
+        self._task = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return self._task
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self.connected = False
+
+    async def _run(self):
+        attempt = 0
+        async with aiohttp.ClientSession() as session:
+            while True:
+                ticks_before = self.messages
+                try:
+                    await self._listen(session)
+                    self.last_error = "connection closed"
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.last_error = str(e) or type(e).__name__
+                self.connected = False
+                # A connection that delivered ticks was healthy: start the backoff over
+                attempt = 0 if self.messages > ticks_before else attempt + 1
+                wait = min(self.max_backoff, self.backoff * 2 ** attempt) * random.uniform(0.8, 1.2)
+                logger.warning(f"📡 Price stream down ({self.last_error}), reconnecting in {wait:.1f}s")
+                await asyncio.sleep(wait)
+
+    async def _listen(self, session):
+        async with session.ws_connect(self.url, heartbeat=self.heartbeat) as ws:
+            await ws.send_json({'type': 'subscribe', 'product_ids': list(self.book.products),
+                                'channels': ['ticker']})
+            self.connected = True
+            self.connects += 1
+            logger.info(f"📡 Price stream connected ({len(self.book.products)} products)")
+            async for msg in ws:
+                if msg.type == aiohttp.WSMsgType.TEXT:
+                    self._on_message(json.loads(msg.data))
+                elif msg.type == aiohttp.WSMsgType.ERROR:
+                    raise ws.exception() or ConnectionError("websocket error")
+
+    def _on_message(self, data):
+        if data.get('type') == 'ticker':
+            try:
+                price = float(data['price'])
+                open_24h = float(data['open_24h']) if data.get('open_24h') else None
+            except (KeyError, TypeError, ValueError):
+                return
+            self.messages += 1
+            self.book.update(data.get('product_id'), price, open_24h)
+        elif data.get('type') == 'error':
+            logger.warning(f"Price stream error message: {data.get('message')} {data.get('reason', '')}")
+
+    def stats(self):
+        return {
+            'connected': self.connected,
+            'connects': self.connects,
+            'messages': self.messages,
+            'last_error': self.last_error,
+            'ages': self.book.ages(),
+        }
@@ -0,0 +1,116 @@
+"""
+Provider health registry.
+
+Every upstream call reports its outcome and latency here. Each provider has
+a circuit breaker: after a run of consecutive failures it opens and calls
+are skipped for a cool-down period, after which a single probe is let
+through. A probe that never reports back (cancelled mid-flight) does not
+hold the circuit half-open: another one is let through after a further
+cool-down. /status reads this registry instead of testing sources live.
+"""
+
+import logging
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half-open'
+
+
+class ProviderStats:
+    def __init__(self, window):
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.calls = 0
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.opened_at = None
+        self.probe_started = None
+        self.last_error = None
+        self.last_success = None
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class HealthRegistry:
+    """Success/failure/latency per provider, with a circuit breaker each."""
+
+    def __init__(self, failure_threshold=3, cooldown=300, window=200, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.window = window
+        self.clock = clock
+        self._providers = {}
+
+    def _stats(self, provider):
+        if provider not in self._providers:
+            self._providers[provider] = ProviderStats(self.window)
+        return self._providers[provider]
+
+    def allow(self, provider):
+        """Whether a call to this provider should be attempted right now."""
+        stats = self._stats(provider)
+        if stats.state == CLOSED:
+            return True
+        now = self.clock()
+        if stats.state == OPEN and now - stats.opened_at >= self.cooldown:
+            # Let exactly one probe through
+            stats.state = HALF_OPEN
+            stats.probe_started = now
+            return True
+        if stats.state == HALF_OPEN and now - stats.probe_started >= self.cooldown:
+            # The last probe never reported back
+            stats.probe_started = now
+            return True
+        return False
+
+    def state(self, provider):
+        """Circuit state, without the side effects of allow()."""
+        return self._stats(provider).state
+
+    def record(self, provider, ok, latency, error=None):
+        stats = self._stats(provider)
+        stats.calls += 1
+        stats.latencies.append(latency)
+        stats.outcomes.append(ok)
+        if ok:
+            if stats.state != CLOSED:
+                logger.info(f"🟢 {provider} recovered, circuit closed")
+            stats.state = CLOSED
+            stats.consecutive_failures = 0
+            stats.last_success = time.time()
+            return
+
+        stats.consecutive_failures += 1
+        stats.last_error = error
+        if stats.state == HALF_OPEN or stats.consecutive_failures >= self.failure_threshold:
+            if stats.state != OPEN:
+                logger.warning(f"⛔ {provider} circuit open for {self.cooldown}s "
+                               f"after {stats.consecutive_failures} failures ({error})")
+            stats.state = OPEN
+            stats.opened_at = self.clock()
+
+    def report(self):
+        """Per-provider summary: state, calls, error rate and p50/p95 latency (seconds)."""
+        out = {}
+        for provider, stats in sorted(self._providers.items()):
+            errors = stats.outcomes.count(False)
+            retry_in = None
+            if stats.state == OPEN:
+                retry_in = max(0, round(self.cooldown - (self.clock() - stats.opened_at)))
+            out[provider] = {
+                'state': stats.state,
+                'calls': stats.calls,
+                'error_rate': round(errors / len(stats.outcomes), 3) if stats.outcomes else 0.0,
+                'p50': percentile(stats.latencies, 50),
+                'p95': percentile(stats.latencies, 95),
+                'last_error': stats.last_error,
+                'retry_in': retry_in,
+            }
+        return out
@@ -0,0 +1,110 @@
+"""
+Daily quota planner for rate-capped providers (Alpha Vantage: 25 calls/day).
+
+Instead of spending calls greedily in dict order, each run gets a share of
+what is left of today's budget (remaining calls / runs left before the UTC
+reset) and spends it on the symbols that matter most right now: a score of
+configured priority x staleness x market-hours relevance. Calls already made
+are persisted in SQLite so a restart does not hand out a fresh budget.
+"""
+
+import logging
+import math
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+
+logger = logging.getLogger(__name__)
+
+# Relevance of a quote whose market is closed: its price is not moving
+CLOSED_RELEVANCE = 0.25
+# Staleness is capped so a long-missing symbol cannot starve everything else
+MAX_STALENESS = 3.0
+
+
+def session_open(session, now):
+    """Whether a trading session is open at `now` (UTC, DST ignored).
+
+    'cash'    US equities, Mon-Fri 13:30-20:00 UTC
+    'futures' CME Globex, Sun 22:00 - Fri 21:00 UTC with a daily 21:00-22:00 break
+    """
+    weekday, minutes = now.weekday(), now.hour * 60 + now.minute
+    if session == 'cash':
+        return weekday < 5 and 13 * 60 + 30 <= minutes < 20 * 60
+    if session == 'futures':
+        if weekday == 5 or (weekday == 4 and minutes >= 21 * 60) or (weekday == 6 and minutes < 22 * 60):
+            return False
+        return not 21 * 60 <= minutes < 22 * 60
+    return True
+
+
+class QuotaPlanner:
+    def __init__(self, provider, per_day, run_interval, path='market_cache.db', clock=None):
+        self.provider = provider
+        self.per_day = per_day
+        self.run_interval = run_interval
+        self.clock = clock or (lambda: datetime.now(timezone.utc))
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS api_quota (
+                provider TEXT NOT NULL,
+                day TEXT NOT NULL,
+                used INTEGER NOT NULL,
+                PRIMARY KEY (provider, day)
+            ) WITHOUT ROWID
+        """)
+
+    def _today(self):
+        return self.clock().date().isoformat()
+
+    def used_today(self):
+        row = self._conn.execute("SELECT used FROM api_quota WHERE provider = ? AND day = ?",
+                                 (self.provider, self._today())).fetchone()
+        return row[0] if row else 0
+
+    def remaining_today(self):
+        return max(0, self.per_day - self.used_today())
+
+    def record(self, calls=1):
+        """Persist calls just made against today's quota."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO api_quota (provider, day, used) VALUES (?, ?, ?) "
+                "ON CONFLICT (provider, day) DO UPDATE SET used = used + excluded.used",
+                (self.provider, self._today(), calls))
+
+    def runs_left(self):
+        """Scheduled runs still to come before the quota resets at 00:00 UTC (this one included)."""
+        now = self.clock()
+        reset = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), now.tzinfo)
+        return max(1, math.ceil((reset - now).total_seconds() / self.run_interval))
+
+    def allowance(self):
+        """Calls this run may spend: an even share of what is left today."""
+        remaining = self.remaining_today()
+        return min(remaining, math.ceil(remaining / self.runs_left()))
+
+    def plan(self, candidates, allowance=None):
+        """Pick which candidates get a call this run.
+
+        candidates: dicts with 'key', 'priority', 'age' and 'ttl' (seconds;
+        age None = never fetched) and 'session' (see session_open).
+        Returns (chosen keys by descending score, skipped keys).
+        """
+        now = self.clock()
+        allowance = self.allowance() if allowance is None else allowance
+        scored = []
+        for c in candidates:
+            staleness = MAX_STALENESS if c['age'] is None else min(MAX_STALENESS, c['age'] / c['ttl'])
+            relevance = 1.0 if session_open(c.get('session'), now) else CLOSED_RELEVANCE
+            scored.append((c['priority'] * staleness * relevance, c['key']))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        chosen = [key for _, key in scored[:allowance]]
+        skipped = [key for _, key in scored[allowance:]]
+        return chosen, skipped
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
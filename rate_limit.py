@@ -0,0 +1,73 @@
+"""
+Async token buckets for upstream API rate limits.
+
+One bucket per provider: tokens refill continuously at the per-minute rate
+up to a burst capacity, and an optional daily quota caps the total. Callers
+await acquire() instead of sleeping a fixed amount between requests, so
+independent providers proceed in parallel and each one runs exactly as fast
+as its own limit allows.
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+
+class QuotaExhausted(Exception):
+    """The provider's daily quota is used up."""
+
+
+class TokenBucket:
+    def __init__(self, name, per_minute, capacity=None, per_day=None, clock=time.monotonic):
+        self.name = name
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else max(1, per_minute)
+        self.per_day = per_day
+        self.clock = clock
+        self.tokens = float(self.capacity)
+        self.used_today = 0
+        self._day = self._today()
+        self._updated = clock()
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def _today():
+        return datetime.now(timezone.utc).date()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self._today() != self._day:
+            self._day = self._today()
+            self.used_today = 0
+
+    def remaining_today(self):
+        if self.per_day is None:
+            return None
+        self._refill()
+        return max(0, self.per_day - self.used_today)
+
+    def try_acquire(self):
+        """Take a token if one is available: 0 on success, else seconds until the next one."""
+        self._refill()
+        if self.per_day is not None and self.used_today >= self.per_day:
+            raise QuotaExhausted(f"{self.name}: daily quota of {self.per_day} reached")
+        if self.tokens >= 1:
+            self.tokens -= 1
+            self.used_today += 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    async def acquire(self):
+        """Wait for a token. Raises QuotaExhausted when the daily quota is spent."""
+        async with self._lock:
+            while True:
+                wait = self.try_acquire()
+                if not wait:
+                    return
+                logger.debug(f"{self.name}: rate limited, waiting {wait:.1f}s")
+                await asyncio.sleep(wait)
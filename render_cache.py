@@ -0,0 +1,45 @@
+"""
+Memoized renderings of market snapshots.
+
+A snapshot only changes when the market cache bumps its version, so every
+(version, format, scope) is rendered once and kept together with its
+Telegram-sized chunks. /markets, the analysis prompt, the fallback report
+and broadcasts to many chats then reuse the same strings.
+"""
+
+from collections import OrderedDict
+
+
+class Rendering:
+    __slots__ = ('text', 'chunks')
+
+    def __init__(self, text, chunks):
+        self.text = text
+        self.chunks = chunks
+
+
+class RenderCache:
+    def __init__(self, split, max_entries=64):
+        self.split = split
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, render):
+        """The rendering for key, calling render() only on a miss. key=None bypasses the cache."""
+        if key is not None and key in self._entries:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+        self.misses += 1
+        text = render()
+        rendering = Rendering(text, self.split(text))
+        if key is not None:
+            self._entries[key] = rendering
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return rendering
+
+    def stats(self):
+        return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
@@ -1,9 +1,10 @@
 import os
-import requests
+import asyncio
 from datetime import datetime
-import time
 import sys
 
+from telegram_delivery import BotAPI, DeliveryQueue
+
 # =============================================
 # CONFIGURAZIONE - LEGGE DA VARIABILI D'AMBIENTE
 # =============================================
@@ -15,7 +16,8 @@ TOKEN = os.environ.get("TELEGRAM_BOT_TOKEN")
 # 🔹 ID del canale Telegram (usa il tuo)
 # Per canali privati: -100xxxxxxxxxx
 # Per canali pubblici: @nomedelcanale
-CHANNEL_ID = os.environ.get("TELEGRAM_CHANNEL_ID", "-1002375600499")
+# Più canali/gruppi: separali con una virgola
+CHANNEL_IDS = [c.strip() for c in os.environ.get("TELEGRAM_CHANNEL_ID", "-1002375600499").split(",") if c.strip()]
 
 # 🔹 Intervallo tra i messaggi (in secondi)
 INTERVAL = int(os.environ.get("INTERVAL_SECONDS", "3600"))
@@ -23,6 +25,10 @@ INTERVAL = int(os.environ.get("INTERVAL_SECONDS", "3600"))
 # 🔹 Messaggio base con placeholder per l'orario
 BASE_MESSAGE = os.environ.get("MESSAGE_TEXT", "🎯 Messaggio automatico! Data/ora: {}")
 
+# 🔹 Client Bot API e coda di invio (limiti Telegram, retry_after, backoff)
+api = BotAPI(TOKEN)
+delivery = DeliveryQueue(api, workers=4)
+
 # =============================================
 # FUNZIONI DI UTILITY
 # =============================================
@@ -44,69 +50,51 @@ def check_environment():
         return False
     
     print(f"✅ Token: {TOKEN[:10]}...")
-    print(f"✅ Canale: {CHANNEL_ID}")
+    print(f"✅ Canali: {', '.join(CHANNEL_IDS)}")
     print(f"✅ Intervallo: {INTERVAL}s ({INTERVAL/3600:.1f} ore)")
     return True
 
-def test_telegram_connection():
+async def test_telegram_connection():
     """Testa la connessione all'API di Telegram"""
     print("🌐 Test connessione a Telegram API...")
     
     try:
-        url = f"https://api.telegram.org/bot{TOKEN}/getMe"
-        response = requests.get(url, timeout=10)
-        data = response.json()
-        
-        if data.get("ok"):
-            bot_name = data["result"]["username"]
-            print(f"✅ Connesso! Bot: @{bot_name}")
-            return True
-        else:
-            error_msg = data.get("description", "Errore sconosciuto")
-            print(f"❌ API Error: {error_msg}")
-            return False
-            
-    except requests.exceptions.ConnectionError:
-        print("❌ Errore di rete. Verifica la connessione internet.")
-        return False
+        me = await api.get_me()
+        print(f"✅ Connesso! Bot: @{me['username']}")
+        return True
     except Exception as e:
-        print(f"❌ Errore inaspettato: {e}")
+        print(f"❌ API Error: {e}")
         return False
 
-def send_telegram_message(text):
-    """Invia un messaggio al canale Telegram"""
-    url = f"https://api.telegram.org/bot{TOKEN}/sendMessage"
-    
-    payload = {
-        "chat_id": CHANNEL_ID,
-        "text": text,
-        "parse_mode": "HTML",  # Permette formattazione HTML base
-        "disable_web_page_preview": True
-    }
-    
+async def send_to_channel(channel_id, text):
+    """Invia un messaggio a un canale Telegram tramite la coda di invio"""
     try:
-        response = requests.post(url, json=payload, timeout=15)
-        data = response.json()
-        
-        if data.get("ok"):
-            return {"success": True, "message_id": data["result"]["message_id"]}
-        else:
-            error_code = data.get("error_code", "N/A")
-            error_desc = data.get("description", "Errore sconosciuto")
-            return {"success": False, "error": f"{error_code}: {error_desc}"}
-            
-    except requests.exceptions.Timeout:
+        result = await delivery.send(
+            channel_id, text,
+            parse_mode="HTML",  # Permette formattazione HTML base
+            disable_web_page_preview=True
+        )
+        return {"success": True, "message_id": result["message_id"]}
+    except asyncio.TimeoutError:
         return {"success": False, "error": "Timeout - connessione troppo lenta"}
-    except requests.exceptions.ConnectionError:
-        return {"success": False, "error": "Errore di connessione"}
     except Exception as e:
-        return {"success": False, "error": f"Errore generico: {str(e)}"}
+        return {"success": False, "error": f"{channel_id}: {e}"}
+
+async def send_telegram_message(text):
+    """Invia lo stesso messaggio a tutti i canali, in parallelo"""
+    results = await asyncio.gather(*(send_to_channel(c, text) for c in CHANNEL_IDS))
+    errors = [r["error"] for r in results if not r["success"]]
+    return {
+        "success": not errors,
+        "message_id": ", ".join(str(r["message_id"]) for r in results if r["success"]),
+        "error": "; ".join(errors),
+    }
 
 # =============================================
 # FUNZIONE PRINCIPALE
 # =============================================
 
-def main():
+async def run():
     """Funzione principale del bot"""
     print("=" * 60)
     print("🤖 BOT TELEGRAM PER RAILWAY")
@@ -117,7 +105,7 @@ def main():
         sys.exit(1)
     
     # Test connessione
-    if not test_telegram_connection():
+    if not await test_telegram_connection():
         print("\n💡 Suggerimenti:")
         print("• Controlla che il token sia corretto su @BotFather")
         print("• Assicurati che il bot sia ancora attivo")
@@ -146,10 +134,11 @@ def main():
             print(f"   📝 Testo: {message[:50]}...")
             
             # Invia il messaggio
-            result = send_telegram_message(message)
+            result = await send_telegram_message(message)
             
             if result["success"]:
-                print(f"   ✅ SUCCESSO! ID: {result['message_id']}")
+                stats = delivery.stats()
+                print(f"   ✅ SUCCESSO! ID: {result['message_id']} (latenza consegna p50: {stats['p50']:.2f}s)")
                 last_success = current_time
             else:
                 print(f"   ❌ FALLITO: {result['error']}")
@@ -163,9 +152,9 @@ def main():
             print(f"   Attesa di {INTERVAL} secondi...")
             
             # Attesa
-            time.sleep(INTERVAL)
+            await asyncio.sleep(INTERVAL)
             
-    except KeyboardInterrupt:
+    except (KeyboardInterrupt, asyncio.CancelledError):
         print(f"\n\n{'='*60}")
         print(f"🛑 BOT FERMATO MANUALMENTE")
         print(f"📊 Statistiche:")
@@ -176,6 +165,16 @@ def main():
     except Exception as e:
         print(f"\n⚠️ ERRORE CRITICO: {e}")
         print("💡 Controlla i log su Railway per dettagli")
+    
+    finally:
+        await delivery.close()
+        await api.close()
+
+def main():
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
 
 # =============================================
 # AVVIO
@@ -0,0 +1,127 @@
+"""
+Chat subscriptions and watchlists.
+
+Each subscribed chat has an optional watchlist of snapshot symbols (an empty
+watchlist means the full market report). Subscriptions live in a small
+SQLite table and are mirrored in memory; the scheduler asks for groups() so
+every distinct watchlist is rendered once and then broadcast to all of its
+chats.
+"""
+
+import json
+import re
+import sqlite3
+import threading
+import time
+
+SNAPSHOT_LISTS = ('indices', 'commodities', 'crypto', 'forex', 'yields')
+
+
+def normalize_watchlist(symbols):
+    """Canonical form used for grouping: lower-case, de-duplicated, sorted."""
+    return tuple(sorted({s.strip().lower() for s in symbols or () if s.strip()}))
+
+
+def parse_symbols(args):
+    """Command arguments into symbols: comma-separated if there are commas, else one per word."""
+    text = " ".join(args)
+    return [s.strip() for s in (text.split(',') if ',' in text else text.split()) if s.strip()]
+
+
+def matches(entry, symbol):
+    """'btc' matches 'BTC/USD', 'gold' matches 'Gold (XAU)', 's&p 500' matches 'S&P 500'."""
+    symbol = symbol.lower()
+    return entry == symbol or entry in re.split(r'[\s/()]+', symbol)
+
+
+def filter_snapshot(market_data, watchlist):
+    """The snapshot restricted to a watchlist; the full snapshot for an empty one."""
+    if not watchlist:
+        return market_data
+    filtered = dict(market_data)
+    for key in SNAPSHOT_LISTS:
+        filtered[key] = [item for item in market_data.get(key) or []
+                         if any(matches(entry, item['symbol']) for entry in watchlist)]
+    # The crypto Fear & Greed index only comes along with crypto (or when asked for)
+    if not filtered['crypto'] and not any('fear' in entry for entry in watchlist):
+        filtered['fear_greed'] = None
+    return filtered
+
+
+def chat_key(chat_id):
+    """Stored ids are strings; numeric ones go back to int for sending (@channel names stay)."""
+    return int(chat_id) if chat_id.lstrip('-').isdigit() else chat_id
+
+
+class SubscriptionStore:
+    def __init__(self, path='subscriptions.db'):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS subscriptions (
+                chat_id TEXT PRIMARY KEY,
+                watchlist TEXT NOT NULL,
+                subscribed REAL NOT NULL
+            )
+        """)
+        self.reload()
+
+    def reload(self):
+        """Re-read the table (other processes sharing the file may have changed it)."""
+        with self._lock:
+            rows = self._conn.execute("SELECT chat_id, watchlist FROM subscriptions").fetchall()
+        self._subs = {chat_id: tuple(json.loads(watchlist)) for chat_id, watchlist in rows}
+
+    def __len__(self):
+        return len(self._subs)
+
+    def __contains__(self, chat_id):
+        return str(chat_id) in self._subs
+
+    def watchlist(self, chat_id):
+        """The chat's watchlist, () for the full report (or when not subscribed)."""
+        return self._subs.get(str(chat_id), ())
+
+    def subscribe(self, chat_id, watchlist=None):
+        """Subscribe a chat, keeping its existing watchlist unless a new one is given."""
+        chat_id = str(chat_id)
+        if watchlist is None:
+            watchlist = self._subs.get(chat_id, ())
+        self._write(chat_id, normalize_watchlist(watchlist))
+
+    def unsubscribe(self, chat_id):
+        chat_id = str(chat_id)
+        if chat_id not in self._subs:
+            return False
+        with self._lock:
+            self._conn.execute("DELETE FROM subscriptions WHERE chat_id = ?", (chat_id,))
+        del self._subs[chat_id]
+        return True
+
+    def add(self, chat_id, symbols):
+        self.subscribe(chat_id, self.watchlist(chat_id) + tuple(symbols))
+
+    def remove(self, chat_id, symbols):
+        drop = set(normalize_watchlist(symbols))
+        self.subscribe(chat_id, [s for s in self.watchlist(chat_id) if s not in drop])
+
+    def _write(self, chat_id, watchlist):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO subscriptions (chat_id, watchlist, subscribed) VALUES (?, ?, ?) "
+                "ON CONFLICT (chat_id) DO UPDATE SET watchlist = excluded.watchlist",
+                (chat_id, json.dumps(list(watchlist)), time.time()))
+        self._subs[chat_id] = watchlist
+
+    def groups(self):
+        """{watchlist: [chat ids]}: one entry per distinct watchlist."""
+        out = {}
+        for chat_id, watchlist in self._subs.items():
+            out.setdefault(watchlist, []).append(chat_key(chat_id))
+        return out
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
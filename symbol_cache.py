@@ -0,0 +1,131 @@
+"""
+Per-symbol market cache with its own timestamp and TTL for every entry.
+
+Backed by SQLite: startup loads every entry with one query, writes touch only
+the entries whose data changed, and each write is a single transaction, so a
+crash never leaves a half-written cache behind (unlike rewriting a JSON file).
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class SymbolCache:
+    def __init__(self, path='market_cache.db', default_ttl=4 * 3600):
+        self.path = path
+        self.default_ttl = default_ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                category TEXT NOT NULL,
+                symbol TEXT NOT NULL,
+                data TEXT NOT NULL,
+                updated REAL NOT NULL,
+                ttl REAL NOT NULL,
+                PRIMARY KEY (category, symbol)
+            ) WITHOUT ROWID
+        """)
+        # In-memory mirror: (category, symbol) -> (data_json, updated, ttl)
+        self._entries = {
+            (c, s): (d, u, t)
+            for c, s, d, u, t in self._conn.execute("SELECT category, symbol, data, updated, ttl FROM entries")
+        }
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, category, symbol):
+        """Cached data for a symbol regardless of age, or None."""
+        entry = self._entries.get((category, symbol))
+        return json.loads(entry[0]) if entry else None
+
+    def updated_at(self, category, symbol):
+        entry = self._entries.get((category, symbol))
+        return entry[1] if entry else None
+
+    def expires_at(self, category, symbol):
+        entry = self._entries.get((category, symbol))
+        return entry[1] + entry[2] if entry else None
+
+    def is_fresh(self, category, symbol, now=None, margin=0):
+        expires = self.expires_at(category, symbol)
+        return expires is not None and (now or time.time()) + margin < expires
+
+    def expired(self, symbols, now=None, margin=0):
+        """The subset of a {category: {symbol: name}} map that is missing or past its TTL."""
+        now = now or time.time()
+        out = {}
+        for category, names in symbols.items():
+            stale = {s: n for s, n in names.items() if not self.is_fresh(category, s, now, margin)}
+            if stale:
+                out[category] = stale
+        return out
+
+    def last_update(self):
+        return max((u for _, u, _ in self._entries.values()), default=None)
+
+    def next_expiry(self):
+        return min((u + t for _, u, t in self._entries.values()), default=None)
+
+    def update(self, data, ttls=None, now=None):
+        """Store fresh entries from a {category: {symbol: data}} map.
+
+        Entries served from cache or without a price are skipped; unchanged
+        data only has its timestamp bumped. Returns how many rows changed.
+        """
+        now = now or time.time()
+        ttls = ttls or {}
+        rows = []
+        for category, symbols in data.items():
+            if category.startswith('_'):
+                continue
+            for symbol, item in symbols.items():
+                if item.get('from_cache') or item.get('price') is None:
+                    continue
+                payload = json.dumps(item, sort_keys=True)
+                ttl = ttls.get(category, self.default_ttl)
+                rows.append((category, symbol, payload, now, ttl))
+        if not rows:
+            return 0
+
+        changed = [r for r in rows if self._entries.get((r[0], r[1]), (None,))[0] != r[2]]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO entries (category, symbol, data, updated, ttl) VALUES (?, ?, ?, ?, ?)",
+                changed)
+            self._conn.executemany(
+                "UPDATE entries SET updated = ?, ttl = ? WHERE category = ? AND symbol = ?",
+                [(u, t, c, s) for c, s, _, u, t in rows if (c, s, _, u, t) not in changed])
+            self._conn.execute("COMMIT")
+        for c, s, d, u, t in rows:
+            self._entries[(c, s)] = (d, u, t)
+        return len(changed)
+
+    def import_json(self, json_path, ttls=None):
+        """One-off migration from the old market_cache.json file."""
+        if not os.path.exists(json_path) or self._entries:
+            return 0
+        try:
+            with open(json_path) as f:
+                legacy = json.load(f)
+            updated = time.mktime(time.strptime(legacy['_last_update'][:19], '%Y-%m-%dT%H:%M:%S'))
+        except Exception as e:
+            logger.warning(f"Legacy cache not imported: {e}")
+            return 0
+        count = self.update({k: v for k, v in legacy.items() if isinstance(v, dict)}, ttls, now=updated)
+        logger.info(f"📦 Imported {count} entries from {json_path}")
+        return count
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
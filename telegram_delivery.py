@@ -0,0 +1,295 @@
+"""
+Outbound Telegram delivery queue.
+
+Every message waits in its chat's lane (kept in order) until that chat may
+send again, then goes to a small worker pool. Telegram's limits are
+respected (about 30 messages/second per bot, one message/second per chat
+and 20/minute per group or channel), 429 `retry_after` is waited out instead
+of failing and network errors are retried with exponential backoff. Those
+per-chat waits are timers, not sleeping workers, so one throttled chat never
+holds up the others. Enqueue-to-delivery latency is recorded.
+
+The transport is anything with an async `send_message(chat_id, text,
+parse_mode=None, **kwargs)`: a python-telegram-bot `Bot`, or `BotAPI` below
+for the standalone scripts that do not run an Application.
+"""
+
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+
+import aiohttp
+
+from provider_health import percentile
+from rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_API = "https://api.telegram.org"
+
+
+class DeliveryError(Exception):
+    """Telegram refused the message for good (bad request, blocked, chat not found)."""
+
+
+class RetryAfter(Exception):
+    def __init__(self, retry_after, description=""):
+        super().__init__(description or f"Flood control, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class _ParseRejected(Exception):
+    """The message's Markdown/HTML was rejected; the caller resends it as plain text."""
+
+
+class BotAPI:
+    """Minimal async Bot API client over aiohttp."""
+
+    def __init__(self, token, base_url=TELEGRAM_API, session=None):
+        self.token = token
+        self.base_url = base_url.rstrip('/')
+        self._session = session
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=15))
+        return self._session
+
+    async def call(self, method, **params):
+        url = f"{self.base_url}/bot{self.token}/{method}"
+        payload = {k: v for k, v in params.items() if v is not None}
+        async with self._get_session().post(url, json=payload) as resp:
+            data = await resp.json(content_type=None)
+        if data.get('ok'):
+            return data['result']
+        description = data.get('description', 'Unknown error')
+        code = data.get('error_code', resp.status)
+        if code == 429:
+            raise RetryAfter((data.get('parameters') or {}).get('retry_after', 1), description)
+        if 400 <= code < 500:
+            raise DeliveryError(f"{code}: {description}")
+        raise RuntimeError(f"{code}: {description}")
+
+    async def get_me(self):
+        return await self.call('getMe')
+
+    async def send_message(self, chat_id, text, parse_mode=None, **kwargs):
+        return await self.call('sendMessage', chat_id=chat_id, text=text, parse_mode=parse_mode, **kwargs)
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+
+def classify(error):
+    """'retry_after', 'parse', 'permanent' or 'transient' for an exception from any transport."""
+    if getattr(error, 'retry_after', None) is not None:
+        return 'retry_after'
+    text = str(error).lower()
+    if "can't parse entities" in text or "can't find end of the entity" in text:
+        return 'parse'
+    if isinstance(error, DeliveryError) or type(error).__name__ in ('BadRequest', 'Forbidden', 'InvalidToken', 'ChatMigrated'):
+        return 'permanent'
+    return 'transient'
+
+
+def retry_seconds(error):
+    value = error.retry_after
+    return value.total_seconds() if hasattr(value, 'total_seconds') else float(value)
+
+
+def is_group(chat_id):
+    """Groups, supergroups and channels have negative ids or @usernames."""
+    return isinstance(chat_id, str) or chat_id < 0
+
+
+class Delivery:
+    __slots__ = ('transport', 'chat_id', 'text', 'parse_mode', 'kwargs', 'future', 'queued_at', 'attempts')
+
+    def __init__(self, transport, chat_id, text, parse_mode, kwargs, future):
+        self.transport = transport
+        self.chat_id = chat_id
+        self.text = text
+        self.parse_mode = parse_mode
+        self.kwargs = kwargs
+        self.future = future
+        self.queued_at = time.monotonic()
+        self.attempts = 0
+
+
+class DeliveryQueue:
+    def __init__(self, transport=None, per_second=30, chat_per_minute=60, group_per_minute=20,
+                 workers=4, max_attempts=5, backoff=1.0, max_backoff=60.0, maxsize=1000, window=500):
+        self.transport = transport
+        self.per_second = per_second
+        self.chat_per_minute = chat_per_minute
+        self.group_per_minute = group_per_minute
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.maxsize = maxsize
+        self.latencies = deque(maxlen=window)
+        self.sent = self.failed = self.retries = self.throttled = self.degraded = 0
+        self._loop = None
+
+    def _ensure_started(self):
+        """Create the queues and workers on the running loop (again, if the loop changed)."""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self._loop = loop
+        self._ready = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.maxsize)
+        self._global = TokenBucket('telegram', self.per_second * 60, capacity=self.per_second)
+        self._chats = {}
+        # chat_id -> messages in order; the head is the one being scheduled or sent
+        self._lanes = {}
+        self._blocked_until = {}
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+
+    def _chat_bucket(self, chat_id):
+        if chat_id not in self._chats:
+            per_minute = self.group_per_minute if is_group(chat_id) else self.chat_per_minute
+            self._chats[chat_id] = TokenBucket(f"telegram:{chat_id}", per_minute, capacity=1)
+        return self._chats[chat_id]
+
+    async def _submit(self, chat_id, text, parse_mode, transport, kwargs):
+        self._ensure_started()
+        await self._slots.acquire()
+        future = self._loop.create_future()
+        lane = self._lanes.setdefault(chat_id, deque())
+        lane.append(Delivery(transport or self.transport, chat_id, text, parse_mode, kwargs, future))
+        self._idle.clear()
+        if len(lane) == 1:
+            self._schedule(chat_id)
+        return await future
+
+    def _schedule(self, chat_id):
+        """Hand the chat's next message to the workers if the chat may send now, else retry when it may."""
+        lane = self._lanes.get(chat_id)
+        if not lane:
+            return
+        wait = self._blocked_until.get(chat_id, 0) - time.monotonic()
+        if wait <= 0:
+            wait = self._chat_bucket(chat_id).try_acquire()
+        if wait > 0:
+            self._loop.call_later(wait, self._schedule, chat_id)
+        else:
+            self._ready.put_nowait(lane[0])
+
+    def _finish(self, item, result=None, error=None):
+        """Settle the chat's head message and let the next one in its lane go."""
+        lane = self._lanes[item.chat_id]
+        lane.popleft()
+        if not lane:
+            del self._lanes[item.chat_id]
+            if not self._lanes:
+                self._idle.set()
+        self._slots.release()
+        if not item.future.done():
+            if error is not None:
+                item.future.set_exception(error)
+            else:
+                item.future.set_result(result)
+
+    async def send(self, chat_id, text, parse_mode=None, transport=None, **kwargs):
+        """Queue one message and wait until it is delivered (or has failed for good).
+
+        If Telegram rejects the formatting, the message is resent as plain text.
+        """
+        try:
+            return await self._submit(chat_id, text, parse_mode, transport, kwargs)
+        except _ParseRejected:
+            self.degraded += 1
+            return await self._submit(chat_id, text, None, transport, kwargs)
+
+    async def send_chunks(self, chat_id, chunks, parse_mode=None, transport=None):
+        """Send pre-split chunks in order.
+
+        Once one chunk's formatting is rejected, it and the rest go out as
+        plain text: one extra call instead of a failed call per chunk.
+        """
+        results = []
+        for chunk in chunks:
+            try:
+                results.append(await self._submit(chat_id, chunk, parse_mode, transport, {}))
+            except _ParseRejected:
+                self.degraded += 1
+                parse_mode = None
+                results.append(await self._submit(chat_id, chunk, None, transport, {}))
+        return results
+
+    async def _worker(self):
+        while True:
+            item = await self._ready.get()
+            try:
+                retry_in = await self._deliver(item)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._finish(item, error=e)
+                retry_in = None
+            if retry_in:
+                self._loop.call_later(retry_in, self._schedule, item.chat_id)
+            else:
+                self._schedule(item.chat_id)
+
+    async def _deliver(self, item):
+        """One send attempt. Returns the backoff before the next attempt, or None once settled."""
+        await self._global.acquire()
+        item.attempts += 1
+        try:
+            result = await item.transport.send_message(
+                chat_id=item.chat_id, text=item.text, parse_mode=item.parse_mode, **item.kwargs)
+        except Exception as e:
+            kind = classify(e)
+            if kind == 'parse' and item.parse_mode:
+                self._finish(item, error=_ParseRejected(str(e)))
+                return None
+            if kind in ('permanent', 'parse') or item.attempts == self.max_attempts:
+                self.failed += 1
+                logger.error(f"📭 Telegram delivery to {item.chat_id} failed: {e}")
+                self._finish(item, error=e)
+                return None
+            self.retries += 1
+            if kind == 'retry_after':
+                wait = retry_seconds(e)
+                self.throttled += 1
+                # The whole chat waits; _schedule holds its lane until then
+                self._blocked_until[item.chat_id] = time.monotonic() + wait
+                logger.warning(f"⏳ Telegram 429 for {item.chat_id}, retrying in {wait:.0f}s")
+                return 0
+            wait = min(self.max_backoff, self.backoff * 2 ** (item.attempts - 1)) * random.uniform(0.8, 1.2)
+            logger.warning(f"Telegram send to {item.chat_id} failed ({e}), retry {item.attempts} in {wait:.1f}s")
+            return wait
+        self.sent += 1
+        self.latencies.append(time.monotonic() - item.queued_at)
+        self._finish(item, result=result)
+        return None
+
+    def stats(self):
+        return {
+            'sent': self.sent,
+            'failed': self.failed,
+            'retries': self.retries,
+            'throttled': self.throttled,
+            'degraded': self.degraded,
+            'queued': sum(len(lane) for lane in self._lanes.values()) if self._loop else 0,
+            'p50': percentile(self.latencies, 50),
+            'p95': percentile(self.latencies, 95),
+        }
+
+    async def close(self):
+        """Wait for queued messages, then stop the workers."""
+        if self._loop is None:
+            return
+        await self._idle.wait()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._loop = None
@@ -0,0 +1,30 @@
+from alerts import AlertEngine, format_alert
+
+
+def test_alert_debounce_and_cooldown():
+    """Un alert richiede conferme consecutive e poi rispetta il cooldown"""
+    engine = AlertEngine(threshold=5.0, cooldown=600, confirmations=2)
+    quote = lambda price, day=None: [{'symbol': 'BTC-USD', 'price': price, 'change_pct': day}]
+
+    assert engine.evaluate(quote(100.0), now=0) == []
+    assert engine.evaluate(quote(106.0), now=30) == []       # prima conferma
+    alerts = engine.evaluate(quote(106.5), now=60)
+    assert [(a['trigger'], a['change']) for a in alerts] == [('move', 6.5)]
+    assert "BTC-USD" in format_alert(alerts[0])
+
+    # Nuovo riferimento 106.5: serve un altro 5%, e il cooldown blocca i duplicati
+    assert engine.evaluate(quote(112.0), now=90) == []
+    assert engine.evaluate(quote(112.5), now=120) == []
+    assert engine.evaluate(quote(112.5), now=700)[0]['symbol'] == 'BTC-USD'
+
+
+def test_alert_day_change_and_flicker():
+    engine = AlertEngine(threshold=5.0, cooldown=0, confirmations=2)
+    assert engine.evaluate([{'symbol': '^VIX', 'price': 20.0, 'change_pct': 6.0}], now=0) == []
+    # La condizione sparisce: il conteggio riparte
+    assert engine.evaluate([{'symbol': '^VIX', 'price': 20.0, 'change_pct': 1.0}], now=30) == []
+    assert engine.evaluate([{'symbol': '^VIX', 'price': 20.0, 'change_pct': 6.0}], now=60) == []
+    assert engine.evaluate([{'symbol': '^VIX', 'price': 20.0, 'change_pct': 6.2}], now=90)[0]['trigger'] == 'day'
+    # Resta sopra soglia: nessun nuovo alert 'day' finché non rientra
+    assert engine.evaluate([{'symbol': '^VIX', 'price': 20.0, 'change_pct': 6.5}], now=120) == []
+    assert engine.evaluate([{'symbol': '^VIX', 'price': 20.0, 'change_pct': 6.5}], now=150) == []
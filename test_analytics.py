@@ -0,0 +1,55 @@
+import numpy as np
+
+import analytics
+
+
+def test_compute_analytics_aligns_and_flags_moves():
+    """Serie allineate su bucket comuni, correlazioni e z-score calcolati in un passaggio"""
+    rng = np.random.default_rng(1)
+    steps = 8 * 96
+    ts = 1_700_000_000 + np.arange(steps) * analytics.BUCKET_SECONDS
+    base = 100 * np.exp(np.cumsum(rng.normal(0, 0.001, steps)))
+    shocked = base.copy()
+    shocked[-10:] *= 1.2
+
+    rows = []
+    rows += [('AAA', int(t), float(p)) for t, p in zip(ts, base)]
+    # BBB si aggiorna solo ogni due bucket: un rendimento per ogni osservazione reale
+    rows += [('BBB', int(t) + 5, float(p) * 2) for t, p in list(zip(ts, base))[::2]]
+    rows += [('CCC', int(t), float(p)) for t, p in zip(ts, shocked)]
+    rows += [('Fear & Greed', int(ts[-1]), 50.0)]
+
+    result = analytics.compute_analytics(rows)
+    assert result['symbols'] == ['AAA', 'BBB', 'CCC']
+    assert result['points'] == steps
+    a, b, c = range(3)
+    assert result['correlation'][a, b] > 0.5
+    assert abs(result['zscore'][c]) > abs(result['zscore'][a])
+    assert result['return_7d'][c] > result['return_7d'][a]
+
+    summary = analytics.summarize(result)
+    assert summary.startswith("📐 HISTORY ANALYTICS")
+    assert "CCC" in summary
+
+
+def test_gaps_do_not_dampen_volatility():
+    """Un buco nei dati non crea rendimenti nulli: volatilità e z-score restano quelli della serie completa"""
+    rng = np.random.default_rng(2)
+    steps = 8 * 96
+    ts = 1_700_000_000 + np.arange(steps) * analytics.BUCKET_SECONDS
+    prices = 100 * np.exp(np.cumsum(rng.normal(0, 0.002, steps)))
+
+    full = [('AAA', int(t), float(p)) for t, p in zip(ts, prices)]
+    # Stessa serie con un'interruzione di due giorni a metà finestra
+    gap = np.r_[:300, 492:steps]
+    sparse = [('AAA', int(ts[i]), float(prices[i])) for i in gap]
+
+    dense, holed = analytics.compute_analytics(full), analytics.compute_analytics(sparse)
+    assert abs(holed['volatility'][0] / dense['volatility'][0] - 1) < 0.02
+    assert abs(holed['zscore'][0] / dense['zscore'][0] - 1) < 0.02
+    assert holed['return_1d'][0] == dense['return_1d'][0]
+
+
+def test_compute_analytics_needs_history():
+    assert analytics.compute_analytics([('AAA', 1, 1.0)]) is None
+    assert analytics.summarize(None) == ""
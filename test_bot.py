@@ -1,5 +1,14 @@
 import pytest
 import os
+import asyncio
+from urllib.parse import unquote
+
+os.environ.setdefault("TELEGRAM_TOKEN", "123456:ABC-DEF")
+os.environ.setdefault("CHAT_ID", "1")
+os.environ.setdefault("CLAUDE_API_KEY", "test")
+
+import bot
+
 
 def test_environment_variables():
     """Test che le variabili d'ambiente siano configurabili"""
@@ -9,3 +18,481 @@ def test_token_format():
     """Test formato token"""
     token = os.getenv("TELEGRAM_BOT_TOKEN", "123456:ABC-DEF")
     assert ":" in token
+
+def test_gather_with_deadline_returns_partial_results():
+    """Le fonti lente vengono scartate alla scadenza, le altre restano"""
+    async def value(v, delay):
+        await asyncio.sleep(delay)
+        return v
+
+    async def boom():
+        raise RuntimeError("down")
+
+    results, report = asyncio.run(bot.gather_with_deadline({
+        'fast': value(1, 0),
+        'slow': value(2, 5),
+        'broken': boom(),
+    }, deadline=0.2))
+
+    assert results == {'fast': 1, 'slow': None, 'broken': None}
+    assert report['timed_out'] == ['slow']
+    assert report['failed'] == ['broken']
+    assert report['elapsed'] < 1
+    assert set(report['timings']) == {'fast', 'slow', 'broken'}
+
+def test_deadline_cancellations_trip_the_breaker(monkeypatch):
+    """Le chiamate cancellate dalla scadenza contano come timeout: il circuito si apre e la sonda annullata lo riapre"""
+    class HangingSession:
+        def get(self, url, **kwargs):
+            return self
+
+        async def __aenter__(self):
+            await asyncio.sleep(60)
+
+        async def __aexit__(self, *exc):
+            return False
+
+    now = [0.0]
+    health = bot.HealthRegistry(failure_threshold=2, cooldown=60, clock=lambda: now[0])
+    monkeypatch.setattr(bot, 'health', health)
+    url = f"{bot.FRED_BASE_URL}/fred/series/observations?series_id=DGS10"
+
+    def cycle():
+        return asyncio.run(bot.gather_with_deadline(
+            {'fred': bot.fetch_json(HangingSession(), url)}, deadline=0.05))[1]
+
+    assert cycle()['timed_out'] == ['fred']
+    assert cycle()['timed_out'] == ['fred']
+    assert health.state('FRED') == bot.OPEN
+    assert cycle()['timed_out'] == []  # saltato senza richiesta
+
+    now[0] = 61
+    assert cycle()['timed_out'] == ['fred']
+    assert health.state('FRED') == bot.OPEN
+    assert health.report()['FRED']['retry_in'] == 60
+
+def test_yahoo_quotes_batch_and_fallback(monkeypatch):
+    """Un'unica richiesta batch se Yahoo la accetta, altrimenti chart per simbolo"""
+    calls = []
+
+    async def fake_fetch(session, url, headers=None, timeout=10):
+        calls.append(url)
+        if '/v7/finance/quote' in url:
+            if batch_ok:
+                return {'quoteResponse': {'result': [
+                    {'symbol': 'GC=F', 'regularMarketPrice': 110.0, 'regularMarketPreviousClose': 100.0},
+                    {'symbol': '^VIX', 'regularMarketPrice': 20.0, 'regularMarketPreviousClose': 25.0},
+                ]}}
+            return None
+        return {'chart': {'result': [{'meta': {'regularMarketPrice': 50.0, 'chartPreviousClose': 50.0}}]}}
+
+    monkeypatch.setattr(bot, 'fetch_json', fake_fetch)
+    symbols = {'^VIX': 'VIX', 'GC=F': 'Gold'}
+
+    batch_ok = True
+    monkeypatch.setattr(bot, '_yahoo_batch_disabled_until', 0.0)
+    quotes = asyncio.run(bot.get_yahoo_quotes(None, symbols))
+    assert [q['symbol'] for q in quotes] == ['VIX', 'Gold']
+    assert quotes[1]['change_pct'] == 10.0
+    assert len(calls) == 1
+
+    calls.clear()
+    batch_ok = False
+    monkeypatch.setattr(bot, '_yahoo_batch_disabled_until', 0.0)
+    quotes = asyncio.run(bot.get_yahoo_quotes(None, symbols))
+    assert [q['price'] for q in quotes] == [50.0, 50.0]
+    assert len(calls) == 3
+
+    # Dopo un rifiuto il batch non viene ritentato subito
+    calls.clear()
+    asyncio.run(bot.get_yahoo_quotes(None, symbols))
+    assert len(calls) == 2
+
+def test_yahoo_markets_use_one_batch_and_respect_open_circuit(monkeypatch):
+    """Indici e materie prime in un'unica richiesta batch; a circuito aperto il batch non viene disattivato"""
+    calls = []
+
+    async def fake_fetch(session, url, headers=None, timeout=10):
+        calls.append(url)
+        symbols = url.split('symbols=')[1].split(',')
+        return {'quoteResponse': {'result': [
+            {'symbol': unquote(s), 'regularMarketPrice': 10.0, 'regularMarketPreviousClose': 10.0} for s in symbols]}}
+
+    monkeypatch.setattr(bot, 'fetch_json', fake_fetch)
+    monkeypatch.setattr(bot, '_yahoo_batch_disabled_until', 0.0)
+    markets = asyncio.run(bot.get_yahoo_markets(None))
+    assert len(calls) == 1
+    assert [q['symbol'] for q in markets['commodities']] == list(bot.YAHOO_COMMODITIES.values())
+    assert len(markets['indices']) == len(bot.YAHOO_INDICES)
+
+    async def circuit_open(session, url, headers=None, timeout=10):
+        return None
+
+    health = bot.HealthRegistry()
+    health._stats('Yahoo Finance').state = bot.OPEN
+    monkeypatch.setattr(bot, 'health', health)
+    monkeypatch.setattr(bot, 'fetch_json', circuit_open)
+    asyncio.run(bot.get_yahoo_quotes(None, {'^VIX': 'VIX'}))
+    assert bot._yahoo_batch_disabled_until == 0.0
+
+def test_snapshot_cache_single_flight_and_stale_while_revalidate():
+    """Chiamate concorrenti condividono un solo refresh; i dati scaduti vengono serviti subito"""
+    calls = []
+
+    async def fake_fetch(names):
+        calls.append(sorted(names))
+        await asyncio.sleep(0.05)
+        price = len(calls)
+        return {'btc': {'symbol': 'BTC/USD', 'price': price, 'source': 'test'}}, {'timed_out': [], 'failed': []}
+
+    async def scenario():
+        cache = bot.MarketSnapshotCache(fetch=fake_fetch, ttls={'btc': 0.1})
+        snapshots = await asyncio.gather(*(cache.get() for _ in range(3)))
+        assert len(calls) == 1
+        assert all(s['crypto'][0]['price'] == 1 for s in snapshots)
+
+        await asyncio.sleep(0.15)
+        stale = await cache.get()
+        assert stale['crypto'][0]['price'] == 1
+        await cache.refresh()
+        assert (await cache.get())['crypto'][0]['price'] == 2
+        assert cache.version == 2
+
+    asyncio.run(scenario())
+
+class FakeMessage:
+    chat_id = 42
+
+    def __init__(self):
+        self.edits = []
+
+    async def edit_text(self, text, parse_mode=None):
+        self.edits.append((text, parse_mode))
+
+
+class FakeBot:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text, parse_mode=None):
+        self.sent.append((chat_id, text, parse_mode))
+
+
+def test_streaming_message_throttles_and_splits():
+    """Le modifiche durante lo streaming sono limitate e il testo finale viene diviso"""
+    message, fake_bot = FakeMessage(), FakeBot()
+    streaming = bot.StreamingMessage(message, interval=60)
+
+    async def scenario():
+        for i in range(20):
+            await streaming.update("token " * i)
+        final = "\n\n".join(["A" * 3000, "B" * 3000])
+        await streaming.finish(fake_bot, final)
+
+    asyncio.run(scenario())
+    assert len(message.edits) == 2
+    assert message.edits[-1] == ("A" * 3000, 'Markdown')
+    assert fake_bot.sent == [(42, "B" * 3000, 'Markdown')]
+
+def sample_snapshot(btc=65000.0):
+    return {
+        'timestamp': '2026-01-01 00:00 UTC',
+        'indices': [{'symbol': 'S&P 500', 'price': 5000.0, 'change_pct': 0.5, 'source': 'Yahoo'}],
+        'commodities': [],
+        'crypto': [{'symbol': 'BTC/USD', 'price': btc, 'change_24h': 1.2, 'source': 'CoinGecko'}],
+        'forex': [],
+        'yields': [],
+        'fear_greed': {'value': 55, 'classification': 'Greed'},
+    }
+
+
+def test_generate_analysis_uses_content_addressed_cache(monkeypatch):
+    """Stessi dati arrotondati e stessi titoli: nessuna nuova chiamata a Claude"""
+    class FakeMessages:
+        calls = []
+
+        async def create(self, **request):
+            self.calls.append(request)
+            usage = type('Usage', (), {'cache_read_input_tokens': 300})()
+            return type('Response', (), {'content': [type('Block', (), {'text': 'report'})()], 'usage': usage})()
+
+    fake = type('FakeClaude', (), {'messages': FakeMessages()})()
+    monkeypatch.setattr(bot, '_claude', fake)
+    monkeypatch.setattr(bot, 'analysis_cache', bot.AnalysisCache(ttl=60))
+
+    async def scenario():
+        assert await bot.generate_analysis(sample_snapshot(65000.0), ['Fed holds']) == 'report'
+        assert await bot.generate_analysis(sample_snapshot(65001.0), ['Fed holds']) == 'report'
+        await bot.generate_analysis(sample_snapshot(65000.0), ['Fed cuts'])
+
+    asyncio.run(scenario())
+    assert len(FakeMessages.calls) == 2
+    assert FakeMessages.calls[0]['system'][0]['cache_control'] == {'type': 'ephemeral'}
+    stats = bot.analysis_cache.stats()
+    assert (stats['hits'], stats['misses'], stats['cached_input_tokens']) == (1, 2, 600)
+
+def test_analysis_digest_covers_history_analytics():
+    """Le analytics storiche fanno parte del prompt: se cambiano, cambia la chiave della cache"""
+    calm = {**sample_snapshot(), 'analytics': "📐 HISTORY ANALYTICS\n  • Unusual 1d moves: BTC/USD +0.4σ"}
+    stressed = {**sample_snapshot(), 'analytics': "📐 HISTORY ANALYTICS\n  • Unusual 1d moves: BTC/USD +3.1σ"}
+    assert bot.analysis_digest(calm, ['Fed holds']) != bot.analysis_digest(stressed, ['Fed holds'])
+    assert bot.analysis_digest(calm, ['Fed holds']) == bot.analysis_digest(dict(calm), ['Fed holds'])
+
+def test_broadcast_renders_once_per_watchlist(monkeypatch, tmp_path):
+    """Tre chat, due watchlist distinte: due analisi generate, tre messaggi inviati"""
+    subs = bot.SubscriptionStore(str(tmp_path / 'subs.db'))
+    subs.subscribe(1)
+    subs.subscribe(2)
+    subs.subscribe(3, ['BTC'])
+    monkeypatch.setattr(bot, '_subscriptions', subs)
+
+    async def inputs():
+        return sample_snapshot(), []
+    monkeypatch.setattr(bot, 'load_report_inputs', inputs)
+
+    rendered = []
+
+    async def analysis(market_data, news, on_text=None, fallback=True):
+        rendered.append([i['symbol'] for i in market_data['indices']])
+        return f"report {len(rendered)}"
+    monkeypatch.setattr(bot, 'generate_analysis', analysis)
+    monkeypatch.setattr(bot, 'change_gate', bot.ChangeGate())
+
+    fake_bot = FakeBot()
+    asyncio.run(bot.broadcast_reports(fake_bot))
+    assert sorted(rendered) == [[], ['S&P 500']]
+    assert sorted(chat for chat, _, _ in fake_bot.sent) == [1, 2, 3]
+
+def test_flat_markets_skip_the_llm(monkeypatch, tmp_path):
+    """Mercati fermi: nota di riepilogo senza Claude; BTC +5%: di nuovo il report completo"""
+    subs = bot.SubscriptionStore(str(tmp_path / 'subs.db'))
+    subs.subscribe(1)
+    monkeypatch.setattr(bot, '_subscriptions', subs)
+    monkeypatch.setattr(bot, 'change_gate', bot.ChangeGate())
+    snapshots = [sample_snapshot(), sample_snapshot(65300.0), sample_snapshot(68500.0)]
+
+    async def inputs():
+        return snapshots.pop(0), []
+    monkeypatch.setattr(bot, 'load_report_inputs', inputs)
+
+    calls = []
+
+    async def analysis(market_data, news, on_text=None, fallback=True):
+        calls.append(market_data['crypto'][0]['price'])
+        return "full report"
+    monkeypatch.setattr(bot, 'generate_analysis', analysis)
+
+    fake_bot = FakeBot()
+    for _ in range(3):
+        asyncio.run(bot.broadcast_reports(fake_bot))
+    assert calls == [65000.0, 68500.0]
+    texts = [text for _, text, _ in fake_bot.sent]
+    assert texts[0] == texts[2] == "full report"
+    assert texts[1].startswith("😴 No significant market change") and "BTC/USD" in texts[1]
+
+def test_failed_analysis_is_not_a_baseline(monkeypatch, tmp_path):
+    """Claude non risponde: si inviano i dati grezzi ma il ciclo successivo riprova il report completo"""
+    subs = bot.SubscriptionStore(str(tmp_path / 'subs.db'))
+    subs.subscribe(1)
+    monkeypatch.setattr(bot, '_subscriptions', subs)
+    monkeypatch.setattr(bot, 'change_gate', bot.ChangeGate())
+    monkeypatch.setattr(bot, 'analysis_cache', bot.AnalysisCache(ttl=60))
+
+    async def inputs():
+        return sample_snapshot(), []
+    monkeypatch.setattr(bot, 'load_report_inputs', inputs)
+
+    class DownMessages:
+        calls = 0
+
+        async def create(self, **request):
+            DownMessages.calls += 1
+            raise RuntimeError("overloaded")
+    monkeypatch.setattr(bot, '_claude', type('FakeClaude', (), {'messages': DownMessages()})())
+
+    fake_bot = FakeBot()
+    for _ in range(2):
+        asyncio.run(bot.broadcast_reports(fake_bot))
+    assert DownMessages.calls == 2
+    assert all(text.startswith("🤖 *AI Analysis Unavailable*") for _, text, _ in fake_bot.sent)
+
+def test_render_cache_per_version_and_format():
+    """Stessa versione e formato: testo riusato; Markdown e prompt renderizzati a parte"""
+    snapshot = {**sample_snapshot(), 'version': 7}
+    first = bot.rendered(snapshot, 'markdown')
+    assert bot.rendered(dict(snapshot), 'markdown') is first
+    assert "*📊 MAJOR INDICES*" in first.text
+    assert "📊 MAJOR INDICES:\n  • S&P 500: 5,000.00 (+0.50%)" in bot.format_market_data_for_claude(snapshot)
+    assert bot.rendered({**snapshot, 'version': 8}, 'markdown') is not first
+    assert first.chunks == [first.text]
+
+def test_markdown_rendering_escapes_symbols():
+    """In Markdown i caratteri speciali nei simboli e nelle analytics vengono escapati, i titoli no"""
+    snapshot = sample_snapshot()
+    snapshot['commodities'] = [{'symbol': 'BRENT_OIL', 'price': 80.0, 'change_pct': 1.0}]
+    snapshot['analytics'] = "📐 Unusual moves: [BTC] *3σ* `x`"
+    text = bot.render_snapshot(snapshot, 'markdown')
+    assert "*🏗️ COMMODITIES*" in text
+    assert "BRENT\\_OIL: $80.00" in text
+    assert "\\[BTC] \\*3σ\\* \\`x\\`" in text
+
+def test_import_leaves_heavy_modules_for_later():
+    """L'import del bot non carica anthropic né numpy: arrivano al primo uso"""
+    import subprocess
+    import sys
+    code = "import bot, sys; print(sorted(m for m in ('anthropic', 'numpy') if m in sys.modules))"
+    out = subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                         capture_output=True, text=True, env=os.environ, check=True).stdout
+    assert out.strip().splitlines()[-1] == '[]'
+
+def test_crypto_fetchers_read_the_live_price_book(monkeypatch):
+    """Con il price book aggiornato le crypto non fanno richieste HTTP; senza, si torna al polling"""
+    async def no_network(*args, **kwargs):
+        raise AssertionError("unexpected HTTP request")
+
+    monkeypatch.setattr(bot, 'fetch_json', no_network)
+    book = bot.PriceBook(bot.CRYPTO_PRODUCTS)
+    monkeypatch.setattr(bot, 'price_book', book)
+    for product in bot.CRYPTO_PRODUCTS:
+        book.update(product, 100.0, open_24h=80.0)
+
+    crypto = asyncio.run(bot.get_coingecko_data(None))
+    assert [c['symbol'] for c in crypto] == list(bot.CRYPTO_PRODUCTS.values())
+    assert crypto[0]['change_24h'] == 25.0
+    assert asyncio.run(bot.get_coinbase_btc(None))['source'] == 'Coinbase WS'
+
+    monkeypatch.setattr(bot, 'price_book', bot.PriceBook(bot.CRYPTO_PRODUCTS))
+    monkeypatch.setattr(bot, 'fetch_json', lambda *a, **k: asyncio.sleep(0))
+    assert asyncio.run(bot.get_coingecko_data(None)) == []
+
+def test_follower_serves_the_leader_snapshot(monkeypatch, tmp_path):
+    """Una replica follower non chiama le API: usa lo snapshot pubblicato dal leader"""
+    store = bot.LeaseStore(str(tmp_path / 'coord.db'))
+    version = store.next_version()
+    store.publish('snapshot', sample_snapshot(), version)
+    store.publish('news', ['Fed holds'], store.next_version())
+    monkeypatch.setattr(bot, '_coordination', store)
+    monkeypatch.setattr(bot, '_shared', {})
+    monkeypatch.setattr(bot, 'elector', type('Follower', (), {'is_leader': False})())
+
+    async def no_fetch(names):
+        raise AssertionError("followers do not fetch")
+    monkeypatch.setattr(bot, 'market_cache', bot.MarketSnapshotCache(fetch=no_fetch))
+
+    async def no_history():
+        return ""
+    monkeypatch.setattr(bot, 'history_analytics', no_history)
+
+    market_data, news = asyncio.run(bot.load_report_inputs())
+    assert market_data['crypto'][0]['price'] == 65000.0
+    assert market_data['version'] == version
+    assert news == ['Fed holds']
+
+def test_history_is_pruned_by_the_daily_job(monkeypatch, tmp_path):
+    """Il job giornaliero elimina lo storico oltre MARKET_HISTORY_DAYS; sui follower non tocca il DB condiviso"""
+    import time as _time
+    store = bot.MarketStore(str(tmp_path / 'history.db'))
+    now = int(_time.time())
+    store.append([('BTC/USD', 60000.0, None)], ts=now - 200 * 86400)
+    store.append([('BTC/USD', 65000.0, None)], ts=now)
+    monkeypatch.setattr(bot, '_market_store', store)
+
+    monkeypatch.setattr(bot, 'elector', type('Follower', (), {'is_leader': False})())
+    asyncio.run(bot.prune_history())
+    assert len(store.history()) == 2
+
+    monkeypatch.setattr(bot, 'elector', None)
+    asyncio.run(bot.prune_history())
+    assert [price for _, _, price in store.history()] == [65000.0]
+
+def test_follower_status_shows_the_leader_health(monkeypatch, tmp_path):
+    """/status su un follower mostra la salute dei provider pubblicata dal leader, senza chiamare le API"""
+    store = bot.LeaseStore(str(tmp_path / 'coord.db'))
+    leader_health = bot.HealthRegistry()
+    leader_health.record('FRED', True, 0.25)
+    store.publish('health', leader_health.report(), store.next_version())
+    monkeypatch.setattr(bot, '_coordination', store)
+    monkeypatch.setattr(bot, '_shared', {})
+    monkeypatch.setattr(bot, 'health', bot.HealthRegistry())
+    monkeypatch.setattr(bot, 'elector', type('Follower', (), {'is_leader': False, 'transitions': 1})())
+
+    async def no_fetch(names):
+        raise AssertionError("followers do not fetch")
+    monkeypatch.setattr(bot, 'market_cache', bot.MarketSnapshotCache(fetch=no_fetch))
+
+    replies = []
+
+    class Message:
+        async def reply_text(self, text, parse_mode=None):
+            replies.append(text)
+
+    update = type('Update', (), {'message': Message()})()
+    asyncio.run(bot.cmd_status(update, None))
+    assert "✅ FRED: p50 250ms" in replies[0]
+    assert "follower" in replies[0]
+
+    monkeypatch.setattr(bot, '_shared', {})
+    store.publish('health', {}, store.next_version())
+    asyncio.run(bot.cmd_status(update, None))  # registro vuoto: nessun refresh sul follower
+    assert "No provider calls yet" in replies[1]
+
+def test_leader_publishes_headlines_on_election_and_on_demand(monkeypatch, tmp_path):
+    """Il leader pubblica i titoli appena eletto e dopo ogni refresh su richiesta, non solo dal job periodico"""
+    store = bot.LeaseStore(str(tmp_path / 'coord.db'))
+    monkeypatch.setattr(bot, '_coordination', store)
+    monkeypatch.setattr(bot, 'elector', None)
+    monkeypatch.setattr(bot, 'CRYPTO_STREAM', False)
+    monkeypatch.setattr(bot, 'get_http_session', lambda: None)
+
+    class FakeNews:
+        def __init__(self, titles):
+            self.titles, self.loaded = titles, []
+
+        def is_stale(self):
+            return not self.loaded
+
+        def headlines(self, n=8):
+            return self.loaded[:n]
+
+        def refresh(self, session):
+            async def load():
+                self.loaded = list(self.titles)
+            return asyncio.ensure_future(load())
+
+    refreshed = []
+    monkeypatch.setattr(bot, 'market_cache', type('Cache', (), {'refresh': lambda self: refreshed.append(1)})())
+
+    async def elected():
+        await bot.on_elected()
+        await asyncio.gather(*bot._background)
+    monkeypatch.setattr(bot, 'news_store', FakeNews(['Fed holds']))
+    asyncio.run(elected())
+    assert store.load('news')[1] == ['Fed holds'] and refreshed
+
+    monkeypatch.setattr(bot, 'news_store', FakeNews(['ECB cuts']))
+    assert asyncio.run(bot.fetch_market_news()) == ['ECB cuts']
+    assert store.load('news')[1] == ['ECB cuts']
+
+def test_follower_waits_for_the_leader_instead_of_fetching(monkeypatch, tmp_path):
+    """Nessuno snapshot pubblicato: il follower attende il leader, poi risponde "warming up" senza API né versioni"""
+    store = bot.LeaseStore(str(tmp_path / 'coord.db'))
+    monkeypatch.setattr(bot, '_coordination', store)
+    monkeypatch.setattr(bot, '_shared', {})
+    monkeypatch.setattr(bot, 'elector', type('Follower', (), {'is_leader': False})())
+    monkeypatch.setattr(bot, 'SHARED_WAIT_SECONDS', 0.3)
+
+    async def no_fetch(names):
+        raise AssertionError("followers do not fetch")
+    monkeypatch.setattr(bot, 'market_cache', bot.MarketSnapshotCache(fetch=no_fetch))
+
+    assert asyncio.run(bot.load_report_inputs())[0] is None
+    assert bot.publish_shared('snapshot', sample_snapshot()) is None
+    assert store.next_version() == 1  # il follower non ha consumato versioni
+
+    async def leader_publishes_late():
+        late = asyncio.get_running_loop().call_later(
+            0.1, lambda: store.publish('snapshot', sample_snapshot(), store.next_version()))
+        snapshot = await bot.current_snapshot()
+        late.cancel()
+        return snapshot
+    assert asyncio.run(leader_publishes_late())['version'] == 2
@@ -0,0 +1,38 @@
+from change_gate import ChangeGate, format_delta
+
+
+def snapshot(spx=5000.0, vix=14.0, ten_year=4.20, fear_greed=55):
+    return {
+        'indices': [{'symbol': 'S&P 500', 'price': spx}, {'symbol': 'VIX', 'price': vix}],
+        'yields': [{'symbol': 'US 10Y Yield', 'price': ten_year}],
+        'fear_greed': {'value': fear_greed, 'classification': 'Greed'},
+    }
+
+
+def test_first_report_and_flat_markets():
+    """Il primo report passa sempre; poi, sotto soglia, il gate lo blocca e spiega perché"""
+    gate = ChangeGate()
+    assert gate.check('full', snapshot(), now=0).significant
+    gate.record('full', snapshot(), now=0)
+    decision = gate.check('full', snapshot(spx=5030.0, vix=15.0), now=3600)
+    assert not decision.significant
+    assert decision.summary().startswith("largest move")
+    assert "S&P 500" in format_delta(decision)
+
+
+def test_thresholds_in_points_for_vix_yields_and_fear_greed():
+    """VIX, rendimenti e Fear & Greed si misurano in punti, non in percentuale"""
+    gate = ChangeGate()
+    gate.record('full', snapshot(), now=0)
+    assert gate.check('full', snapshot(vix=16.5), now=60).reasons == ["VIX +2.50 pts (threshold 2 pts)"]
+    assert gate.check('full', snapshot(ten_year=4.35), now=60).significant
+    assert gate.check('full', snapshot(fear_greed=40), now=60).significant
+    assert gate.check('full', snapshot(spx=5060.0), now=60).significant
+
+
+def test_max_quiet_forces_a_report():
+    """Dopo max_quiet il report completo parte comunque"""
+    gate = ChangeGate(max_quiet=86400)
+    gate.record('full', snapshot(), now=0)
+    decision = gate.check('full', snapshot(), now=90000)
+    assert decision.significant and decision.reasons == ["last full report 25h ago"]
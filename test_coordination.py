@@ -0,0 +1,59 @@
+import asyncio
+import time
+
+from coordination import LeaderElector, LeaseStore
+
+
+def test_lease_expires_and_changes_holder(tmp_path):
+    """Il lease resta a chi lo rinnova; scaduto, passa all'altra replica"""
+    now = [1000.0]
+    a = LeaseStore(str(tmp_path / 'coord.db'), clock=lambda: now[0])
+    b = LeaseStore(str(tmp_path / 'coord.db'), clock=lambda: now[0])
+    assert a.acquire('leader', 'a', ttl=10)
+    assert not b.acquire('leader', 'b', ttl=10)
+    now[0] += 8
+    assert a.acquire('leader', 'a', ttl=10)  # rinnovo
+    now[0] += 11
+    assert b.acquire('leader', 'b', ttl=10)
+    assert not a.acquire('leader', 'a', ttl=10)
+    assert a.holder('leader') == 'b'
+    b.release('leader', 'b')
+    assert a.holder('leader') is None
+
+
+def test_published_versions_never_repeat(tmp_path):
+    """La sequenza è condivisa: un nuovo leader non riusa le versioni del precedente"""
+    a = LeaseStore(str(tmp_path / 'coord.db'))
+    b = LeaseStore(str(tmp_path / 'coord.db'))
+    v1 = a.next_version()
+    a.publish('snapshot', {'crypto': []}, v1)
+    v2 = b.next_version()
+    assert v2 > v1
+    assert b.load('snapshot')[:2] == (v1, {'crypto': []})
+    assert b.load('snapshot', newer_than=v1) is None
+
+
+def test_failover_within_lease_time(tmp_path):
+    """Il leader smette di rinnovare (crash): il follower subentra entro ttl + intervallo"""
+    path = str(tmp_path / 'coord.db')
+
+    async def scenario():
+        leader = LeaderElector(LeaseStore(path), holder='a', ttl=0.4, interval=0.1)
+        follower = LeaderElector(LeaseStore(path), holder='b', ttl=0.4, interval=0.1)
+        await leader.start()
+        await follower.start()
+        assert leader.is_leader and not follower.is_leader
+
+        leader._task.cancel()  # crash: niente più rinnovi, niente release
+        crashed = time.monotonic()
+        while not follower.is_leader:
+            await asyncio.sleep(0.02)
+        takeover = time.monotonic() - crashed
+
+        # Arresto pulito: il lease viene rilasciato e ripreso al giro successivo
+        await follower.stop()
+        assert await leader.tick()
+        await leader.stop()
+        return takeover
+
+    assert asyncio.run(scenario()) < 0.8
@@ -0,0 +1,118 @@
+import asyncio
+import importlib.util
+import os
+from importlib.machinery import SourceFileLoader
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_market_bot():
+    """Il bot ibrido vive in 'Market bot complete· PY': lo carichiamo dal percorso"""
+    path = os.path.join(HERE, 'Market bot complete· PY')
+    loader = SourceFileLoader('market_bot_complete', path)
+    spec = importlib.util.spec_from_loader(loader.name, loader)
+    module = importlib.util.module_from_spec(spec)
+    loader.exec_module(module)
+    return module
+
+
+def test_update_all_markets_runs_providers_in_parallel(monkeypatch, tmp_path):
+    """I provider lavorano in parallelo: il tempo totale non è la somma delle attese"""
+    mb = load_market_bot()
+    monkeypatch.setattr(mb, 'CACHE_FILE', str(tmp_path / 'cache.db'))
+    monkeypatch.setattr(mb, 'AV_CALLS_PER_DAY', 1000)  # budget ampio: tutti i simboli pianificati
+
+    async def slow(result, delay=0.05):
+        await asyncio.sleep(delay)
+        return result
+
+    monkeypatch.setattr(mb, 'fetch_crypto_coingecko',
+                        lambda session, coin: slow({'price': 10.0, 'change_percent': 1.0, 'source': 'CoinGecko'}))
+    monkeypatch.setattr(mb, 'fetch_forex',
+                        lambda session, base: slow({'price': 1.1, 'change_percent': 0, 'source': 'ExchangeRate'}))
+    monkeypatch.setattr(mb, 'fetch_alpha_vantage',
+                        lambda session, symbol: slow({'price': 500.0, 'change_percent': -0.5, 'source': 'Alpha Vantage'}))
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        data = await mb.update_all_markets()
+        return data, loop.time() - started
+
+    data, elapsed = asyncio.run(scenario())
+    assert list(data) == list(mb.MARKET_SYMBOLS)
+    assert list(data['Crypto']) == list(mb.MARKET_SYMBOLS['Crypto'])
+    assert data['Indici']['SPX']['price'] == 500.0
+    assert elapsed < 1
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.payload = payload
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    async def json(self, content_type=None):
+        return self.payload
+
+
+class FakeSession:
+    def __init__(self):
+        self.calls = []
+
+    def get(self, url, params=None, timeout=None):
+        self.calls.append((url, params))
+        if 'coingecko' in url:
+            ids = params['ids'].split(',')
+            return FakeResponse({cid: {'usd': 1.0, 'usd_24h_change': 0.5} for cid in ids})
+        return FakeResponse({'rates': {'EUR': 0.9, 'GBP': 0.8, 'JPY': 150.0, 'AUD': 1.5}})
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+def test_update_merges_same_endpoint_requests(monkeypatch, tmp_path):
+    """Una chiamata CoinGecko per tutte le crypto, una sola tabella forex"""
+    mb = load_market_bot()
+    session = FakeSession()
+    monkeypatch.setattr(mb, 'CACHE_FILE', str(tmp_path / 'cache.db'))
+    monkeypatch.setattr(mb, 'ALPHA_VANTAGE_KEY', None)
+    monkeypatch.setattr(mb.aiohttp, 'ClientSession', lambda: session)
+
+    data = asyncio.run(mb.update_all_markets())
+
+    assert len(session.calls) == 2
+    assert all(v['price'] == 1.0 for v in data['Crypto'].values())
+    assert round(data['Forex']['eur']['price'], 4) == round(1 / 0.9, 4)
+    assert data['Forex']['jpy']['price'] == 150.0
+
+
+def test_update_refreshes_only_expired_symbols(monkeypatch, tmp_path):
+    """Con un sottoinsieme si scaricano solo quei simboli; gli altri arrivano dalla cache"""
+    mb = load_market_bot()
+    session = FakeSession()
+    monkeypatch.setattr(mb, 'CACHE_FILE', str(tmp_path / 'cache.db'))
+    monkeypatch.setattr(mb, 'ALPHA_VANTAGE_KEY', None)
+    monkeypatch.setattr(mb.aiohttp, 'ClientSession', lambda: session)
+
+    first = asyncio.run(mb.update_all_markets())
+    mb.save_cache(first)
+    session.calls.clear()
+
+    expired = mb.get_cache().expired(mb.MARKET_SYMBOLS)
+    assert 'Crypto' not in expired and 'Forex' not in expired
+
+    data = asyncio.run(mb.update_all_markets({'Forex': mb.MARKET_SYMBOLS['Forex']}))
+    assert [url for url, _ in session.calls if 'coingecko' in url] == []
+    assert data['Crypto']['bitcoin']['from_cache'] is True
+    assert list(data) == list(mb.MARKET_SYMBOLS)
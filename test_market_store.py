@@ -0,0 +1,22 @@
+from market_store import MarketStore, fill_changes
+
+
+def test_latest_points_and_local_change(tmp_path):
+    """Lo storico locale restituisce gli ultimi punti e calcola le variazioni mancanti"""
+    store = MarketStore(str(tmp_path / "history.db"))
+    now = 1_700_000_000
+    store.append([('EUR/USD', 1.10, None), ('BTC/USD', 60000.0, 1.0)], ts=now - 86400)
+    store.append([('EUR/USD', 1.11, None), ('BTC/USD', 61000.0, 1.5)], ts=now - 3600)
+    store.append([('EUR/USD', 1.12, None)], ts=now)
+
+    latest = store.latest(['EUR/USD', 'BTC/USD', 'XYZ'], n=2)
+    assert latest['EUR/USD'] == [(now, 1.12), (now - 3600, 1.11)]
+    assert latest['BTC/USD'][0] == (now - 3600, 61000.0)
+    assert latest['XYZ'] == []
+
+    snapshot = {'forex': [{'symbol': 'EUR/USD', 'price': 1.21}],
+                'crypto': [{'symbol': 'BTC/USD', 'price': 62000.0, 'change_24h': 2.0}]}
+    fill_changes(snapshot, store, now=now)
+    assert snapshot['forex'][0]['change_pct'] == 10.0
+    assert 'change_pct' not in snapshot['crypto'][0]
+    store.close()
@@ -0,0 +1,42 @@
+import asyncio
+
+import aiohttp
+
+from metrics import Registry, start_server
+
+
+def test_histogram_and_counter_exposition():
+    registry = Registry()
+    stages = registry.histogram('stage_seconds', 'Stage duration', buckets=(0.1, 1))
+    calls = registry.counter('calls_total', 'Calls')
+    stages.observe(0.05, stage='news')
+    stages.observe(0.5, stage='news')
+    calls.inc(provider='Yahoo "v7"')
+
+    text = registry.render()
+    assert '# TYPE stage_seconds histogram' in text
+    assert 'stage_seconds_bucket{stage="news",le="0.1"} 1' in text
+    assert 'stage_seconds_bucket{stage="news",le="+Inf"} 2' in text
+    assert 'stage_seconds_count{stage="news"} 2' in text
+    assert 'calls_total{provider="Yahoo \\"v7\\""} 1' in text
+    assert stages.summary()[('news',)]['last'] == 0.5
+
+
+def test_metrics_endpoint_serves_prometheus_text():
+    """L'endpoint /metrics risponde in formato Prometheus"""
+    registry = Registry()
+    registry.counter('reports_total', 'Reports').inc()
+
+    async def scenario():
+        runner = await start_server(registry, 0, host='127.0.0.1')
+        port = runner.addresses[0][1]
+        try:
+            async with aiohttp.ClientSession() as session:
+                async with session.get(f'http://127.0.0.1:{port}/metrics') as resp:
+                    return resp.headers['Content-Type'], await resp.text()
+        finally:
+            await runner.cleanup()
+
+    content_type, body = asyncio.run(scenario())
+    assert content_type.startswith('text/plain; version=0.0.4')
+    assert 'reports_total 1' in body
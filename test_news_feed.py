@@ -0,0 +1,85 @@
+import asyncio
+
+import aiohttp
+from aiohttp import web
+
+from news_feed import FeedSource, NewsStore, headline_key
+
+RSS = b"""<?xml version="1.0"?>
+<rss version="2.0"><channel><title>t</title>
+<item><title>Fed holds rates steady - Reuters</title></item>
+<item><title>Oil jumps on supply fears - Bloomberg</title></item>
+<item><title>Fed Holds Rates Steady - CNBC</title></item>
+</channel></rss>"""
+
+
+def test_headline_key_ignores_publisher_and_case():
+    assert headline_key("Fed holds rates steady - Reuters") == headline_key("FED holds rates, steady - CNBC")
+
+
+def test_news_store_conditional_get_and_dedup():
+    """Il secondo download riceve 304 e i titoli duplicati vengono scartati"""
+    hits = []
+
+    async def rss(request):
+        hits.append(request.headers.get('If-None-Match'))
+        if request.headers.get('If-None-Match') == '"v1"':
+            return web.Response(status=304)
+        return web.Response(body=RSS, headers={'ETag': '"v1"'}, content_type='application/rss+xml')
+
+    async def scenario():
+        app = web.Application()
+        app.router.add_get('/rss', rss)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+
+        source = FeedSource('test', f'http://127.0.0.1:{port}/rss')
+        store = NewsStore([source])
+        async with aiohttp.ClientSession() as session:
+            await store.refresh(session)
+            await store.refresh(session)
+        await runner.cleanup()
+        return store, source
+
+    store, source = asyncio.run(scenario())
+    assert hits == [None, '"v1"']
+    assert source.not_modified == 1
+    assert store.headlines() == ["Fed holds rates steady - Reuters", "Oil jumps on supply fears - Bloomberg"]
+    assert not store.is_stale()
+
+
+def test_validators_kept_only_after_a_good_parse():
+    """Corpo illeggibile: ETag non salvato, il download successivo è completo e non un 304"""
+    hits = []
+
+    async def newsapi(request):
+        hits.append(request.headers.get('If-None-Match'))
+        if len(hits) == 1:
+            return web.Response(text="{broken", headers={'ETag': '"v1"'}, content_type='application/json')
+        if request.headers.get('If-None-Match') == '"v2"':
+            return web.Response(status=304)
+        return web.json_response({'articles': [{'title': 'Fed holds rates steady'}]}, headers={'ETag': '"v2"'})
+
+    async def scenario():
+        app = web.Application()
+        app.router.add_get('/top', newsapi)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+
+        source = FeedSource('test', f'http://127.0.0.1:{port}/top', kind='newsapi')
+        store = NewsStore([source])
+        async with aiohttp.ClientSession() as session:
+            for _ in range(3):
+                await store.refresh(session)
+        await runner.cleanup()
+        return store
+
+    store = asyncio.run(scenario())
+    assert hits == [None, None, '"v2"']
+    assert store.headlines() == ['Fed holds rates steady']
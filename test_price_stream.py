@@ -0,0 +1,72 @@
+import asyncio
+
+from aiohttp import web
+
+from price_stream import PriceBook, PriceStream
+
+PRODUCTS = {'BTC-USD': 'BTC/USD', 'ETH-USD': 'ETH/USD'}
+
+
+class FakeFeed:
+    """Feed WebSocket locale: registra le sottoscrizioni e manda i tick, chiudendo dopo ogni giro"""
+
+    def __init__(self, ticks):
+        self.ticks = ticks
+        self.subscriptions = []
+
+    async def handle(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.subscriptions.append(await ws.receive_json())
+        for tick in self.ticks:
+            await ws.send_json(tick)
+        await ws.close()
+        return ws
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get('/', self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, '127.0.0.1', 0).start()
+        return f"ws://127.0.0.1:{self.runner.addresses[0][1]}/"
+
+
+def test_book_ignores_stale_and_untracked():
+    """Prezzi troppo vecchi o prodotti non seguiti non escono dal book"""
+    book = PriceBook(PRODUCTS)
+    book.update('BTC-USD', 66000.0, open_24h=60000.0, now=100)
+    book.update('DOGE-USD', 0.1, now=100)
+    assert book.get('BTC-USD', max_age=60, now=150)['change_24h'] == 10.0
+    assert book.get('BTC-USD', max_age=60, now=200) is None
+    assert book.get('DOGE-USD', max_age=60, now=100) is None
+
+
+def test_stream_fills_book_and_reconnects():
+    """I tick aggiornano il book; dopo la chiusura il client si riconnette e si risottoscrive"""
+    feed = FakeFeed([
+        {'type': 'subscriptions'},
+        {'type': 'ticker', 'product_id': 'BTC-USD', 'price': '65000.5', 'open_24h': '65000.5'},
+        {'type': 'ticker', 'product_id': 'ETH-USD', 'price': '3200', 'open_24h': '3000'},
+    ])
+    book = PriceBook(PRODUCTS)
+
+    async def scenario():
+        url = await feed.start()
+        stream = PriceStream(book, url, backoff=0.05)
+        stream.start()
+        for _ in range(100):
+            if stream.connects >= 2:
+                break
+            await asyncio.sleep(0.05)
+        await stream.stop()
+        await feed.runner.cleanup()
+        return stream.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats['connects'] >= 2
+    assert feed.subscriptions[0] == {'type': 'subscribe', 'product_ids': ['BTC-USD', 'ETH-USD'], 'channels': ['ticker']}
+    assert book.quotes(max_age=60) == [
+        {'symbol': 'BTC/USD', 'price': 65000.5, 'source': 'Coinbase WS', 'change_24h': 0.0},
+        {'symbol': 'ETH/USD', 'price': 3200.0, 'source': 'Coinbase WS', 'change_24h': 6.67},
+    ]
@@ -0,0 +1,46 @@
+from provider_health import HealthRegistry, OPEN, HALF_OPEN, CLOSED
+
+
+def test_circuit_breaker_opens_probes_and_closes():
+    """Dopo N errori il provider viene saltato, poi una sola sonda lo riabilita"""
+    now = [0.0]
+    registry = HealthRegistry(failure_threshold=3, cooldown=60, clock=lambda: now[0])
+
+    for _ in range(3):
+        assert registry.allow('FRED')
+        registry.record('FRED', False, 8.0, 'HTTP 400')
+    assert registry.report()['FRED']['state'] == OPEN
+    assert not registry.allow('FRED')
+
+    now[0] = 61
+    assert registry.allow('FRED')
+    assert registry.report()['FRED']['state'] == HALF_OPEN
+    assert not registry.allow('FRED')
+    registry.record('FRED', True, 0.2)
+    assert registry.report()['FRED']['state'] == CLOSED
+
+
+def test_probe_that_never_reports_is_retried():
+    """Una sonda mai conclusa non lascia il circuito half-open per sempre"""
+    now = [0.0]
+    registry = HealthRegistry(failure_threshold=1, cooldown=60, clock=lambda: now[0])
+    registry.record('FRED', False, 8.0, 'timeout')
+
+    now[0] = 61
+    assert registry.allow('FRED')  # sonda persa: nessun record()
+    now[0] = 100
+    assert not registry.allow('FRED')
+    now[0] = 121
+    assert registry.allow('FRED')
+    assert registry.state('FRED') == HALF_OPEN
+
+
+def test_latency_percentiles_and_error_rate():
+    registry = HealthRegistry()
+    for ms in range(1, 101):
+        registry.record('Yahoo Finance', ms != 100, ms / 1000)
+    report = registry.report()['Yahoo Finance']
+    assert report['calls'] == 100
+    assert report['error_rate'] == 0.01
+    assert abs(report['p50'] - 0.050) < 0.002
+    assert abs(report['p95'] - 0.095) < 0.002
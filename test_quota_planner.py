@@ -0,0 +1,48 @@
+from datetime import datetime, timezone
+
+from quota_planner import QuotaPlanner, session_open
+
+
+def make_planner(tmp_path, now, per_day=25):
+    return QuotaPlanner('av', per_day, 4 * 3600, str(tmp_path / 'q.db'), clock=lambda: now)
+
+
+def test_budget_is_spread_over_remaining_runs(tmp_path):
+    """Alle 00:00 UTC restano 6 giri da 4h: 25 chiamate -> 5 per giro"""
+    now = datetime(2024, 3, 5, 0, 0, tzinfo=timezone.utc)
+    planner = make_planner(tmp_path, now)
+    assert planner.runs_left() == 6
+    assert planner.allowance() == 5
+    planner.record(20)
+    assert planner.allowance() == 1
+
+
+def test_used_quota_survives_restart(tmp_path):
+    now = datetime(2024, 3, 5, 12, 0, tzinfo=timezone.utc)
+    make_planner(tmp_path, now).record(7)
+    assert make_planner(tmp_path, now).used_today() == 7
+    tomorrow = datetime(2024, 3, 6, 1, 0, tzinfo=timezone.utc)
+    assert make_planner(tmp_path, tomorrow).used_today() == 0
+
+
+def test_plan_prefers_priority_staleness_and_open_markets(tmp_path):
+    """Martedì 15:00 UTC: mercato USA aperto"""
+    now = datetime(2024, 3, 5, 15, 0, tzinfo=timezone.utc)
+    planner = make_planner(tmp_path, now)
+    candidates = [
+        {'key': 'fresh', 'priority': 3, 'age': 3600, 'ttl': 14400, 'session': 'cash'},
+        {'key': 'stale', 'priority': 1, 'age': 28800, 'ttl': 14400, 'session': 'cash'},
+        {'key': 'never', 'priority': 2, 'age': None, 'ttl': 14400, 'session': 'cash'},
+    ]
+    chosen, skipped = planner.plan(candidates, allowance=2)
+    assert chosen == ['never', 'stale']
+    assert skipped == ['fresh']
+
+
+def test_sessions():
+    saturday = datetime(2024, 3, 9, 15, 0, tzinfo=timezone.utc)
+    assert not session_open('cash', saturday)
+    assert not session_open('futures', saturday)
+    sunday_night = datetime(2024, 3, 10, 23, 0, tzinfo=timezone.utc)
+    assert session_open('futures', sunday_night)
+    assert not session_open('cash', sunday_night)
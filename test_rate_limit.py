@@ -0,0 +1,31 @@
+import asyncio
+
+import pytest
+
+from rate_limit import TokenBucket, QuotaExhausted
+
+
+def test_token_bucket_burst_then_rate():
+    """Burst fino alla capacità, poi una chiamata ogni 1/rate secondi"""
+    async def scenario():
+        bucket = TokenBucket('test', per_minute=600, capacity=3)  # 10/s
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        for _ in range(5):
+            await bucket.acquire()
+        return loop.time() - started
+
+    elapsed = asyncio.run(scenario())
+    assert 0.15 <= elapsed < 0.5
+
+
+def test_token_bucket_daily_quota():
+    async def scenario():
+        bucket = TokenBucket('av', per_minute=600, per_day=2)
+        await bucket.acquire()
+        await bucket.acquire()
+        assert bucket.remaining_today() == 0
+        with pytest.raises(QuotaExhausted):
+            await bucket.acquire()
+
+    asyncio.run(scenario())
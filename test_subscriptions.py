@@ -0,0 +1,32 @@
+from subscriptions import SubscriptionStore, filter_snapshot, parse_symbols
+
+
+def test_groups_by_identical_watchlist(tmp_path):
+    """Chat con la stessa watchlist (in qualsiasi ordine) finiscono nello stesso gruppo"""
+    store = SubscriptionStore(str(tmp_path / 's.db'))
+    store.subscribe(-100, ['BTC', 'Gold'])
+    store.subscribe(-200, ['gold', 'btc '])
+    store.subscribe(42)
+    assert store.groups() == {('btc', 'gold'): [-100, -200], (): [42]}
+
+    store.add(42, ['ETH'])
+    store.remove(-200, ['gold'])
+    store.unsubscribe(-100)
+    reopened = SubscriptionStore(str(tmp_path / 's.db'))
+    assert reopened.groups() == {('btc',): [-200], ('eth',): [42]}
+
+
+def test_filter_snapshot_and_parse_symbols():
+    snapshot = {
+        'indices': [{'symbol': 'S&P 500', 'price': 1}],
+        'commodities': [{'symbol': 'Gold (XAU)', 'price': 2}],
+        'crypto': [{'symbol': 'BTC/USD', 'price': 3}],
+        'forex': [], 'yields': [],
+        'fear_greed': {'value': 50, 'classification': 'Neutral'},
+    }
+    assert parse_symbols(['S&P', '500,', 'gold']) == ['S&P 500', 'gold']
+    filtered = filter_snapshot(snapshot, ('gold', 's&p 500'))
+    assert [i['symbol'] for i in filtered['indices'] + filtered['commodities']] == ['S&P 500', 'Gold (XAU)']
+    assert filtered['crypto'] == [] and filtered['fear_greed'] is None
+    assert filter_snapshot(snapshot, ('btc',))['fear_greed'] is not None
+    assert filter_snapshot(snapshot, ()) is snapshot
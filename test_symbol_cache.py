@@ -0,0 +1,38 @@
+import json
+
+from symbol_cache import SymbolCache
+
+
+def test_entries_expire_per_symbol(tmp_path):
+    """Ogni simbolo ha il proprio TTL"""
+    cache = SymbolCache(str(tmp_path / 'c.db'))
+    cache.update({'Crypto': {'btc': {'price': 1.0}}, 'Indici': {'SPX': {'price': 2.0}}},
+                 {'Crypto': 60, 'Indici': 3600}, now=1000)
+    symbols = {'Crypto': {'btc': 'Bitcoin'}, 'Indici': {'SPX': 'S&P 500', 'NDX': 'Nasdaq'}}
+    assert cache.expired(symbols, now=1030) == {'Indici': {'NDX': 'Nasdaq'}}
+    assert cache.expired(symbols, now=1100) == {'Crypto': {'btc': 'Bitcoin'}, 'Indici': {'NDX': 'Nasdaq'}}
+    assert cache.next_expiry() == 1060
+
+
+def test_only_changed_rows_are_rewritten_and_reloaded(tmp_path):
+    """Dati invariati: solo il timestamp; la cache sopravvive al riavvio"""
+    path = str(tmp_path / 'c.db')
+    cache = SymbolCache(path)
+    assert cache.update({'Crypto': {'btc': {'price': 1.0}, 'eth': {'price': 2.0}}}, now=1000) == 2
+    assert cache.update({'Crypto': {'btc': {'price': 1.0}, 'eth': {'price': 2.5},
+                                    'sol': {'price': None}}}, now=2000) == 1
+    cache.close()
+
+    reopened = SymbolCache(path)
+    assert reopened.get('Crypto', 'eth') == {'price': 2.5}
+    assert reopened.expires_at('Crypto', 'btc') == 2000 + reopened.default_ttl
+    assert reopened.get('Crypto', 'sol') is None
+
+
+def test_imports_legacy_json(tmp_path):
+    legacy = tmp_path / 'market_cache.json'
+    legacy.write_text(json.dumps({'_last_update': '2024-01-01T10:00:00',
+                                  'Forex': {'eur': {'price': 1.1}}}))
+    cache = SymbolCache(str(tmp_path / 'c.db'))
+    assert cache.import_json(str(legacy)) == 1
+    assert cache.get('Forex', 'eur') == {'price': 1.1}
@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+from telegram_delivery import DeliveryError, DeliveryQueue, RetryAfter
+
+
+class FakeTransport:
+    def __init__(self, failures=()):
+        self.failures = list(failures)
+        self.calls = []
+
+    async def send_message(self, chat_id, text, parse_mode=None, **kwargs):
+        self.calls.append((chat_id, text, parse_mode, asyncio.get_running_loop().time()))
+        if self.failures:
+            error = self.failures.pop(0)
+            if error is not None:
+                raise error
+        return {'message_id': len(self.calls)}
+
+
+def test_retry_after_is_respected():
+    """Un 429 attende retry_after e poi consegna, senza perdere il messaggio"""
+    transport = FakeTransport([RetryAfter(0.2)])
+    queue = DeliveryQueue(transport)
+
+    async def scenario():
+        result = await queue.send(1, "ciao")
+        await queue.close()
+        return result
+
+    assert asyncio.run(scenario()) == {'message_id': 2}
+    assert transport.calls[1][3] - transport.calls[0][3] >= 0.2
+    assert queue.stats()['throttled'] == 1
+
+
+def test_markdown_rejection_degrades_remaining_chunks():
+    """Markdown rifiutato: il pezzo e i successivi vanno in testo semplice, una sola chiamata in più"""
+    transport = FakeTransport([None, DeliveryError("400: Bad Request: can't parse entities")])
+    queue = DeliveryQueue(transport, chat_per_minute=6000)
+
+    async def scenario():
+        await queue.send_chunks(1, ["a", "b", "c"], parse_mode='Markdown')
+        await queue.close()
+
+    asyncio.run(scenario())
+    assert [(text, mode) for _, text, mode, _ in transport.calls] == [
+        ('a', 'Markdown'), ('b', 'Markdown'), ('b', None), ('c', None)]
+
+
+def test_permanent_error_is_not_retried():
+    transport = FakeTransport([DeliveryError("403: Forbidden: bot was blocked by the user")])
+    queue = DeliveryQueue(transport)
+
+    async def scenario():
+        with pytest.raises(DeliveryError):
+            await queue.send(1, "ciao")
+        await queue.close()
+
+    asyncio.run(scenario())
+    assert len(transport.calls) == 1
+
+
+def test_per_chat_rate_limit():
+    """Stessa chat: un messaggio ogni 1/rate secondi; chat diverse procedono in parallelo"""
+    transport = FakeTransport()
+    queue = DeliveryQueue(transport, chat_per_minute=600)  # 10/s per chat
+
+    async def scenario():
+        await asyncio.gather(*(queue.send(chat, str(i)) for i in range(3) for chat in (1, 2)))
+        await queue.close()
+
+    asyncio.run(scenario())
+    times = [t for chat, _, _, t in transport.calls if chat == 1]
+    assert times[-1] - times[0] >= 0.18
+    assert queue.stats()['sent'] == 6
+
+
+def test_throttled_chat_does_not_hold_up_others():
+    """Una chat in attesa (429 o limite per chat) non blocca i worker: le altre chat partono subito"""
+    transport = FakeTransport([RetryAfter(0.5)])
+    queue = DeliveryQueue(transport, workers=1, chat_per_minute=60)
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        throttled = asyncio.gather(queue.send(1, "a"), queue.send(1, "b"))
+        await asyncio.sleep(0.01)
+        await asyncio.gather(*(queue.send(chat, "x") for chat in (2, 3, 4)))
+        others = loop.time() - started
+        await throttled
+        await queue.close()
+        return others
+
+    assert asyncio.run(scenario()) < 0.2
+    chat1 = [(text, t) for chat, text, _, t in transport.calls if chat == 1]
+    assert [text for text, _ in chat1] == ["a", "a", "b"]
+    assert chat1[1][1] - chat1[0][1] >= 0.5
+    assert queue.stats()['sent'] == 5
@@ -0,0 +1,99 @@
+import asyncio
+import time
+
+import aiohttp
+
+from webhook import SECRET_HEADER, WebhookServer
+
+
+async def post(server, update, secret='s3cret'):
+    """Il 'Telegram' finto: un POST come quelli di setWebhook"""
+    async with aiohttp.ClientSession() as session:
+        async with session.post(f"http://127.0.0.1:{server.port}{server.path}", json=update,
+                                headers={SECRET_HEADER: secret}) as resp:
+            return resp.status
+
+
+def test_acknowledges_before_processing():
+    """Risponde 200 subito; l'update viene elaborato dopo, dal pool di worker"""
+    handled = []
+
+    async def handle(update):
+        await asyncio.sleep(0.3)
+        handled.append(update['update_id'])
+
+    async def scenario():
+        server = WebhookServer(handle, 's3cret', workers=2)
+        await server.start('127.0.0.1', 0)
+        started = time.monotonic()
+        statuses = [await post(server, {'update_id': i}) for i in range(3)]
+        acked = time.monotonic() - started
+        await server.stop()
+        return statuses, acked, server.stats()
+
+    statuses, acked, stats = asyncio.run(scenario())
+    assert statuses == [200, 200, 200]
+    assert acked < 0.3
+    assert sorted(handled) == [0, 1, 2]
+    assert stats['processed'] == 3
+
+
+def test_rejects_wrong_secret():
+    """Senza il secret token corretto l'update non entra in coda"""
+    handled = []
+
+    async def handle(update):
+        handled.append(update)
+
+    async def scenario():
+        server = WebhookServer(handle, 's3cret')
+        await server.start('127.0.0.1', 0)
+        statuses = [await post(server, {'update_id': 1}, secret='wrong'), await post(server, {'update_id': 2}, secret='')]
+        await server.stop()
+        return statuses, server.stats()
+
+    statuses, stats = asyncio.run(scenario())
+    assert statuses == [403, 403]
+    assert handled == []
+    assert stats['rejected'] == 2
+
+
+def test_full_queue_defers_to_telegram():
+    """Coda piena: 503, così Telegram riconsegna l'update più tardi"""
+    release = asyncio.Event()
+
+    async def handle(update):
+        await release.wait()
+
+    async def scenario():
+        server = WebhookServer(handle, 's3cret', workers=1, maxsize=1)
+        await server.start('127.0.0.1', 0)
+        statuses = [await post(server, {'update_id': i}) for i in range(3)]
+        release.set()
+        await server.stop()
+        return statuses, server.stats()
+
+    statuses, stats = asyncio.run(scenario())
+    # il primo è in lavorazione, il secondo in coda, il terzo rimandato
+    assert statuses == [200, 200, 503]
+    assert stats['dropped'] == 1 and stats['processed'] == 2
+
+
+def test_rejects_bodies_that_are_not_updates():
+    """JSON valido ma non un oggetto (lista, stringa): 400, e i worker restano vivi per gli update successivi"""
+    handled = []
+
+    async def handle(update):
+        handled.append(update['update_id'])
+
+    async def scenario():
+        server = WebhookServer(handle, 's3cret', workers=1)
+        await server.start('127.0.0.1', 0)
+        statuses = [await post(server, body) for body in ([], "x", 7, {'update_id': 1})]
+        await server.stop()
+        return statuses, server.stats()
+
+    statuses, stats = asyncio.run(scenario())
+    assert statuses == [400, 400, 400, 200]
+    assert handled == [1]
+    assert stats['rejected'] == 3
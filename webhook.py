@@ -0,0 +1,150 @@
+"""
+Webhook ingestion for the Telegram bots.
+
+Instead of long polling, Telegram POSTs every update to our aiohttp server.
+The handler checks the X-Telegram-Bot-Api-Secret-Token header, puts the
+update on a bounded queue and answers 200 right away; a small worker pool
+feeds the queue to the python-telegram-bot Application. Command latency is
+then just processing time, no idle getUpdates request is kept open, and
+several replicas no longer fight over getUpdates ("Conflict" errors).
+
+When the queue is full the server answers 503 and Telegram redelivers the
+update later.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import logging
+import signal
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+
+def default_secret(token):
+    """A stable secret derived from the bot token (same on every replica, valid for setWebhook)."""
+    return hashlib.sha256(f"webhook:{token}".encode()).hexdigest()
+
+
+class WebhookServer:
+    def __init__(self, handle, secret_token, path='/telegram', workers=4, maxsize=100):
+        self.handle = handle
+        self.secret_token = secret_token
+        self.path = path
+        self.workers = workers
+        self.maxsize = maxsize
+        self.received = self.rejected = self.dropped = self.processed = self.failed = 0
+        self.port = None
+        self._runner = None
+
+    async def _receive(self, request):
+        supplied = request.headers.get(SECRET_HEADER, '')
+        if not hmac.compare_digest(supplied.encode(), self.secret_token.encode()):
+            self.rejected += 1
+            return web.Response(status=403)
+        try:
+            update = await request.json()
+        except ValueError:  # invalid JSON or encoding
+            self.rejected += 1
+            return web.Response(status=400)
+        if not isinstance(update, dict):
+            # Telegram only sends Update objects
+            self.rejected += 1
+            return web.Response(status=400)
+        try:
+            self._queue.put_nowait(update)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning(f"📥 Webhook queue full ({self.maxsize}), update {update.get('update_id')} deferred")
+            return web.Response(status=503)
+        self.received += 1
+        return web.Response()
+
+    async def _worker(self):
+        while True:
+            update = await self._queue.get()
+            try:
+                await self.handle(update)
+                self.processed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failed += 1
+                update_id = update.get('update_id') if isinstance(update, dict) else None
+                logger.error(f"Webhook update {update_id} failed: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def start(self, host='0.0.0.0', port=8443):
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        app = web.Application()
+        app.router.add_post(self.path, self._receive)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        self.port = self._runner.addresses[0][1]
+        logger.info(f"📥 Webhook listening on {host}:{self.port}{self.path}")
+
+    async def stop(self):
+        """Stop accepting updates, finish the queued ones, then stop the workers."""
+        if self._runner is None:
+            return
+        await self._runner.cleanup()
+        self._runner = None
+        await self._queue.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self):
+        return {
+            'received': self.received,
+            'processed': self.processed,
+            'failed': self.failed,
+            'rejected': self.rejected,
+            'dropped': self.dropped,
+            'queued': self._queue.qsize() if self._runner else 0,
+        }
+
+
+async def run_webhook(app, url, secret_token, host='0.0.0.0', port=8443, path='/telegram',
+                      workers=4, maxsize=100, on_started=None):
+    """Run a python-telegram-bot Application behind WebhookServer until SIGINT/SIGTERM.
+
+    Mirrors run_polling: post_init/post_shutdown are called, the job queue runs,
+    and pending updates are dropped when the webhook is registered.
+    """
+    from telegram import Update
+
+    async def handle(data):
+        await app.process_update(Update.de_json(data, app.bot))
+
+    server = WebhookServer(handle, secret_token, path=path, workers=workers, maxsize=maxsize)
+    await app.initialize()
+    if app.post_init:
+        await app.post_init(app)
+    await app.start()
+    app.bot_data['webhook'] = server
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    try:
+        await server.start(host, port)
+        await app.bot.set_webhook(url=url.rstrip('/') + path, secret_token=secret_token,
+                                  allowed_updates=Update.ALL_TYPES, drop_pending_updates=True)
+        logger.info(f"✅ Webhook registered at {url.rstrip('/')}{path}")
+        if on_started:
+            on_started()
+        await stop.wait()
+    finally:
+        await server.stop()
+        await app.stop()
+        await app.shutdown()
+        if app.post_shutdown:
+            await app.post_shutdown(app)